@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应并发控制（AIMD）
+同时进行的API请求数不再固定：请求正常且延迟平稳时加性增加，
+遇到429、超时、服务端过载或延迟突增时乘性减少，使吞吐量跟随服务端的实际承载能力
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# 请求结果类型
+OUTCOME_SUCCESS = 'success'    # 正常响应，可以增加并发
+OUTCOME_OVERLOAD = 'overload'  # 429、超时、5xx，需要减少并发
+OUTCOME_IGNORE = 'ignore'      # 与服务端负载无关的失败（如400），不调整
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD并发限制器 - 控制同时进行的请求数（可跨线程共享）"""
+
+    def __init__(self, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 64,
+                 increase: float = 1.0, decrease: float = 0.5, latency_tolerance: float = 2.0):
+        """
+        初始化并发限制器
+
+        Args:
+            initial_limit: 初始并发数
+            min_limit: 并发数下限
+            max_limit: 并发数上限（通常等于工作线程数）
+            increase: 每个往返（约 limit 个成功请求）增加的并发数
+            decrease: 过载时并发数乘以的系数
+            latency_tolerance: 近期延迟超过基线延迟的倍数时视为延迟突增
+        """
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min(max(initial_limit, min_limit), self.max_limit))
+
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        # 近期延迟（快速EWMA）和基线延迟（慢速EWMA，只用正常响应更新）
+        self._recent_latency = None
+        self._baseline_latency = None
+        self._last_decrease = 0.0
+
+        # 统计信息
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = self.limit
+        self.lowest_limit = self.limit
+        self.total_wait = 0.0
+
+    def acquire(self):
+        """获取一个并发名额，已达上限时阻塞等待"""
+        start = None
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                if start is None:
+                    start = time.monotonic()
+                self._condition.wait()
+            self._in_flight += 1
+            if start is not None:
+                self.total_wait += time.monotonic() - start
+
+    def try_acquire(self) -> bool:
+        """
+        不等待地获取一个并发名额
+
+        Returns:
+            是否获取到名额（已达上限时返回False）
+        """
+        with self._condition:
+            if self._in_flight >= int(self.limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: float, outcome: str = OUTCOME_SUCCESS):
+        """
+        归还名额并根据本次请求结果调整并发数
+
+        Args:
+            latency: 本次请求耗时（秒）
+            outcome: OUTCOME_SUCCESS / OUTCOME_OVERLOAD / OUTCOME_IGNORE
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if outcome == OUTCOME_OVERLOAD:
+                self._decrease('过载')
+            elif outcome == OUTCOME_SUCCESS:
+                self._on_success(latency)
+            self._condition.notify_all()
+
+    def _on_success(self, latency: float):
+        """正常响应：延迟突增时减少并发，否则加性增加（调用方持有锁）"""
+        if self._recent_latency is None:
+            self._recent_latency = self._baseline_latency = latency
+        self._recent_latency += 0.3 * (latency - self._recent_latency)
+        # 基线缓慢跟随，服务端延迟整体变化（如高峰时段）后不会一直判定为突增
+        self._baseline_latency += 0.02 * (latency - self._baseline_latency)
+
+        if self._recent_latency > self._baseline_latency * self.latency_tolerance:
+            self._decrease('延迟突增')
+            return
+
+        if self.limit < self.max_limit:
+            # 每个成功请求增加 increase/limit，约每个往返增加 increase
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self.increases += 1
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _decrease(self, reason: str):
+        """乘性减少并发数，同一次拥塞（一个往返内）只减少一次（调用方持有锁）"""
+        now = time.monotonic()
+        if now - self._last_decrease < (self._recent_latency or 0.0):
+            return
+        self._last_decrease = now
+
+        previous = int(self.limit)
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+        self.decreases += 1
+        self.lowest_limit = min(self.lowest_limit, self.limit)
+        # 重置近期延迟，避免同一次延迟突增连续触发
+        if self._recent_latency is not None:
+            self._recent_latency = self._baseline_latency
+        logger.warning(f"API{reason}，并发数 {previous} -> {int(self.limit)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取并发控制统计"""
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'peak_limit': int(self.peak_limit),
+                'lowest_limit': int(self.lowest_limit),
+                'max_limit': self.max_limit,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'baseline_latency_ms': round((self._baseline_latency or 0.0) * 1000, 1),
+                'total_wait_seconds': round(self.total_wait, 2)
+            }
@@ -5,27 +5,163 @@ AI诗歌标签检索工具
 演示如何轻松检索AI生成的诗歌标签，支持多维度组合检索
 """
 
+import os
+import re
+import glob
 import json
+import heapq
+import base64
+import hashlib
 import argparse
-from typing import List, Dict, Any, Set
-from collections import defaultdict
+from typing import List, Dict, Any, Set, Tuple, Optional
+from collections import defaultdict, OrderedDict
+from tag_canonicalizer import TagCanonicalizer, DEFAULT_ALIAS_FILE
+
+try:
+    import numpy as np
+except ImportError:  # 相似度检索为可选功能，未安装numpy时其余检索不受影响
+    np = None
+
+# 参与相似度计算的标签维度（作者、标题不计入标签向量）
+SIMILARITY_TAG_PREFIXES = ('style:', 'scene:', 'emotion:', 'theme:', 'rhetoric:', 'keyword:')
+
+# 建索引所需的标签字段（分卷索引缓存只保存这些字段）
+INDEXED_TAG_FIELDS = ('styles', 'scenes', 'emotions', 'themes', 'rhetoric', 'keywords')
+
+# 排序所需的诗歌字段，以及分卷索引缓存格式版本（字段变化时递增，旧缓存自动重建）
+SORT_FIELDS = ('source_file', 'volume', 'no#')
+SHARD_INDEX_VERSION = 2
+
+# 检索结果排序方式: 卷次顺序、作者、标签匹配数
+SORT_ORDERS = ('volume', 'author', 'score')
+
+CHINESE_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4,
+                  '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+CHINESE_UNITS = {'十': 10, '百': 100, '千': 1000}
+NUMBER_PATTERN = re.compile(r'\d+|[零〇一二两三四五六七八九十百千]+')
+
+def parse_order_number(value: Any) -> int:
+    """从 '卷一百二'、'卷165'、'001.json' 等文本中解析出排序用的序号，解析不出时为0"""
+    if isinstance(value, int):
+        return value
+    match = NUMBER_PATTERN.search(str(value or ''))
+    if not match:
+        return 0
+    
+    text = match.group()
+    if text.isdigit():
+        return int(text)
+    
+    total, current = 0, 0
+    for ch in text:
+        if ch in CHINESE_DIGITS:
+            current = CHINESE_DIGITS[ch]
+        else:
+            total += (current or 1) * CHINESE_UNITS[ch]
+            current = 0
+    return total + current
+
+class LazyPoemStore:
+    """
+    按需加载的诗歌存储
+    
+    每首诗歌只记录 (分卷文件, 文件内序号)，正文在访问时才读取分卷文件，
+    并用一个小的LRU缓存最近访问的分卷，内存占用与分卷数量无关。
+    也可直接存放内存中的诗歌（例如从JSONL结果流载入的诗歌）。
+    """
+    
+    def __init__(self, max_cached_shards: int = 4):
+        """
+        初始化存储
+        
+        Args:
+            max_cached_shards: 同时缓存在内存中的分卷数量上限
+        """
+        self.max_cached_shards = max(1, max_cached_shards)
+        # 每个元素为 (分卷路径, 文件内序号) 或 诗歌字典
+        self._entries = []
+        self._shard_cache = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __getitem__(self, i: int) -> Dict:
+        entry = self._entries[i]
+        if isinstance(entry, tuple):
+            shard_path, offset = entry
+            return self._load_shard(shard_path)[offset]
+        return entry
+    
+    def __setitem__(self, i: int, value):
+        self._entries[i] = value
+    
+    def __iter__(self):
+        for i in range(len(self._entries)):
+            yield self[i]
+    
+    def append(self, value):
+        """追加诗歌或 (分卷路径, 文件内序号) 位置"""
+        self._entries.append(value)
+    
+    def invalidate(self, shard_path: str):
+        """分卷文件被重写后丢弃其缓存"""
+        self._shard_cache.pop(shard_path, None)
+    
+    def _load_shard(self, shard_path: str) -> List[Dict]:
+        """读取分卷文件（LRU缓存）"""
+        if shard_path in self._shard_cache:
+            self._shard_cache.move_to_end(shard_path)
+            return self._shard_cache[shard_path]
+        
+        with open(shard_path, 'r', encoding='utf-8') as f:
+            poems = json.load(f)
+        
+        self._shard_cache[shard_path] = poems
+        while len(self._shard_cache) > self.max_cached_shards:
+            self._shard_cache.popitem(last=False)
+        return poems
 
 class AITagRetriever:
     """AI标签检索器"""
     
-    def __init__(self, data_file: str = "website_data/ai_enhanced_poems.json"):
+    def __init__(self, data_file: Optional[str] = "website_data/ai_enhanced_poems.json",
+                 watch_folder: Optional[str] = None,
+                 max_cached_shards: int = 4,
+                 alias_file: Optional[str] = DEFAULT_ALIAS_FILE):
         """
         初始化检索器
         
         Args:
-            data_file: 增强诗歌数据文件路径
+            data_file: 增强诗歌数据文件路径（为None时从空索引开始）
+            watch_folder: 批量处理输出文件夹，设置后按需加载其中的 ai_enhanced_*.json
+                          分卷文件，并可通过 refresh() 增量载入新生成的分卷
+            max_cached_shards: 分卷模式下同时缓存在内存中的分卷数量
+            alias_file: 标签别名表，建索引和解析查询时按其归并近义标签（None表示只做空白和字形规范化）
         """
         self.data_file = data_file
+        self.watch_folder = watch_folder
+        self.canonicalizer = TagCanonicalizer(alias_file)
         self.poems_data = self._load_data()
+        if watch_folder and not self.poems_data:
+            # 分卷模式: 内存中只保留索引和 诗歌序号 -> (分卷, 文件内序号) 映射
+            self.poems_data = LazyPoemStore(max_cached_shards)
+        # 预先计算的排序键: 诗歌序号 -> (作者, 文件序号, 卷次, 篇号)
+        self._sort_keys = []
         self.tag_index = self._build_tag_index()
+        # 标签向量矩阵在首次相似度检索时构建
+        self._tag_vectors = None
+        # 增量载入状态: 分卷文件 -> (mtime_ns, size, 诗歌序号列表)；JSONL流 -> 已读字节偏移
+        self._ingested_files = {}
+        self._jsonl_offsets = {}
+        
+        if watch_folder:
+            self.refresh()
     
     def _load_data(self) -> List[Dict]:
         """加载诗歌数据"""
+        if not self.data_file:
+            return []
+        
         try:
             with open(self.data_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -45,44 +181,272 @@ class AITagRetriever:
         index = defaultdict(set)
         
         for i, poem in enumerate(self.poems_data):
-            if 'ai_tags' not in poem:
-                continue
-                
-            tags = poem['ai_tags']
+            self._index_poem(index, i, poem)
+        
+        return index
+    
+    def _index_keys(self, poem: Dict) -> List[str]:
+        """诗歌在标签索引中的全部键（AI标签、作者、标题）"""
+        if 'ai_tags' not in poem:
+            return []
+        
+        keys = list(dict.fromkeys(self._poem_tag_keys(poem)))
+        # 索引作者和标题
+        keys.append(f'author:{poem.get("author", "")}')
+        keys.append(f'title:{poem.get("title", "")}')
+        return keys
+    
+    def _index_poem(self, index: Dict[str, Set[int]], i: int, poem: Dict):
+        """将单首诗歌加入标签索引，并记录其排序键"""
+        for key in self._index_keys(poem):
+            index[key].add(i)
+        
+        if i >= len(self._sort_keys):
+            self._sort_keys.extend([None] * (i + 1 - len(self._sort_keys)))
+        self._sort_keys[i] = (
+            poem.get('author', ''),
+            parse_order_number(poem.get('source_file')),
+            parse_order_number(poem.get('volume')),
+            parse_order_number(poem.get('no#'))
+        )
+    
+    def _unindex_slots(self, slots: Set[int]):
+        """
+        将一组诗歌从标签索引中移除
+        
+        分卷被重写后旧内容已不可读，因此直接扫描倒排表而不依赖旧诗歌数据。
+        """
+        for key in list(self.tag_index):
+            postings = self.tag_index[key]
+            postings -= slots
+            if not postings:
+                del self.tag_index[key]
+    
+    def _poem_tag_keys(self, poem: Dict) -> List[str]:
+        """提取诗歌AI标签对应的索引键（不含作者和标题）"""
+        tags = poem.get('ai_tags', {})
+        keys = []
+        
+        # 索引各种标签类型
+        for style in tags.get('styles', []):
+            keys.append(f'style:{style}')
+        for scene in tags.get('scenes', []):
+            keys.append(f'scene:{scene}')
+        for emotion in tags.get('emotions', []):
+            keys.append(f'emotion:{emotion}')
+        for theme in tags.get('themes', []):
+            keys.append(f'theme:{theme}')
+        for rhetoric in tags.get('rhetoric', []):
+            keys.append(f'rhetoric:{rhetoric}')
+        for keyword in tags.get('keywords', []):
+            keys.append(f'keyword:{keyword}')
+        
+        # 归并近义、异体标签，使同义标签落在同一个倒排表中
+        return [self.canonicalizer.canonicalize_key(key) for key in keys]
+    
+    def add_poems(self, poems: List[Dict], slots: Optional[List[int]] = None,
+                  locations: Optional[List[Tuple[str, int]]] = None) -> List[int]:
+        """
+        增量加入诗歌并更新标签索引，无需全量重建
+        
+        Args:
+            poems: 带 ai_tags 的诗歌列表（分卷模式下可以只含标题、作者和标签）
+            slots: 可选，需要被替换的已有诗歌序号（重新载入同一分卷时使用）
+            locations: 可选，每首诗歌的 (分卷路径, 文件内序号)；提供时只保存位置，
+                       正文在检索命中时才从分卷读取
+            
+        Returns:
+            新诗歌对应的序号列表
+        """
+        if not isinstance(self.tag_index, defaultdict):
+            self.tag_index = defaultdict(set, self.tag_index)
+        
+        slots = list(slots or [])
+        if slots:
+            self._unindex_slots(set(slots))
+        
+        indices = []
+        for k, poem in enumerate(poems):
+            entry = locations[k] if locations else poem
+            if k < len(slots):
+                i = slots[k]
+                self.poems_data[i] = entry
+            else:
+                i = len(self.poems_data)
+                self.poems_data.append(entry)
+            self._index_poem(self.tag_index, i, poem)
+            indices.append(i)
+        
+        # 多出来的旧位置留空，不再出现在任何检索结果中
+        for i in slots[len(poems):]:
+            self.poems_data[i] = {}
+        
+        # 标签词表可能变化，相似度矩阵下次检索时重建
+        self._tag_vectors = None
+        return indices
+    
+    def ingest_file(self, file_path: str) -> int:
+        """
+        载入单个分卷输出文件（ai_enhanced_<file>.json）
+        
+        同一文件被重写（例如补跑）后再次载入时，会替换该文件之前载入的诗歌。
+        
+        Args:
+            file_path: 分卷输出文件路径
             
-            # 索引各种标签类型
-            for style in tags.get('styles', []):
-                index[f'style:{style}'].add(i)
-            for scene in tags.get('scenes', []):
-                index[f'scene:{scene}'].add(i)
-            for emotion in tags.get('emotions', []):
-                index[f'emotion:{emotion}'].add(i)
-            for theme in tags.get('themes', []):
-                index[f'theme:{theme}'].add(i)
-            for rhetoric in tags.get('rhetoric', []):
-                index[f'rhetoric:{rhetoric}'].add(i)
-            for keyword in tags.get('keywords', []):
-                index[f'keyword:{keyword}'].add(i)
+        Returns:
+            新载入的诗歌数量
+        """
+        lazy = isinstance(self.poems_data, LazyPoemStore)
+        
+        try:
+            stat = os.stat(file_path)
+            if lazy:
+                poems = self._load_shard_index(file_path, stat)
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    poems = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            # 文件可能仍在写入，下次刷新时重试
+            print(f"暂时无法载入 {file_path}: {e}")
+            return 0
+        
+        previous = self._ingested_files.get(file_path)
+        slots = previous[2] if previous else None
+        locations = None
+        if lazy:
+            self.poems_data.invalidate(file_path)
+            locations = [(file_path, offset) for offset in range(len(poems))]
+        indices = self.add_poems(poems, slots, locations)
+        self._ingested_files[file_path] = (stat.st_mtime_ns, stat.st_size, indices)
+        return len(poems)
+    
+    def _shard_index_path(self, file_path: str) -> str:
+        """分卷索引缓存文件路径（与分卷同目录的隐藏文件）"""
+        folder, name = os.path.split(file_path)
+        return os.path.join(folder, f'.{name}.idx')
+    
+    def _load_shard_index(self, file_path: str, stat: os.stat_result) -> List[Dict]:
+        """
+        读取分卷的索引记录（标题、作者、标签），不保留诗歌正文
+        
+        首次读取分卷时生成索引缓存文件，之后只要分卷未变化，
+        启动时只读取体积很小的索引缓存。
+        """
+        index_path = self._shard_index_path(file_path)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (cached.get('version') == SHARD_INDEX_VERSION
+                    and cached.get('mtime_ns') == stat.st_mtime_ns and cached.get('size') == stat.st_size):
+                return cached['records']
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            poems = json.load(f)
+        
+        records = []
+        for poem in poems:
+            record = {'title': poem.get('title', ''), 'author': poem.get('author', '')}
+            record.update({field: poem[field] for field in SORT_FIELDS if field in poem})
+            if 'ai_tags' in poem:
+                tags = poem['ai_tags']
+                record['ai_tags'] = {field: tags.get(field, []) for field in INDEXED_TAG_FIELDS}
+            records.append(record)
+        
+        try:
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SHARD_INDEX_VERSION, 'mtime_ns': stat.st_mtime_ns,
+                           'size': stat.st_size, 'records': records}, f, ensure_ascii=False)
+        except OSError as e:
+            # 输出目录只读时不缓存，下次启动重新读取分卷
+            print(f"无法写入索引缓存 {index_path}: {e}")
+        
+        return records
+    
+    def ingest_jsonl(self, stream_path: str) -> int:
+        """
+        从追加写入的JSONL结果流中载入新增诗歌（每行一首）
+        
+        只读取上次读取位置之后的完整行，末尾未写完的半行留到下次；
+        崩溃后半行与恢复处理追加的行拼接成的损坏行被跳过，不会阻塞之后的读取。
+
+        Args:
+            stream_path: JSONL文件路径
             
-            # 索引作者和标题
-            index[f'author:{poem.get("author", "")}'].add(i)
-            index[f'title:{poem.get("title", "")}'].add(i)
+        Returns:
+            新载入的诗歌数量
+        """
+        offset = self._jsonl_offsets.get(stream_path, 0)
+        poems = []
         
-        return index
+        try:
+            with open(stream_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        poems.append(json.loads(line.decode('utf-8')))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        print(f"跳过损坏的JSONL行: {stream_path}（偏移 {offset - len(line)}）")
+        except FileNotFoundError:
+            return 0
+        
+        self._jsonl_offsets[stream_path] = offset
+        if poems:
+            self.add_poems(poems)
+        return len(poems)
     
-    def search_by_tags(self, tags: List[str], operator: str = 'AND') -> List[Dict]:
+    def refresh(self, folder: Optional[str] = None) -> int:
         """
-        根据标签搜索诗歌
+        扫描输出文件夹，增量载入新生成或已更新的分卷文件
         
         Args:
-            tags: 标签列表
+            folder: 输出文件夹，默认使用 watch_folder
+            
+        Returns:
+            新载入的诗歌数量
+        """
+        folder = folder or self.watch_folder
+        if not folder:
+            return 0
+        
+        added = 0
+        for file_path in sorted(glob.glob(os.path.join(folder, 'ai_enhanced_*.json'))):
+            # 合并文件与分卷内容重复，跳过
+            if os.path.basename(file_path) == 'ai_enhanced_poems_merged.json':
+                continue
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            previous = self._ingested_files.get(file_path)
+            if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                continue
+            added += self.ingest_file(file_path)
+        
+        return added
+    
+    def _match_scores(self, tags: List[str], operator: str = 'AND') -> Dict[int, int]:
+        """
+        计算匹配的诗歌及其标签匹配数
+        
+        Args:
+            tags: 已规范化的标签列表
             operator: 搜索操作符 ('AND' 或 'OR')
             
         Returns:
-            匹配的诗歌列表
+            诗歌序号 -> 命中的查询标签数
         """
         if not self.poems_data or not self.tag_index:
-            return []
+            return {}
+        
+        tags = list(dict.fromkeys(tags))
             
         if operator.upper() == 'AND':
             # AND 操作：必须包含所有标签
@@ -95,21 +459,102 @@ class AITagRetriever:
                         result_indices &= self.tag_index[tag]
                 else:
                     # 如果某个标签不存在，AND 操作返回空结果
-                    return []
+                    return {}
             
             if result_indices is None:
-                return []
+                return {}
+            return dict.fromkeys(result_indices, len(tags))
                 
-        else:
-            # OR 操作：包含任意标签
-            result_indices = set()
-            for tag in tags:
-                if tag in self.tag_index:
-                    result_indices |= self.tag_index[tag]
+        # OR 操作：包含任意标签
+        scores = defaultdict(int)
+        for tag in tags:
+            for i in self.tag_index.get(tag, ()):
+                scores[i] += 1
+        return scores
+    
+    def _result_sort_key(self, i: int, sort: str, score: int) -> tuple:
+        """结果排序键，末位为诗歌序号，保证排序稳定且键唯一"""
+        author, file_no, volume_no, number = self._sort_keys[i]
+        if sort == 'author':
+            return (author, file_no, volume_no, number, i)
+        if sort == 'score':
+            return (-score, file_no, volume_no, number, i)
+        return (file_no, volume_no, number, i)
+    
+    def search_by_tags(self, tags: List[str], operator: str = 'AND') -> List[Dict]:
+        """
+        根据标签搜索诗歌
+        
+        Args:
+            tags: 标签列表
+            operator: 搜索操作符 ('AND' 或 'OR')
+            
+        Returns:
+            匹配的诗歌列表，按卷次顺序排列
+        """
+        tags = [self.canonicalizer.canonicalize_key(tag) for tag in tags]
+        scores = self._match_scores(tags, operator)
         
         # 返回匹配的诗歌
+        result_indices = sorted(scores, key=lambda i: self._result_sort_key(i, 'volume', scores[i]))
         return [self.poems_data[i] for i in result_indices]
     
+    def search_page(self, tags: List[str], operator: str = 'AND', sort: str = 'volume',
+                    page_size: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        分页搜索，只读取当前页的诗歌
+        
+        Args:
+            tags: 标签列表
+            operator: 搜索操作符 ('AND' 或 'OR')
+            sort: 排序方式 ('volume' 卷次、'author' 作者、'score' 标签匹配数)
+            page_size: 每页数量
+            cursor: 上一页返回的 next_cursor，为None时取第一页
+            
+        Returns:
+            {'results': 当前页诗歌, 'total': 匹配总数, 'next_cursor': 下一页游标或None}
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"不支持的排序方式: {sort}（可选 {', '.join(SORT_ORDERS)}）")
+        
+        tags = [self.canonicalizer.canonicalize_key(tag) for tag in tags]
+        query_id = hashlib.sha1(json.dumps([sorted(set(tags)), operator.upper(), sort],
+                                           ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+        after = self._decode_cursor(cursor, query_id) if cursor else None
+        
+        scores = self._match_scores(tags, operator)
+        keys = (self._result_sort_key(i, sort, score) for i, score in scores.items())
+        if after is not None:
+            keys = (key for key in keys if key > after)
+        
+        # 多取一个用于判断是否还有下一页
+        page_keys = heapq.nsmallest(page_size + 1, keys)
+        has_more = len(page_keys) > page_size
+        page_keys = page_keys[:page_size]
+        
+        return {
+            'results': [self.poems_data[key[-1]] for key in page_keys],
+            'total': len(scores),
+            'next_cursor': self._encode_cursor(query_id, page_keys[-1]) if has_more else None
+        }
+    
+    def _encode_cursor(self, query_id: str, last_key: tuple) -> str:
+        """生成不透明的分页游标（记录查询标识和上一页最后一条的排序键）"""
+        state = json.dumps({'q': query_id, 'k': list(last_key)}, ensure_ascii=False)
+        return base64.urlsafe_b64encode(state.encode('utf-8')).decode('ascii')
+    
+    def _decode_cursor(self, cursor: str, query_id: str) -> tuple:
+        """解析分页游标"""
+        try:
+            state = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            last_key = tuple(state['k'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("无效的分页游标")
+        
+        if state.get('q') != query_id:
+            raise ValueError("分页游标与当前查询条件不匹配")
+        return last_key
+    
     def search_by_style(self, styles: List[str]) -> List[Dict]:
         """按风格搜索"""
         style_tags = [f'style:{style}' for style in styles]
@@ -151,6 +596,10 @@ class AITagRetriever:
         Returns:
             匹配的诗歌列表
         """
+        return self.search_by_tags(self.criteria_to_tags(criteria), 'AND')
+    
+    def criteria_to_tags(self, criteria: Dict[str, List[str]]) -> List[str]:
+        """将组合搜索条件转换为标签列表"""
         all_tags = []
         
         for tag_type, values in criteria.items():
@@ -168,7 +617,128 @@ class AITagRetriever:
                 elif tag_type == 'keywords':
                     all_tags.extend([f'keyword:{v}' for v in values])
         
-        return self.search_by_tags(all_tags, 'AND')
+        return all_tags
+    
+    def _build_tag_vectors(self) -> Dict[str, Any]:
+        """
+        构建诗歌标签向量（稀疏one-hot矩阵）
+        
+        矩阵以COO形式保存在NumPy数组中：rows[i]、cols[i] 表示第 rows[i] 首诗歌
+        含有词表中第 cols[i] 个标签，查询时用一次 bincount 完成全部诗歌的重叠计数。
+        """
+        if np is None:
+            raise ImportError("相似度检索需要numpy，请先执行: pip install numpy")
+        
+        vocabulary = sorted(key for key in self.tag_index if key.startswith(SIMILARITY_TAG_PREFIXES))
+        vocab_index = {tag: j for j, tag in enumerate(vocabulary)}
+        
+        # 直接由倒排表生成矩阵，分卷模式下不需要读取诗歌正文
+        rows = []
+        cols = []
+        for j, tag in enumerate(vocabulary):
+            postings = self.tag_index[tag]
+            rows.extend(postings)
+            cols.extend([j] * len(postings))
+        
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        
+        return {
+            'vocab_index': vocab_index,
+            'rows': rows,
+            'cols': cols,
+            'row_sizes': np.bincount(rows, minlength=len(self.poems_data)).astype(np.float64)
+        }
+    
+    def _get_tag_vectors(self) -> Dict[str, Any]:
+        """获取标签向量矩阵（惰性构建）"""
+        if self._tag_vectors is None:
+            self._tag_vectors = self._build_tag_vectors()
+        return self._tag_vectors
+    
+    def _rank_by_tag_overlap(self, query_cols: Set[int], top_k: int, metric: str,
+                             exclude: Optional[int] = None) -> List[Tuple[Dict, float]]:
+        """按标签重叠度对全部诗歌做向量化打分并取前 top_k 个"""
+        vectors = self._get_tag_vectors()
+        n = len(self.poems_data)
+        if not query_cols or n == 0 or top_k <= 0:
+            return []
+        
+        query = np.zeros(len(vectors['vocab_index']), dtype=np.float64)
+        query[list(query_cols)] = 1.0
+        query_size = float(len(query_cols))
+        
+        overlap = np.bincount(vectors['rows'], weights=query[vectors['cols']], minlength=n)
+        row_sizes = vectors['row_sizes']
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'jaccard':
+                scores = overlap / (row_sizes + query_size - overlap)
+            elif metric == 'cosine':
+                scores = overlap / np.sqrt(row_sizes * query_size)
+            else:
+                raise ValueError(f"不支持的相似度度量: {metric}（可选 cosine 或 jaccard）")
+        scores = np.nan_to_num(scores, nan=0.0, posinf=0.0)
+        
+        if exclude is not None:
+            scores[exclude] = 0.0
+        
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            top = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+            candidates = candidates[top]
+        # 分数降序，同分按诗歌顺序，保证结果稳定
+        order = np.lexsort((candidates, -scores[candidates]))
+        
+        return [(self.poems_data[i], float(scores[i])) for i in candidates[order]]
+    
+    def find_similar_poems(self, poem_index: int, top_k: int = 10,
+                           metric: str = 'cosine') -> List[Tuple[Dict, float]]:
+        """
+        查找与指定诗歌标签最相近的诗歌（"更多类似"）
+        
+        Args:
+            poem_index: 诗歌在数据中的序号
+            top_k: 返回结果数量
+            metric: 相似度度量 ('cosine' 或 'jaccard')
+            
+        Returns:
+            (诗歌, 相似度) 列表，按相似度降序
+        """
+        if not 0 <= poem_index < len(self.poems_data):
+            return []
+        
+        vectors = self._get_tag_vectors()
+        query_cols = set(vectors['cols'][vectors['rows'] == poem_index].tolist())
+        return self._rank_by_tag_overlap(query_cols, top_k, metric, exclude=poem_index)
+    
+    def search_similar_to_tags(self, tags: List[str], top_k: int = 10,
+                               metric: str = 'cosine') -> List[Tuple[Dict, float]]:
+        """
+        查找与给定标签集合最接近的诗歌
+        
+        Args:
+            tags: 标签列表，格式同 search_by_tags，如 ['scene:春天', 'emotion:喜悦']
+            top_k: 返回结果数量
+            metric: 相似度度量 ('cosine' 或 'jaccard')
+            
+        Returns:
+            (诗歌, 相似度) 列表，按相似度降序
+        """
+        if not self.poems_data:
+            return []
+        
+        vocab_index = self._get_tag_vectors()['vocab_index']
+        tags = [self.canonicalizer.canonicalize_key(tag) for tag in tags]
+        query_cols = {vocab_index[tag] for tag in tags if tag in vocab_index}
+        return self._rank_by_tag_overlap(query_cols, top_k, metric)
+    
+    def find_poem_index(self, title: str, author: Optional[str] = None) -> Optional[int]:
+        """按标题（及作者）查找诗歌序号"""
+        candidates = self.tag_index.get(f'title:{title}', set())
+        if author:
+            candidates = candidates & self.tag_index.get(f'author:{author}', set())
+        return min(candidates) if candidates else None
     
     def get_available_tags(self) -> Dict[str, List[str]]:
         """获取可用的标签列表"""
@@ -218,13 +788,50 @@ class AITagRetriever:
         
         if len(results) > limit:
             print(f"\n... 还有 {len(results) - limit} 首诗歌未显示")
+    
+    def print_search_page(self, page: Dict[str, Any]):
+        """打印分页搜索结果"""
+        if not page['results']:
+            print("未找到匹配的诗歌")
+            return
+        
+        print(f"\n共 {page['total']} 首匹配的诗歌，本页 {len(page['results'])} 首:")
+        
+        for i, poem in enumerate(page['results']):
+            print(f"\n{i+1}. {poem['title']} - {poem['author']}")
+            if 'ai_tags' in poem:
+                tags = poem['ai_tags']
+                print(f"   风格: {', '.join(tags.get('styles', []))}")
+                print(f"   场景: {', '.join(tags.get('scenes', []))}")
+                print(f"   情感: {', '.join(tags.get('emotions', []))}")
+                print(f"   主题: {', '.join(tags.get('themes', []))}")
+                print(f"   关键词: {', '.join(tags.get('keywords', []))}")
+        
+        if page['next_cursor']:
+            print(f"\n下一页: --cursor {page['next_cursor']}")
+    
+    def print_similar_results(self, results: List[Tuple[Dict, float]]):
+        """打印相似度检索结果"""
+        if not results:
+            print("未找到相似的诗歌")
+            return
+        
+        print(f"\n找到 {len(results)} 首相似的诗歌:")
+        
+        for i, (poem, score) in enumerate(results):
+            print(f"\n{i+1}. {poem['title']} - {poem['author']} (相似度: {score:.3f})")
+            if 'ai_tags' in poem:
+                tags = poem['ai_tags']
+                print(f"   风格: {', '.join(tags.get('styles', []))}")
+                print(f"   情感: {', '.join(tags.get('emotions', []))}")
+                print(f"   关键词: {', '.join(tags.get('keywords', []))}")
 
     def interactive_search(self):
         """交互式搜索界面"""
         print("\n交互式标签检索")
         print("="*40)
         
-        if not self.poems_data:
+        if not self.poems_data and not self.watch_folder:
             print("未找到处理后的数据，请先运行批量处理")
             return
         
@@ -232,6 +839,10 @@ class AITagRetriever:
         available_tags = self.get_available_tags()
         
         while True:
+            # 批量处理仍在进行时，载入新完成的分卷
+            if self.watch_folder and self.refresh():
+                available_tags = self.get_available_tags()
+            
             print("\n搜索选项:")
             print("1. 按关键词搜索")
             print("2. 按风格搜索")
@@ -412,12 +1023,23 @@ def main():
     """主函数"""
     parser = argparse.ArgumentParser(description='AI诗歌标签检索工具')
     parser.add_argument('--data', default='website_data/ai_enhanced_poems.json', help='数据文件路径')
+    parser.add_argument('--folder', help='按需加载批量处理输出文件夹中的 ai_enhanced_*.json 分卷（处理进行中也可检索）')
+    parser.add_argument('--cached-shards', type=int, default=4, help='分卷模式下内存中缓存的分卷数量')
+    parser.add_argument('--stream', help='额外载入追加写入的JSONL结果流')
     parser.add_argument('--style', nargs='+', help='按风格搜索')
     parser.add_argument('--scene', nargs='+', help='按场景搜索')
     parser.add_argument('--emotion', nargs='+', help='按情感搜索')
     parser.add_argument('--theme', nargs='+', help='按主题搜索')
     parser.add_argument('--keyword', nargs='+', help='按关键词搜索')
-    parser.add_argument('--limit', type=int, default=10, help='显示结果数量限制')
+    parser.add_argument('--limit', type=int, default=10, help='显示结果数量限制（每页数量）')
+    parser.add_argument('--sort', choices=SORT_ORDERS, default='volume', help='结果排序: 卷次/作者/标签匹配数')
+    parser.add_argument('--cursor', help='上一页输出的分页游标')
+    parser.add_argument('--similar-to', help='查找与指定标题诗歌相似的诗歌')
+    parser.add_argument('--similar-author', help='配合 --similar-to 指定作者')
+    parser.add_argument('--like-tags', nargs='+', help='查找与给定标签最接近的诗歌，如 scene:春天 emotion:喜悦')
+    parser.add_argument('--metric', choices=['cosine', 'jaccard'], default='cosine', help='相似度度量')
+    parser.add_argument('--aliases', default=DEFAULT_ALIAS_FILE, help='标签别名表路径')
+    parser.add_argument('--no-aliases', action='store_true', help='不归并近义标签，只做空白和字形规范化')
     parser.add_argument('--demo', action='store_true', help='运行演示')
     
     args = parser.parse_args()
@@ -427,11 +1049,34 @@ def main():
         return
     
     # 创建检索器
-    retriever = AITagRetriever(args.data)
+    alias_file = None if args.no_aliases else args.aliases
+    if args.folder:
+        retriever = AITagRetriever(None, watch_folder=args.folder, max_cached_shards=args.cached_shards,
+                                   alias_file=alias_file)
+    else:
+        retriever = AITagRetriever(args.data, alias_file=alias_file)
+    
+    if args.stream:
+        retriever.ingest_jsonl(args.stream)
     
     if not retriever.poems_data:
         return
     
+    # 相似度检索
+    if args.similar_to:
+        poem_index = retriever.find_poem_index(args.similar_to, args.similar_author)
+        if poem_index is None:
+            print(f"未找到诗歌: {args.similar_to}")
+            return
+        results = retriever.find_similar_poems(poem_index, args.limit, args.metric)
+        retriever.print_similar_results(results)
+        return
+    
+    if args.like_tags:
+        results = retriever.search_similar_to_tags(args.like_tags, args.limit, args.metric)
+        retriever.print_similar_results(results)
+        return
+    
     # 构建搜索条件
     criteria = {}
     if args.style:
@@ -447,13 +1092,20 @@ def main():
     
     # 执行搜索
     if criteria:
-        results = retriever.search_combined(criteria)
-        retriever.print_search_results(results, args.limit)
+        try:
+            page = retriever.search_page(retriever.criteria_to_tags(criteria), 'AND', args.sort,
+                                         args.limit, args.cursor)
+        except ValueError as e:
+            print(e)
+            return
+        retriever.print_search_page(page)
     else:
         print("请提供搜索条件，或使用 --demo 查看演示")
         print("\n使用示例:")
         print("  python ai_tag_retriever.py --style 豪放 --scene 山水")
         print("  python ai_tag_retriever.py --emotion 忧愁 --keyword 明月")
+        print("  python ai_tag_retriever.py --similar-to 静夜思 --similar-author 李白")
+        print("  python ai_tag_retriever.py --like-tags scene:春天 emotion:喜悦 --metric jaccard")
         print("  python ai_tag_retriever.py --demo")
 
 if __name__ == "__main__":
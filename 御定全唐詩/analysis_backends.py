@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析后端
+AIPoemAnalyzer 通过后端把提示词转换为分析结果（JSON文本）。除DeepSeek API及兼容OpenAI接口的
+本地服务（DeepSeekAPIClient）外，还提供进程内的规则分析后端和固定结果的模拟后端，
+用于在没有网络延迟的情况下测量批处理流程本身（读写、解析、进度记录）的开销
+"""
+
+import json
+import time
+import asyncio
+import threading
+import logging
+from functools import partial
+from typing import List, Dict, Any, Optional
+from rate_limiter import RateLimiter
+from api_metrics import APIMetrics
+from simple_poem_analyzer import SimplePoemAnalyzer
+from mock_deepseek_server import (PACKED_POEM_PATTERN, SINGLE_POEM_PATTERN, COMPACT_SCHEMA_MARKER,
+                                  mock_analysis)
+
+logger = logging.getLogger(__name__)
+
+# 通过HTTP调用的后端（DeepSeekAPIClient），openai 为兼容OpenAI接口的其他服务（如本地部署的模型）
+HTTP_BACKENDS = ('deepseek', 'openai')
+
+# 进程内的后端，不访问网络
+LOCAL_BACKENDS = ('rules', 'stub')
+
+BACKENDS = HTTP_BACKENDS + LOCAL_BACKENDS
+
+class AnalysisBackend:
+    """分析后端接口"""
+
+    name = 'backend'
+    rate_limiter = None
+
+    def chat_completion(self, messages: List[Dict], model: str = "deepseek-chat",
+                        temperature: float = 0.3, max_tokens: int = 2000,
+                        metrics_context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        根据消息列表生成回复
+
+        Args:
+            messages: 消息列表（系统消息为分析要求，最后一条用户消息为诗歌）
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大token数
+            metrics_context: 随本次调用一起记录到指标中的字段（如诗歌数、字数）
+
+        Returns:
+            回复内容，失败时返回None
+        """
+        raise NotImplementedError
+
+    async def chat_completion_async(self, messages: List[Dict], model: str = "deepseek-chat",
+                                    temperature: float = 0.3, max_tokens: int = 2000,
+                                    metrics_context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """chat_completion 的异步版本，默认在线程池中执行同步调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(self.chat_completion, messages, model,
+                                                        temperature, max_tokens, metrics_context))
+
+    def get_last_error(self) -> Optional[Dict[str, Any]]:
+        """当前线程最近一次调用失败的原因，成功时为None"""
+        return None
+
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """获取连接统计"""
+        return {'transport': self.name, 'pool_size': 0, 'requests': 0,
+                'connections_opened': 0, 'connection_reuse_rate': 0.0}
+
+    def get_retry_stats(self) -> Dict[str, Any]:
+        """获取重试统计"""
+        return {'retries': 0}
+
+    def close(self):
+        """释放资源"""
+
+
+class LocalBackend(AnalysisBackend):
+    """进程内后端的基类：从用户消息中解析诗歌，逐首生成分析结果"""
+
+    name = 'local'
+
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, metrics: Optional[APIMetrics] = None):
+        """
+        初始化本地后端
+
+        Args:
+            rate_limiter: 共享的限流器（可用于模拟服务端限速），为None时不限流
+            metrics: 共享的指标收集器，记录请求数和耗时（不记录token数，不产生费用）
+        """
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self._stats_lock = threading.Lock()
+        self._request_count = 0
+
+    def analyze(self, title: str, author: str, content: str, compact: bool) -> Dict[str, Any]:
+        """
+        分析一首诗歌
+
+        Args:
+            title: 标题
+            author: 作者
+            content: 内容
+            compact: 系统提示词是否要求短键的紧凑格式
+
+        Returns:
+            分析结果（完整字段名或短键）
+        """
+        raise NotImplementedError
+
+    def chat_completion(self, messages: List[Dict], model: str = "deepseek-chat",
+                        temperature: float = 0.3, max_tokens: int = 2000,
+                        metrics_context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """解析用户消息中的单首或打包诗歌，返回与API相同格式的JSON文本"""
+        start = time.perf_counter()
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        with self._stats_lock:
+            self._request_count += 1
+
+        prompt = messages[-1].get('content', '') if messages else ''
+        compact = len(messages) > 1 and COMPACT_SCHEMA_MARKER in messages[0].get('content', '')
+        packed = PACKED_POEM_PATTERN.findall(prompt)
+        if packed:
+            results = []
+            for number, title, author, content in packed:
+                analysis = self.analyze(title, author, content, compact)
+                analysis['id'] = int(number)
+                results.append(analysis)
+            response = json.dumps(results, ensure_ascii=False)
+        else:
+            match = SINGLE_POEM_PATTERN.search(prompt)
+            title, author, content = match.groups() if match else ('', '', prompt)
+            response = json.dumps(self.analyze(title, author, content, compact), ensure_ascii=False)
+
+        if self.metrics:
+            # 字数只用于与API结果对比，不作为token计入费用
+            self.metrics.record_request(time.perf_counter() - start, 1, True, model=model,
+                                        prompt_chars=sum(len(m.get('content', '')) for m in messages),
+                                        completion_chars=len(response), **(metrics_context or {}))
+        return response
+
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """获取请求统计（本地后端没有网络连接）"""
+        with self._stats_lock:
+            requests_sent = self._request_count
+        return {'transport': self.name, 'pool_size': 0, 'requests': requests_sent,
+                'connections_opened': 0, 'connection_reuse_rate': 1.0 if requests_sent else 0.0}
+
+
+class StubBackend(LocalBackend):
+    """模拟后端 - 与 mock_deepseek_server.py 相同的固定结果，但不经过HTTP"""
+
+    name = 'stub'
+
+    def analyze(self, title: str, author: str, content: str, compact: bool) -> Dict[str, Any]:
+        return mock_analysis(title, author, content, compact)
+
+
+class RuleBasedBackend(LocalBackend):
+    """规则分析后端 - 使用基于关键词的 PoemAnalyzer（未安装jieba时使用 SimplePoemAnalyzer）"""
+
+    name = 'rules'
+
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None, metrics: Optional[APIMetrics] = None):
+        super().__init__(rate_limiter=rate_limiter, metrics=metrics)
+        try:
+            from poem_analyzer import PoemAnalyzer  # 依赖jieba
+            self.analyzer = PoemAnalyzer()
+        except ImportError:
+            logger.warning("未安装jieba，规则分析后端使用 SimplePoemAnalyzer")
+            self.analyzer = SimplePoemAnalyzer()
+
+    def analyze(self, title: str, author: str, content: str, compact: bool) -> Dict[str, Any]:
+        # 始终返回完整字段名，分析器对完整字段名不做展开
+        analysis = self.analyzer.analyze_poem({'title': title, 'author': author,
+                                               'paragraphs': content.split('\n')})
+        return {
+            'styles': analysis.get('styles', []),
+            'scenes': analysis.get('scenes', []),
+            'emotions': analysis.get('emotions', []),
+            'themes': analysis.get('themes', []),
+            'rhetoric': analysis.get('rhetoric', []),
+            'keywords': analysis.get('keywords', []),
+            'artistic_description': ''
+        }
+
+
+def create_local_backend(name: str, rate_limiter: Optional[RateLimiter] = None,
+                         metrics: Optional[APIMetrics] = None) -> LocalBackend:
+    """
+    创建进程内的分析后端
+
+    Args:
+        name: 后端名称（rules / stub）
+        rate_limiter: 共享的限流器
+        metrics: 共享的指标收集器
+
+    Returns:
+        分析后端
+    """
+    backends = {'rules': RuleBasedBackend, 'stub': StubBackend}
+    if name not in backends:
+        raise ValueError(f"未知的本地分析后端: {name}（可选: {', '.join(backends)}）")
+    return backends[name](rate_limiter=rate_limiter, metrics=metrics)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI分析结果缓存
+以 (模型, 提示词版本, 标题, 作者, 内容) 的哈希为键，将DeepSeek分析结果持久化到SQLite，
+重跑、崩溃后续跑以及重复诗歌都直接命中缓存，不再调用API
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class AnalysisCache:
+    """基于SQLite的分析结果缓存（可跨线程共享）"""
+
+    def __init__(self, cache_file: str = "analysis_cache.sqlite3", max_entries: int = 200000):
+        """
+        初始化缓存
+
+        Args:
+            cache_file: SQLite数据库文件路径
+            max_entries: 最大缓存条目数，超出时淘汰最久未使用的条目
+        """
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON analysis_cache(last_access)")
+        self._conn.commit()
+
+        self._entry_count = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, prompt_version: str, title: str, author: str, content: str) -> str:
+        """
+        生成缓存键
+
+        Args:
+            model: 模型名称
+            prompt_version: 提示词模板版本
+            title: 诗歌标题
+            author: 作者
+            content: 诗歌内容
+
+        Returns:
+            SHA-256 十六进制摘要
+        """
+        payload = json.dumps([model, prompt_version, title, author, content], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的分析结果，未命中时返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE analysis_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def contains(self, key: str) -> bool:
+        """检查缓存中是否有该键（不计入命中统计）"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            value: 分析结果
+        """
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            if not exists:
+                self._entry_count += 1
+            if self._entry_count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """淘汰最久未使用的条目，多淘汰约1%避免每次写入都触发淘汰"""
+        excess = self._entry_count - self.max_entries + max(1, self.max_entries // 100)
+        self._conn.execute(
+            "DELETE FROM analysis_cache WHERE key IN "
+            "(SELECT key FROM analysis_cache ORDER BY last_access LIMIT ?)",
+            (excess,)
+        )
+        self.evictions += excess
+        self._entry_count = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+        logger.info(f"分析缓存已淘汰 {excess} 条最久未使用的记录")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            'cache_file': self.cache_file,
+            'entries': self._entry_count,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
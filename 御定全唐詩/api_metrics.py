@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API调用指标
+记录每次分析请求的token用量、耗时、重试次数和缓存命中，逐条追加到JSONL指标文件，
+并汇总为延迟直方图、按诗歌长度分组的每首token数和费用估算，用于调整并发数和提示词长度
+"""
+
+import time
+import threading
+import logging
+from typing import List, Dict, Any, Optional
+from jsonl_stream import JSONLStreamWriter, iter_jsonl
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的桶上限（毫秒），最后一个桶收集更慢的请求
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+
+# 按诗歌字数分组统计每首诗的token数
+POEM_LENGTH_BUCKETS = (32, 64, 128, 256, 512)
+
+# 每百万token的价格（元），按官网价格调整
+DEFAULT_PRICES = {
+    'prompt_cache_hit': 0.2,
+    'prompt_cache_miss': 2.0,
+    'completion': 3.0
+}
+
+def _bucket_label(value: float, bounds: tuple) -> str:
+    """返回数值所在桶的标签，如 "<=500"，超出最后一个上限时为 ">30000" """
+    for bound in bounds:
+        if value <= bound:
+            return f"<={bound}"
+    return f">{bounds[-1]}"
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """最近秩法计算百分位数（输入已排序）"""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int, prompt_cache_hit_tokens: int = 0,
+                  prices: Optional[Dict[str, float]] = None) -> float:
+    """
+    按token数估算费用（元）
+
+    Args:
+        prompt_tokens: 输入token数（含缓存命中部分）
+        completion_tokens: 输出token数
+        prompt_cache_hit_tokens: 输入中命中上下文缓存的token数
+        prices: 每百万token的价格（元），默认 DEFAULT_PRICES
+
+    Returns:
+        估算费用
+    """
+    prices = dict(DEFAULT_PRICES, **(prices or {}))
+    return (prompt_cache_hit_tokens * prices['prompt_cache_hit'] +
+            (prompt_tokens - prompt_cache_hit_tokens) * prices['prompt_cache_miss'] +
+            completion_tokens * prices['completion']) / 1_000_000
+
+
+class APIMetrics:
+    """API调用指标收集器（可跨线程共享）"""
+
+    def __init__(self, metrics_file: Optional[str] = None, prices: Optional[Dict[str, float]] = None,
+                 truncate: bool = True):
+        """
+        初始化指标收集器
+
+        Args:
+            metrics_file: 逐条记录的JSONL指标文件，为None时只在内存中汇总
+            prices: 每百万token的价格（元），默认 DEFAULT_PRICES
+            truncate: 是否清空已有的指标文件（恢复处理时追加）
+        """
+        self.metrics_file = metrics_file
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self._lock = threading.Lock()
+        self._writer = JSONLStreamWriter(metrics_file, truncate=truncate) if metrics_file else None
+
+        self.requests = 0
+        self.failed_requests = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.prompt_cache_hit_tokens = 0
+        self.latencies = []
+        self.by_length = {}
+        # 对冲中未采用的请求（结果被丢弃，但token照常计费）
+        self.discarded_requests = 0
+        self.discarded_prompt_tokens = 0
+        self.discarded_completion_tokens = 0
+        self.discarded_cache_hit_tokens = 0
+
+    def record_request(self, latency: float, attempts: int, success: bool,
+                       usage: Optional[Dict[str, Any]] = None, model: Optional[str] = None,
+                       poems: int = 0, poem_chars: int = 0, **extra):
+        """
+        记录一次API请求（含重试，耗时为从首次发送到最终返回的总时间）
+
+        Args:
+            latency: 总耗时（秒）
+            attempts: 发送次数（1为未重试）
+            success: 是否得到响应内容
+            usage: 响应中的 usage 字段
+            model: 模型名称
+            poems: 本次请求分析的诗歌数（打包请求大于1）
+            poem_chars: 这些诗歌的总字数
+            **extra: 其他需要记录的字段
+        """
+        usage = usage or {}
+        record = {
+            'time': time.time(),
+            'type': 'request',
+            'model': model,
+            'latency_ms': round(latency * 1000, 1),
+            'attempts': attempts,
+            'success': success,
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+            'prompt_cache_hit_tokens': usage.get('prompt_cache_hit_tokens', 0),
+            'poems': poems,
+            'poem_chars': poem_chars
+        }
+        record.update(extra)
+        self._add(record)
+
+    def record_cache_hit(self, poem_chars: int = 0):
+        """
+        记录一次分析缓存命中（未调用API）
+
+        Args:
+            poem_chars: 诗歌字数
+        """
+        self._add({'time': time.time(), 'type': 'cache_hit', 'poems': 1, 'poem_chars': poem_chars})
+
+    def record_discarded(self, usage: Dict[str, Any], model: Optional[str] = None):
+        """
+        记录一次结果被丢弃的请求（对冲中较晚返回的一方），token数计入总量和费用
+
+        Args:
+            usage: 响应中的 usage 字段
+            model: 模型名称
+        """
+        self._add({
+            'time': time.time(),
+            'type': 'discarded',
+            'model': model,
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+            'prompt_cache_hit_tokens': usage.get('prompt_cache_hit_tokens', 0)
+        })
+
+    def _add(self, record: Dict[str, Any]):
+        """汇总并写入一条记录"""
+        with self._lock:
+            self._aggregate(record)
+        if self._writer:
+            self._writer.write(record)
+
+    def _aggregate(self, record: Dict[str, Any]):
+        """将一条记录计入汇总（调用方持有锁）"""
+        if record.get('type') == 'cache_hit':
+            self.cache_hits += 1
+            return
+        if record.get('type') == 'discarded':
+            # 不计入请求数和延迟，只计入token总量
+            self.discarded_requests += 1
+            self.discarded_prompt_tokens += record.get('prompt_tokens', 0)
+            self.discarded_completion_tokens += record.get('completion_tokens', 0)
+            self.discarded_cache_hit_tokens += record.get('prompt_cache_hit_tokens', 0)
+            self.prompt_tokens += record.get('prompt_tokens', 0)
+            self.completion_tokens += record.get('completion_tokens', 0)
+            self.prompt_cache_hit_tokens += record.get('prompt_cache_hit_tokens', 0)
+            return
+
+        self.requests += 1
+        if not record.get('success'):
+            self.failed_requests += 1
+        self.retries += max(0, record.get('attempts', 1) - 1)
+        self.prompt_tokens += record.get('prompt_tokens', 0)
+        self.completion_tokens += record.get('completion_tokens', 0)
+        self.prompt_cache_hit_tokens += record.get('prompt_cache_hit_tokens', 0)
+        self.latencies.append(record.get('latency_ms', 0.0))
+
+        poems = record.get('poems', 0)
+        if poems and record.get('success'):
+            # 打包请求按平均每首字数分组
+            label = _bucket_label(record.get('poem_chars', 0) / poems, POEM_LENGTH_BUCKETS)
+            group = self.by_length.setdefault(label, {'requests': 0, 'poems': 0,
+                                                      'prompt_tokens': 0, 'completion_tokens': 0})
+            group['requests'] += 1
+            group['poems'] += poems
+            group['prompt_tokens'] += record.get('prompt_tokens', 0)
+            group['completion_tokens'] += record.get('completion_tokens', 0)
+
+    @classmethod
+    def from_files(cls, metrics_files: List[str], prices: Optional[Dict[str, float]] = None) -> 'APIMetrics':
+        """
+        从指标文件重新汇总（例如合并多个分片的指标）
+
+        Args:
+            metrics_files: JSONL指标文件路径
+            prices: 每百万token的价格（元）
+
+        Returns:
+            只在内存中汇总的指标收集器
+        """
+        metrics = cls(prices=prices)
+        for metrics_file in metrics_files:
+            for record in iter_jsonl(metrics_file):
+                metrics._aggregate(record)
+        return metrics
+
+    def estimate_cost(self) -> float:
+        """按 usage 中的token数估算费用（元）"""
+        return estimate_cost(self.prompt_tokens, self.completion_tokens,
+                             self.prompt_cache_hit_tokens, self.prices)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取汇总指标"""
+        with self._lock:
+            ordered = sorted(self.latencies)
+            histogram = {_bucket_label(bound, LATENCY_BUCKETS_MS): 0 for bound in LATENCY_BUCKETS_MS}
+            histogram[f">{LATENCY_BUCKETS_MS[-1]}"] = 0
+            for latency in ordered:
+                histogram[_bucket_label(latency, LATENCY_BUCKETS_MS)] += 1
+
+            tokens_by_length = {}
+            for bound in POEM_LENGTH_BUCKETS + (None,):
+                label = f"<={bound}" if bound else f">{POEM_LENGTH_BUCKETS[-1]}"
+                group = self.by_length.get(label)
+                if not group:
+                    continue
+                tokens_by_length[label] = dict(group, tokens_per_poem=round(
+                    (group['prompt_tokens'] + group['completion_tokens']) / group['poems'], 1))
+
+            poems = sum(group['poems'] for group in self.by_length.values())
+            return {
+                'requests': self.requests,
+                'failed_requests': self.failed_requests,
+                'retries': self.retries,
+                'cache_hits': self.cache_hits,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'prompt_cache_hit_tokens': self.prompt_cache_hit_tokens,
+                'tokens_per_poem': round((self.prompt_tokens + self.completion_tokens) / poems, 1) if poems else 0.0,
+                'estimated_cost': round(self.estimate_cost(), 4),
+                'discarded': {
+                    'requests': self.discarded_requests,
+                    'prompt_tokens': self.discarded_prompt_tokens,
+                    'completion_tokens': self.discarded_completion_tokens,
+                    'estimated_cost': round(estimate_cost(self.discarded_prompt_tokens,
+                                                          self.discarded_completion_tokens,
+                                                          self.discarded_cache_hit_tokens, self.prices), 4)
+                },
+                'latency_ms': {
+                    'p50': _percentile(ordered, 50),
+                    'p95': _percentile(ordered, 95),
+                    'p99': _percentile(ordered, 99),
+                    'max': ordered[-1] if ordered else 0.0,
+                    'histogram': histogram
+                },
+                'tokens_by_poem_length': tokens_by_length
+            }
+
+    def flush(self):
+        """指标文件落盘"""
+        if self._writer:
+            self._writer.flush()
+
+    def close(self):
+        """关闭指标文件"""
+        if self._writer:
+            self._writer.close()
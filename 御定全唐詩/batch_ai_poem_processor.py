@@ -11,7 +11,11 @@ import time
 import argparse
 import logging
 from typing import List, Dict, Any
-from deepseek_poem_analyzer import AIPoemAnalyzer
+from deepseek_poem_analyzer import AIPoemAnalyzer, DEFAULT_BASE_URL, DEFAULT_MODEL
+from analysis_backends import BACKENDS
+from rate_limiter import RateLimiter
+from analysis_cache import AnalysisCache
+from cascade_analyzer import LocalCascade
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -31,14 +35,33 @@ logger = logging.getLogger(__name__)
 class BatchPoemProcessor:
     """批量诗歌处理器"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, pool_size: int = 16, http2: bool = False,
+                 rate_limiter: RateLimiter = None, cache: AnalysisCache = None,
+                 base_url: str = DEFAULT_BASE_URL, cascade: LocalCascade = None,
+                 compact_schema: bool = False, backend: str = 'deepseek',
+                 model: str = DEFAULT_MODEL):
         """
         初始化批量处理器
         
         Args:
             api_key: DeepSeek API密钥
+            pool_size: HTTP连接池大小（建议不小于并发数）
+            http2: 是否尝试使用HTTP/2
+            rate_limiter: 所有请求共享的限流器，为None时按 delay 分批休眠
+            cache: 分析结果缓存
+            base_url: API基础URL
+            cascade: 本地分析器级联，本地分析置信度足够的诗歌不调用API
+            compact_schema: 是否使用短键的紧凑返回格式，减少输出token
+            backend: 分析后端（deepseek / openai / rules / stub）
+            model: 模型名称
         """
-        self.analyzer = AIPoemAnalyzer(api_key)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.cascade = cascade
+        self.analyzer = AIPoemAnalyzer(api_key, pool_size=pool_size, http2=http2,
+                                       rate_limiter=rate_limiter, cache=cache, base_url=base_url,
+                                       cascade=cascade, compact=compact_schema,
+                                       backend=backend, model=model)
         
     def load_poems_data(self, input_file: str = "website_data/poems_data.json") -> List[Dict]:
         """
@@ -66,7 +89,9 @@ class BatchPoemProcessor:
                      start_index: int = 0,
                      end_index: int = None,
                      batch_size: int = 20,
-                     delay: float = 1.0) -> List[Dict]:
+                     delay: float = 1.0,
+                     concurrency: int = 1,
+                     pack_size: int = 1) -> List[Dict]:
         """
         处理诗歌数据
         
@@ -76,6 +101,8 @@ class BatchPoemProcessor:
             end_index: 结束索引
             batch_size: 批次大小
             delay: 请求间隔
+            concurrency: 并发请求数（大于1时使用并发分析）
+            pack_size: 每次请求打包的短诗数量（1为逐首请求）
             
         Returns:
             处理后的诗歌数据
@@ -87,14 +114,26 @@ class BatchPoemProcessor:
         total_to_process = len(poems_to_process)
         
         logger.info(f"开始处理诗歌 {start_index} 到 {end_index}，共 {total_to_process} 首")
-        logger.info(f"批次大小: {batch_size}, 请求间隔: {delay}秒")
-        
         # 批量分析
-        processed_poems = self.analyzer.batch_analyze(
-            poems_to_process, 
-            batch_size=batch_size, 
-            delay=delay
-        )
+        if concurrency > 1:
+            logger.info(f"并发请求数: {concurrency}")
+            processed_poems = self.analyzer.batch_analyze_concurrent(
+                poems_to_process,
+                concurrency=concurrency,
+                pack_size=pack_size
+            )
+        else:
+            if self.rate_limiter:
+                logger.info(f"限流: {self.rate_limiter.requests_per_second} 请求/秒, "
+                            f"{self.rate_limiter.tokens_per_minute} token/分钟")
+            else:
+                logger.info(f"批次大小: {batch_size}, 请求间隔: {delay}秒")
+            processed_poems = self.analyzer.batch_analyze(
+                poems_to_process, 
+                batch_size=batch_size, 
+                delay=delay,
+                pack_size=pack_size
+            )
         
         return processed_poems
     
@@ -239,13 +278,31 @@ def main():
     parser.add_argument('--start', type=int, default=0, help='开始索引')
     parser.add_argument('--end', type=int, help='结束索引')
     parser.add_argument('--batch-size', type=int, default=20, help='批次大小')
-    parser.add_argument('--delay', type=float, default=1.0, help='请求间隔（秒）')
+    parser.add_argument('--delay', type=float, default=1.0, help='请求间隔（秒），未设置 --rps/--tpm 时使用')
+    parser.add_argument('--rps', type=float, help='每秒请求数上限（设置后使用令牌桶限流代替 --delay）')
+    parser.add_argument('--tpm', type=float, help='每分钟token数上限')
+    parser.add_argument('--concurrency', type=int, default=1, help='并发请求数（如16~64，默认1为逐首处理）')
+    parser.add_argument('--pack-size', type=int, default=1, help='每次请求打包的短诗数量（如4~8，默认1为逐首请求）')
+    parser.add_argument('--pool-size', type=int, help='HTTP连接池大小（默认取并发数与16中的较大值）')
+    parser.add_argument('--backend', choices=BACKENDS, default='deepseek',
+                        help='分析后端：deepseek（默认）、openai（兼容OpenAI接口的其他服务）、rules（规则分析）、stub（固定结果）')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help=f'模型名称（默认 {DEFAULT_MODEL}）')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='API地址（可指向本地模拟服务器）')
+    parser.add_argument('--http2', action='store_true', help='使用HTTP/2（需要 pip install httpx[http2]）')
+    parser.add_argument('--cache-file', default='analysis_cache.sqlite3', help='分析结果缓存文件')
+    parser.add_argument('--cache-max-entries', type=int, default=200000, help='缓存最大条目数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用分析结果缓存')
+    parser.add_argument('--cascade', action='store_true', help='先用本地关键词分析器打标签，只把置信度低的诗歌发送给API')
+    parser.add_argument('--cascade-threshold', type=float, default=0.6, help='本地分析置信度阈值（0~1，默认0.6，越低调用API越少）')
+    parser.add_argument('--compact-schema', action='store_true', help='要求API使用短键的紧凑返回格式（意境描述限30字），减少输出token')
     parser.add_argument('--sample', type=int, help='样本大小（测试用）')
     
     args = parser.parse_args()
     
     # 获取API密钥
     api_key = args.api_key or os.getenv('DEEPSEEK_API_KEY')
+    if not api_key and args.backend != 'deepseek':
+        api_key = 'EMPTY'
     if not api_key:
         print("请提供DeepSeek API密钥")
         print("使用方法:")
@@ -256,7 +313,17 @@ def main():
     
     try:
         # 创建处理器
-        processor = BatchPoemProcessor(api_key)
+        pool_size = args.pool_size or max(args.concurrency, 16)
+        rate_limiter = None
+        if args.rps or args.tpm:
+            rate_limiter = RateLimiter(requests_per_second=args.rps, tokens_per_minute=args.tpm)
+        cache = None if args.no_cache else AnalysisCache(args.cache_file, args.cache_max_entries)
+        cascade = LocalCascade(args.cascade_threshold) if args.cascade else None
+        processor = BatchPoemProcessor(api_key, pool_size=pool_size, http2=args.http2,
+                                       rate_limiter=rate_limiter, cache=cache,
+                                       base_url=args.base_url, cascade=cascade,
+                                       compact_schema=args.compact_schema,
+                                       backend=args.backend, model=args.model)
         
         # 加载数据
         poems_data = processor.load_poems_data(args.input)
@@ -272,7 +339,9 @@ def main():
             start_index=args.start,
             end_index=args.end,
             batch_size=args.batch_size,
-            delay=args.delay
+            delay=args.delay,
+            concurrency=args.concurrency,
+            pack_size=args.pack_size
         )
         
         # 保存结果
@@ -280,10 +349,31 @@ def main():
         
         # 生成统计
         stats = processor.generate_comprehensive_statistics(processed_poems)
+        stats['connection_statistics'] = processor.analyzer.api_client.get_connection_stats()
+        stats['retry_statistics'] = processor.analyzer.api_client.get_retry_stats()
+        stats['failed_poems'] = list(processor.analyzer.failures.values())
+        if rate_limiter:
+            stats['rate_limit_statistics'] = rate_limiter.get_stats()
+        if cache:
+            stats['cache_statistics'] = cache.get_stats()
+        if cascade:
+            stats['cascade_statistics'] = cascade.get_stats()
         processor.save_statistics(stats)
         
         # 打印摘要
         processor.print_statistics_summary(stats)
+        if cache:
+            cache_stats = stats['cache_statistics']
+            print(f"\n分析缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} "
+                  f"(命中率 {cache_stats['hit_rate']*100:.1f}%)")
+        if cascade:
+            cascade_stats = stats['cascade_statistics']
+            print(f"\n本地分析级联: {cascade_stats['local_accepted']}/{cascade_stats['checked']} 首使用本地结果 "
+                  f"(减少API调用 {cascade_stats['api_calls_avoided_rate']*100:.1f}%)")
+        
+        if stats['failed_poems']:
+            print(f"\n分析失败: {len(stats['failed_poems'])} 首诗歌（结果中已标记 ai_failure），"
+                  f"重试 {stats['retry_statistics']['retries']} 次")
         
         print(f"\n批量处理完成！")
         print(f"增强数据: {args.output}")
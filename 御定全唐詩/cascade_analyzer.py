@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地分析器级联
+先用本地关键词分析器（SimplePoemAnalyzer，或同样带关键词库的 PoemAnalyzer）为诗歌打标签，
+按关键词命中强度计算置信度，只有置信度低于阈值的诗歌才调用DeepSeek API
+"""
+
+import math
+import threading
+import logging
+from typing import Dict, Any, Optional, Tuple
+from simple_poem_analyzer import SimplePoemAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# 参与置信度计算的维度：分析结果字段 -> 本地分析器的关键词库属性
+CONFIDENCE_DIMENSIONS = {
+    'styles': 'style_keywords',
+    'scenes': 'scene_keywords',
+    'emotions': 'emotion_keywords',
+    'themes': 'theme_keywords'
+}
+
+# 关键词命中次数达到该值附近时命中强度接近饱和
+HIT_SATURATION = 3.0
+
+class LocalCascade:
+    """本地分析器级联（可跨线程共享）"""
+
+    def __init__(self, threshold: float = 0.6, local_analyzer: Any = None):
+        """
+        初始化级联
+
+        Args:
+            threshold: 置信度阈值（0~1），达到阈值的诗歌直接使用本地分析结果
+            local_analyzer: 本地分析器，默认使用不依赖第三方库的 SimplePoemAnalyzer
+        """
+        self.threshold = threshold
+        self.local_analyzer = local_analyzer or SimplePoemAnalyzer()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.checked = 0
+        self.accepted = 0
+        self.confidence_histogram = [0] * 10
+
+    def score(self, poem_data: Dict[str, Any]) -> Tuple[float, Dict[str, float]]:
+        """
+        计算本地分析的置信度
+
+        每个维度取得分最高的类别：命中次数越多、与第二名差距越大，置信度越高；
+        某个维度没有命中任何关键词时该维度置信度为0。总置信度为各维度的平均值。
+
+        Args:
+            poem_data: 诗歌数据
+
+        Returns:
+            (总置信度, 各维度置信度)
+        """
+        content = ' '.join(poem_data.get('paragraphs', []))
+        dimensions = {}
+        for field, attribute in CONFIDENCE_DIMENSIONS.items():
+            keyword_table = getattr(self.local_analyzer, attribute)
+            scores = sorted((sum(content.count(keyword) for keyword in keywords)
+                             for keywords in keyword_table.values()), reverse=True)
+            top = scores[0] if scores else 0
+            if top == 0:
+                dimensions[field] = 0.0
+                continue
+            second = scores[1] if len(scores) > 1 else 0
+            strength = 1 - math.exp(-top / HIT_SATURATION)
+            margin = (top - second) / top
+            dimensions[field] = round(strength * (0.5 + 0.5 * margin), 3)
+
+        confidence = sum(dimensions.values()) / len(dimensions)
+        return round(confidence, 3), dimensions
+
+    def try_local(self, poem_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        尝试用本地分析器分析诗歌
+
+        Args:
+            poem_data: 诗歌数据
+
+        Returns:
+            置信度达到阈值时返回分析结果（与API结果格式相同，附带 analysis_source 和 confidence），
+            否则返回None，需要调用API
+        """
+        confidence, dimensions = self.score(poem_data)
+        accepted = confidence >= self.threshold
+        with self._lock:
+            self.checked += 1
+            self.confidence_histogram[min(9, int(confidence * 10))] += 1
+            if accepted:
+                self.accepted += 1
+        if not accepted:
+            return None
+
+        analysis = self.local_analyzer.analyze_poem(poem_data)
+        content = '\n'.join(poem_data.get('paragraphs', []))
+        return {
+            'title': analysis.get('title', ''),
+            'author': analysis.get('author', ''),
+            'styles': analysis.get('styles', []),
+            'scenes': analysis.get('scenes', []),
+            'emotions': analysis.get('emotions', []),
+            'themes': analysis.get('themes', []),
+            'rhetoric': analysis.get('rhetoric', []),
+            'keywords': analysis.get('keywords', []),
+            'artistic_description': '',
+            'content_preview': content[:100] + '...' if len(content) > 100 else content,
+            'analysis_source': 'local',
+            'confidence': confidence,
+            'confidence_dimensions': dimensions
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取级联统计"""
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'checked': self.checked,
+                'local_accepted': self.accepted,
+                'sent_to_api': self.checked - self.accepted,
+                'api_calls_avoided_rate': self.accepted / self.checked if self.checked else 0.0,
+                'confidence_histogram': {
+                    f"{i / 10:.1f}-{(i + 1) / 10:.1f}": count
+                    for i, count in enumerate(self.confidence_histogram)
+                }
+            }
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+处理前的token和费用预估（不调用API）
+逐个文件流式读取选定范围内的诗歌，按文本长度近似估算每次请求的输入/输出token数，
+扣除缓存命中、重复诗歌和本地级联分析的诗歌，给出预计请求数、token数、费用和耗时
+"""
+
+import json
+import math
+import logging
+from typing import List, Dict, Any, Optional
+from analysis_cache import AnalysisCache
+from api_metrics import estimate_cost
+from analysis_backends import LocalBackend
+
+logger = logging.getLogger(__name__)
+
+# DeepSeek分词的近似比例：1个中文字符约0.6个token，1个英文字符约0.3个token
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+
+# 每条消息的格式开销（token）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# 每首诗的预计输出token数（完整格式含意境描述，紧凑格式为短键和30字以内的描述）
+COMPLETION_TOKENS_PER_POEM = 180
+COMPACT_COMPLETION_TOKENS_PER_POEM = 90
+
+# 前缀缓存的粒度（token），系统提示词按该粒度向下取整计为命中
+PREFIX_CACHE_UNIT = 64
+
+# 单次请求的耗时模型：固定开销 + 输出token数 / 生成速度
+REQUEST_OVERHEAD_SECONDS = 1.0
+OUTPUT_TOKENS_PER_SECOND = 30.0
+
+def approx_tokens(text: str) -> int:
+    """
+    离线近似计算文本的token数
+
+    Args:
+        text: 文本
+
+    Returns:
+        近似token数
+    """
+    # CJK标点、汉字、兼容汉字、全角符号和扩展区汉字
+    cjk = sum(1 for char in text if '\u3000' <= char <= '\u9fff' or '\uf900' <= char <= '\uffef'
+              or char >= '\U00020000')
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * OTHER_TOKENS_PER_CHAR)
+
+
+def format_duration(seconds: float) -> str:
+    """将秒数格式化为 "X天X小时X分" """
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}天{hours}小时{minutes}分"
+    if hours:
+        return f"{hours}小时{minutes}分"
+    return f"{minutes}分{int(seconds % 60)}秒"
+
+
+class RunEstimator:
+    """文件夹处理的预估器，与 AIPoemAnalyzer 的缓存、级联、打包和提示词保持一致"""
+
+    def __init__(self, analyzer, pack_size: int = 1, concurrency: int = 1, file_workers: int = 1,
+                 rps: float = 0, tpm: float = 0, latency: Optional[float] = None,
+                 prices: Optional[Dict[str, float]] = None):
+        """
+        初始化预估器
+
+        Args:
+            analyzer: 配置好缓存、级联和返回格式的 AIPoemAnalyzer（不会调用API）
+            pack_size: 每次请求打包的短诗数量
+            concurrency: 每个文件内的并发请求数
+            file_workers: 同时处理的文件数
+            rps: 每秒请求数上限（0为不限制）
+            tpm: 每分钟token数上限（0为不限制）
+            latency: 单次请求耗时（秒），为None时按输出token数估算
+            prices: 每百万token的价格（元）
+        """
+        self.analyzer = analyzer
+        self.pack_size = pack_size
+        self.parallel = max(1, concurrency) * max(1, file_workers)
+        self.rps = rps
+        self.tpm = tpm
+        self.latency = latency
+        self.prices = prices
+        # 进程内的后端（rules / stub）不调用API，只统计诗歌数
+        self.local_backend = analyzer.api_client.name if isinstance(analyzer.api_client, LocalBackend) else None
+        self.completion_per_poem = (COMPACT_COMPLETION_TOKENS_PER_POEM if analyzer.compact
+                                    else COMPLETION_TOKENS_PER_POEM)
+        self.single_system_tokens = approx_tokens(analyzer.analysis_prompt) + MESSAGE_OVERHEAD_TOKENS
+        self.packed_system_tokens = approx_tokens(analyzer.packed_prompt) + MESSAGE_OVERHEAD_TOKENS
+        # 本次运行中已计入的诗歌（缓存键），有缓存时重复的诗歌只请求一次
+        self._seen = set()
+        self._prompts_seen = set()
+
+        self.counts = {'files': 0, 'poems': 0, 'empty': 0, 'cached': 0, 'duplicates': 0,
+                       'local': 0, 'api_poems': 0, 'requests': 0, 'packed_requests': 0}
+        self.prompt_tokens = 0
+        self.prompt_cache_hit_tokens = 0
+        self.completion_tokens = 0
+        self.request_seconds = 0.0
+
+    def add_file(self, file_path: str):
+        """
+        统计一个文件（一次只载入一个文件）
+
+        Args:
+            file_path: 诗歌JSON文件路径
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            poems_data = json.load(f)
+        self.counts['files'] += 1
+        self.counts['poems'] += len(poems_data)
+
+        for unit in self.analyzer._plan_units(poems_data, self.pack_size):
+            remaining = [poems_data[i] for i in unit if self._needs_api(poems_data[i])]
+            if remaining:
+                self._add_request(remaining)
+
+    def _needs_api(self, poem: Dict[str, Any]) -> bool:
+        """按 AIPoemAnalyzer 的处理顺序判断诗歌是否需要调用API：空内容、缓存、级联"""
+        title = poem.get('title', '')
+        author = poem.get('author', '')
+        content = '\n'.join(poem.get('paragraphs', []))
+        if not content:
+            self.counts['empty'] += 1
+            return False
+
+        analyzer = self.analyzer
+        if analyzer.cache:
+            key = AnalysisCache.make_key(analyzer.model, analyzer.prompt_version, title, author, content)
+            if key in self._seen:
+                self.counts['duplicates'] += 1
+                return False
+            self._seen.add(key)
+            if analyzer.cache.contains(key):
+                self.counts['cached'] += 1
+                return False
+
+        if analyzer.cascade and analyzer.cascade.score(poem)[0] >= analyzer.cascade.threshold:
+            self.counts['local'] += 1
+            return False
+        return True
+
+    def _add_request(self, poems: List[Dict[str, Any]]):
+        """累计一次请求的token数和耗时"""
+        blocks = [self.analyzer._format_poem(poem.get('title', ''), poem.get('author', ''),
+                                             '\n'.join(poem.get('paragraphs', [])))
+                  for poem in poems]
+        if len(poems) == 1:
+            prompt_type, system_tokens = 'single', self.single_system_tokens
+            user_tokens = approx_tokens(blocks[0])
+        else:
+            prompt_type, system_tokens = 'packed', self.packed_system_tokens
+            user_tokens = approx_tokens('\n\n'.join(f"【{number}】\n{block}"
+                                                    for number, block in enumerate(blocks, 1)))
+            self.counts['packed_requests'] += 1
+
+        # 固定的系统提示词从第二次请求起命中前缀缓存
+        if prompt_type in self._prompts_seen:
+            self.prompt_cache_hit_tokens += system_tokens // PREFIX_CACHE_UNIT * PREFIX_CACHE_UNIT
+        self._prompts_seen.add(prompt_type)
+
+        completion = self.completion_per_poem * len(poems)
+        self.counts['requests'] += 1
+        self.counts['api_poems'] += len(poems)
+        self.prompt_tokens += system_tokens + user_tokens + MESSAGE_OVERHEAD_TOKENS
+        self.completion_tokens += completion
+        self.request_seconds += (self.latency if self.latency is not None
+                                 else REQUEST_OVERHEAD_SECONDS + completion / OUTPUT_TOKENS_PER_SECOND)
+
+    def estimate(self, files: List[str]) -> Dict[str, Any]:
+        """
+        预估处理这些文件的请求数、token数、费用和耗时
+
+        Args:
+            files: 诗歌JSON文件路径列表
+
+        Returns:
+            预估结果
+        """
+        for file_path in files:
+            self.add_file(file_path)
+        return self.get_estimate()
+
+    def get_estimate(self) -> Dict[str, Any]:
+        """汇总已统计文件的预估结果"""
+        requests = self.counts['requests']
+        total_tokens = self.prompt_tokens + self.completion_tokens
+
+        # 耗时取并发、请求数限流、token限流三者中最慢的一个
+        limits = {'concurrency': self.request_seconds / self.parallel}
+        if self.rps:
+            limits['rps'] = requests / self.rps
+        if self.tpm:
+            limits['tpm'] = total_tokens / self.tpm * 60
+        bottleneck = max(limits, key=limits.get)
+
+        api_poems = self.counts['api_poems']
+        return dict(
+            self.counts,
+            local_backend=self.local_backend,
+            prompt_tokens=self.prompt_tokens,
+            prompt_cache_hit_tokens=self.prompt_cache_hit_tokens,
+            completion_tokens=self.completion_tokens,
+            tokens_per_poem=round(total_tokens / api_poems, 1) if api_poems else 0.0,
+            estimated_cost=0.0 if self.local_backend else round(
+                estimate_cost(self.prompt_tokens, self.completion_tokens, self.prompt_cache_hit_tokens, self.prices), 2),
+            wall_seconds=round(limits[bottleneck], 1),
+            bottleneck=bottleneck,
+            api_calls_avoided_rate=1 - api_poems / self.counts['poems'] if self.counts['poems'] else 0.0
+        )
+
+
+def print_estimate(estimate: Dict[str, Any]):
+    """打印预估结果"""
+    bottlenecks = {'concurrency': '并发数', 'rps': '每秒请求数限流', 'tpm': '每分钟token数限流'}
+    print("\n" + "=" * 60)
+    print("处理预估（未调用API）")
+    print("=" * 60)
+    print(f"文件: {estimate['files']} 个，诗歌: {estimate['poems']} 首")
+    print(f"无需调用API: 缓存命中 {estimate['cached']}，重复 {estimate['duplicates']}，"
+          f"本地级联 {estimate['local']}，空内容 {estimate['empty']}"
+          f"（共减少 {estimate['api_calls_avoided_rate']*100:.1f}%）")
+    if estimate['local_backend']:
+        print(f"分析后端 {estimate['local_backend']} 在进程内分析 {estimate['api_poems']} 首诗歌，不调用API，不产生费用")
+        return
+    print(f"API请求: {estimate['requests']} 次（其中打包 {estimate['packed_requests']} 次），"
+          f"分析 {estimate['api_poems']} 首诗歌")
+    print(f"token: 输入 {estimate['prompt_tokens']}（前缀缓存命中约 {estimate['prompt_cache_hit_tokens']}），"
+          f"输出 {estimate['completion_tokens']}，平均每首 {estimate['tokens_per_poem']}")
+    print(f"估算费用: {estimate['estimated_cost']} 元")
+    print(f"预计耗时: {format_duration(estimate['wall_seconds'])}（瓶颈: {bottlenecks[estimate['bottleneck']]}）")
+    print("💡 token数按字数近似估算，可与处理后 api_metrics 中的实际值对比调整")
@@ -8,10 +8,29 @@
 import json
 import os
 import time
+import asyncio
+import threading
 import requests
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from typing import List, Dict, Any, Optional, Callable, Iterable
 import logging
 from dotenv import load_dotenv
+from rate_limiter import RateLimiter, parse_retry_after
+from retry_policy import RetryPolicy, CircuitBreaker
+from analysis_cache import AnalysisCache
+from api_metrics import APIMetrics
+from adaptive_concurrency import (AdaptiveConcurrencyLimiter, OUTCOME_SUCCESS,
+                                  OUTCOME_OVERLOAD, OUTCOME_IGNORE)
+from hedging import HedgePolicy
+from cascade_analyzer import LocalCascade
+from analysis_backends import AnalysisBackend, HTTP_BACKENDS, create_local_backend
+
+try:
+    import httpx  # 可选：安装 httpx[http2] 后可使用HTTP/2多路复用
+except ImportError:
+    httpx = None
 
 # 加载环境变量
 load_dotenv()
@@ -23,26 +42,350 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class DeepSeekAPIClient:
-    """DeepSeek API客户端"""
+# 限流预估用的单次补全token数（请求完成后按 usage 实际值修正）
+EXPECTED_COMPLETION_TOKENS = 500
+
+# 分析提示词模板版本，修改提示词或返回格式时必须递增，使旧的缓存结果失效
+# v2: 固定的分析要求移到系统消息（前缀缓存），用户消息只包含诗歌
+PROMPT_VERSION = "v2"
+
+# 紧凑返回格式使用的短键 -> 完整字段名，解析后展开，结果格式与完整格式相同
+COMPACT_KEYS = {
+    's': 'styles',
+    'c': 'scenes',
+    'e': 'emotions',
+    't': 'themes',
+    'r': 'rhetoric',
+    'k': 'keywords',
+    'd': 'artistic_description'
+}
+
+DEFAULT_MODEL = "deepseek-chat"
+
+# API地址，可通过环境变量 DEEPSEEK_BASE_URL 指向本地模拟服务器（mock_deepseek_server.py）
+DEFAULT_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', "https://api.deepseek.com/v1")
+
+# 打包结果中每首诗必须包含的标签字段，缺少时视为该诗未能解析
+PACKED_REQUIRED_FIELDS = ('styles', 'emotions')
+
+# 打包模式下可与其他诗歌合并为一次请求的诗歌最大字数（覆盖绝句和大部分律诗）
+PACK_MAX_CHARS = 64
+
+# 打包请求中每首诗预留的补全token数
+PACKED_TOKENS_PER_POEM = 450
+
+# 紧凑返回格式下每首诗预留的补全token数（短键、意境描述限30字）
+COMPACT_TOKENS_PER_POEM = 200
+
+class DeepSeekAPIClient(AnalysisBackend):
+    """DeepSeek API客户端（也可用于其他兼容OpenAI接口的服务）"""
+    
+    name = 'deepseek'
     
-    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com/v1"):
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL,
+                 pool_size: int = 16, http2: bool = False,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 metrics: Optional[APIMetrics] = None,
+                 concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 hedge_policy: Optional[HedgePolicy] = None):
         """
         初始化DeepSeek API客户端
         
+        所有请求共用一个连接池（可跨线程共享），保持长连接，避免每首诗都重新握手。
+        
         Args:
             api_key: DeepSeek API密钥
             base_url: API基础URL
+            pool_size: 连接池大小，建议不小于并发请求数
+            http2: 是否使用HTTP/2（需要安装 httpx[http2]，不可用时回退到HTTP/1.1）
+            rate_limiter: 共享的限流器，为None时不限流
+            retry_policy: 重试策略，默认对429、5xx和超时最多重试4次
+            circuit_breaker: 共享的熔断器，默认按错误率自动熔断
+            metrics: 共享的指标收集器，记录每次调用的token用量和耗时
+            concurrency_limiter: 共享的自适应并发限制器，为None时并发数只由工作线程数决定
+            hedge_policy: 对冲策略，设置后慢请求超过近期p95延迟时再发送一个相同请求
         """
         self.api_key = api_key
         self.base_url = base_url
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.metrics = metrics
+        self.concurrency_limiter = concurrency_limiter
+        self.hedge_policy = hedge_policy
+        # 对冲时原请求和对冲请求都在后台线程中发送，调用线程等待先返回的一个
+        self._hedge_executor = ThreadPoolExecutor(max_workers=pool_size * 2) if hedge_policy else None
+        # 每个工作线程最近一次失败的原因，供分析器记录失败诗歌
+        self._local = threading.local()
         self.headers = {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
+            "Authorization": f"Bearer {api_key}",
+            "Connection": "keep-alive"
+        }
+        
+        # 连接复用统计
+        self._stats_lock = threading.Lock()
+        self._request_count = 0
+        self._connections_opened = 0
+        self._retry_count = 0
+        
+        self.http2 = http2 and self._http2_available()
+        if http2 and not self.http2:
+            logger.warning("HTTP/2 不可用（需要 pip install httpx[http2]），使用HTTP/1.1连接池")
+        
+        if self.http2:
+            self.session = httpx.Client(
+                http2=True,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            )
+            self.transport_errors = (httpx.HTTPError,)
+            self.retryable_errors = (httpx.TimeoutException, httpx.NetworkError)
+        else:
+            self.session = requests.Session()
+            self.session.headers.update(self.headers)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.transport_errors = (requests.exceptions.RequestException,)
+            self.retryable_errors = (requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+    
+    @staticmethod
+    def _http2_available() -> bool:
+        """检查HTTP/2依赖是否已安装"""
+        if httpx is None:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    
+    def _send(self, url: str, data: Dict):
+        """
+        发送一次请求；启用自适应并发时先获取并发名额，并按响应结果调整并发数
+        
+        Returns:
+            HTTP响应
+        """
+        if not self.concurrency_limiter:
+            return self._dispatch(url, data)
+        
+        self.concurrency_limiter.acquire()
+        start = time.perf_counter()
+        outcome = OUTCOME_IGNORE
+        try:
+            response = self._dispatch(url, data)
+            if response.status_code == 429 or response.status_code >= 500:
+                outcome = OUTCOME_OVERLOAD
+            elif response.status_code < 400:
+                outcome = OUTCOME_SUCCESS
+            return response
+        except self.retryable_errors:
+            outcome = OUTCOME_OVERLOAD
+            raise
+        finally:
+            self.concurrency_limiter.release(time.perf_counter() - start, outcome)
+    
+    def _dispatch(self, url: str, data: Dict):
+        """
+        发送请求；启用对冲时，原请求超过近期p95延迟仍未返回则再发送一个相同请求，
+        采用先成功返回的结果（已发出的另一个请求不会被取消，返回后只把token用量计入指标和费用）
+        
+        Returns:
+            HTTP响应
+        """
+        policy = self.hedge_policy
+        if not policy:
+            return self._post(url, data)
+        
+        policy.record_request()
+        primary = self._hedge_executor.submit(self._timed_post, url, data)
+        delay = policy.hedge_delay()
+        if delay is None or wait([primary], timeout=delay).done:
+            return primary.result()
+        # 对冲请求占用自己的并发名额；调用方持有原请求的名额，不能阻塞等待，没有空闲名额时不对冲
+        if self.concurrency_limiter and not self.concurrency_limiter.try_acquire():
+            return primary.result()
+        if not policy.try_acquire_hedge():
+            self._release_hedge_slot(0.0)
+            return primary.result()
+        
+        logger.info(f"请求 {delay:.1f} 秒未返回，发送对冲请求")
+        hedge = self._hedge_executor.submit(self._hedged_post, url, data, primary)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if self._succeeded(future):
+                    if future is hedge:
+                        policy.record_hedge_win()
+                        primary.add_done_callback(partial(self._record_discarded, data.get('model')))
+                    elif hedge.cancel():
+                        # 对冲请求还在排队，不再发送
+                        self._release_hedge_slot(0.0)
+                    else:
+                        hedge.add_done_callback(partial(self._record_discarded, data.get('model')))
+                    return future.result()
+        
+        # 两个请求都失败时按原请求的结果处理（由调用方决定是否重试）
+        return primary.result()
+    
+    @staticmethod
+    def _succeeded(future) -> bool:
+        """已完成的请求是否得到成功响应（被跳过的对冲请求结果为None）"""
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return False
+        response = future.result()
+        return response is not None and response.status_code < 400
+    
+    def _release_hedge_slot(self, latency: float):
+        """归还对冲请求的并发名额（对冲请求只在原请求变慢时发送，不参与并发数调整）"""
+        if self.concurrency_limiter:
+            self.concurrency_limiter.release(latency, OUTCOME_IGNORE)
+    
+    def _timed_post(self, url: str, data: Dict):
+        """发送请求并记录成功请求的耗时，供对冲策略计算延迟分位数"""
+        start = time.perf_counter()
+        response = self._post(url, data)
+        if response.status_code < 400:
+            self.hedge_policy.record_latency(time.perf_counter() - start)
+        return response
+    
+    def _hedged_post(self, url: str, data: Dict, primary):
+        """
+        发送对冲请求（已在 _dispatch 中获取并发名额，这里负责归还）
+        
+        Returns:
+            HTTP响应，原请求在此之前已成功返回时不再发送，返回None
+        """
+        start = time.perf_counter()
+        try:
+            # 对冲请求同样计入每秒请求数
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            if self._succeeded(primary):
+                return None
+            response = self._post(url, data)
+        finally:
+            self._release_hedge_slot(time.perf_counter() - start)
+        if response.status_code < 400:
+            self.hedge_policy.record_latency(time.perf_counter() - start)
+        return response
+    
+    def _record_discarded(self, model: Optional[str], future):
+        """对冲中未采用的请求返回后，把它的token用量计入指标（费用同样计算在内）"""
+        if not self.metrics or not self._succeeded(future):
+            return
+        response = future.result()
+        try:
+            usage = response.json().get('usage')
+        except ValueError:
+            return
+        if usage:
+            self.metrics.record_discarded(usage, model=model)
+    
+    def _trace_connection(self, event_name: str, info: Dict):
+        """httpx 连接事件回调，用于统计新建连接数"""
+        if event_name == 'connection.connect_tcp.complete':
+            with self._stats_lock:
+                self._connections_opened += 1
+    
+    def _post(self, url: str, data: Dict):
+        """通过共享连接池发送请求"""
+        with self._stats_lock:
+            self._request_count += 1
+        
+        if self.http2:
+            return self.session.post(url, json=data, timeout=60,
+                                     extensions={'trace': self._trace_connection})
+        return self.session.post(url, json=data, timeout=60)
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """
+        获取连接复用统计
+        
+        Returns:
+            请求数、新建连接数和连接复用率
+        """
+        with self._stats_lock:
+            requests_sent = self._request_count
+            connections = self._connections_opened
+        
+        if not self.http2:
+            # urllib3 连接池自行记录新建连接数
+            connections = 0
+            for adapter in set(self.session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        connections += pool.num_connections
+        
+        return {
+            'transport': 'http2' if self.http2 else 'http1.1',
+            'pool_size': self.pool_size,
+            'requests': requests_sent,
+            'connections_opened': connections,
+            'connection_reuse_rate': (1 - connections / requests_sent) if requests_sent else 0.0
         }
+    
+    def get_retry_stats(self) -> Dict[str, Any]:
+        """获取重试和熔断统计"""
+        stats = {'retries': self._retry_count}
+        stats.update(self.circuit_breaker.get_stats())
+        return stats
+    
+    def get_last_error(self) -> Optional[Dict[str, Any]]:
+        """
+        获取当前线程最近一次 chat_completion 失败的原因
+        
+        Returns:
+            包含 reason、status_code、attempts 的字典，最近一次调用成功时为None
+        """
+        return getattr(self._local, 'last_error', None)
+    
+    def _retry_wait(self, attempt: int, reason: str, retry_after: Optional[float] = None):
+        """
+        重试前等待：指数退避加抖动，429时至少等待 Retry-After
+        
+        Args:
+            attempt: 已失败的次数减一
+            reason: 失败原因（写入日志）
+            retry_after: 服务端要求的等待秒数
+        """
+        wait = self.retry_policy.backoff(attempt)
+        with self._stats_lock:
+            self._retry_count += 1
+        
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+            if self.rate_limiter:
+                # 共享限流器时所有工作线程一起暂停
+                self.rate_limiter.pause(wait)
+                return
+        
+        logger.warning(f"{reason}，{wait:.1f} 秒后第 {attempt + 1} 次重试")
+        time.sleep(wait)
+    
+    def close(self):
+        """关闭连接池"""
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False)
+        self.session.close()
+    
+    @staticmethod
+    def _estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+        """粗略估算请求的token数（中文约一字一token）"""
+        prompt_tokens = sum(len(message.get('content', '')) for message in messages)
+        return prompt_tokens + min(max_tokens, EXPECTED_COMPLETION_TOKENS)
         
     def chat_completion(self, messages: List[Dict], model: str = "deepseek-chat", 
-                       temperature: float = 0.3, max_tokens: int = 2000) -> Optional[str]:
+                       temperature: float = 0.3, max_tokens: int = 2000,
+                       metrics_context: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """
         调用DeepSeek聊天补全API
         
@@ -51,10 +394,26 @@ class DeepSeekAPIClient:
             model: 模型名称
             temperature: 温度参数
             max_tokens: 最大token数
+            metrics_context: 随本次调用一起记录到指标中的字段（如诗歌数、字数）
             
         Returns:
             API响应内容或None
         """
+        start = time.perf_counter()
+        content, usage, attempts = self._request_with_retries(messages, model, temperature, max_tokens)
+        if self.metrics:
+            self.metrics.record_request(time.perf_counter() - start, attempts, content is not None,
+                                        usage=usage, model=model, **(metrics_context or {}))
+        return content
+    
+    def _request_with_retries(self, messages: List[Dict], model: str, temperature: float,
+                              max_tokens: int) -> tuple:
+        """
+        发送请求，对临时错误按重试策略重试
+        
+        Returns:
+            (响应内容或None, usage字段, 发送次数)
+        """
         url = f"{self.base_url}/chat/completions"
         data = {
             "model": model,
@@ -64,35 +423,131 @@ class DeepSeekAPIClient:
             "stream": False
         }
         
-        try:
-            response = requests.post(url, headers=self.headers, json=data, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API请求失败: {e}")
-            return None
-        except (KeyError, IndexError) as e:
-            logger.error(f"API响应解析失败: {e}")
-            return None
+        estimated_tokens = self._estimate_tokens(messages, max_tokens)
+        self._local.last_error = None
+        max_attempts = self.retry_policy.max_retries + 1
+        
+        for attempt in range(max_attempts):
+            can_retry = attempt < max_attempts - 1
+            self.circuit_breaker.before_request()
+            if self.rate_limiter:
+                self.rate_limiter.acquire(estimated_tokens)
+            
+            try:
+                response = self._send(url, data)
+            except self.retryable_errors as e:
+                # 超时、连接中断等临时错误
+                self.circuit_breaker.record_failure()
+                self._local.last_error = {'reason': f'network: {e}', 'status_code': None, 'attempts': attempt + 1}
+                if can_retry:
+                    self._retry_wait(attempt, f"API请求失败: {e}")
+                    continue
+                logger.error(f"API请求失败: {e}")
+                return None, None, attempt + 1
+            except self.transport_errors as e:
+                self._local.last_error = {'reason': f'request: {e}', 'status_code': None, 'attempts': attempt + 1}
+                logger.error(f"API请求失败: {e}")
+                return None, None, attempt + 1
+            
+            status_code = response.status_code
+            if status_code >= 400:
+                self._local.last_error = {'reason': f'http {status_code}', 'status_code': status_code,
+                                          'attempts': attempt + 1}
+                if not self.retry_policy.is_retryable_status(status_code):
+                    # 400/401/402等请求本身的问题，重试无意义
+                    logger.error(f"API请求失败: HTTP {status_code} {response.text[:200]}")
+                    return None, None, attempt + 1
+                
+                retry_after = None
+                if status_code == 429:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                else:
+                    # 429由限流器处理，只有服务端错误计入熔断
+                    self.circuit_breaker.record_failure()
+                
+                if can_retry:
+                    self._retry_wait(attempt, f"API返回 HTTP {status_code}", retry_after)
+                    continue
+                logger.error(f"API请求失败: HTTP {status_code}，已重试 {attempt} 次")
+                return None, None, attempt + 1
+            
+            self.circuit_breaker.record_success()
+            try:
+                result = response.json()
+                
+                usage = result.get("usage")
+                if self.rate_limiter and usage:
+                    self.rate_limiter.record_usage(estimated_tokens, usage.get("total_tokens", estimated_tokens))
+                
+                return result["choices"][0]["message"]["content"], usage, attempt + 1
+            except (KeyError, IndexError, ValueError) as e:
+                self._local.last_error = {'reason': f'bad response: {e}', 'status_code': status_code,
+                                          'attempts': attempt + 1}
+                logger.error(f"API响应解析失败: {e}")
+                return None, None, attempt + 1
+        
+        return None, None, max_attempts
 
 class AIPoemAnalyzer:
     """AI诗歌分析器 - 基于DeepSeek API"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, pool_size: int = 16, http2: bool = False,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[AnalysisCache] = None,
+                 model: str = DEFAULT_MODEL,
+                 base_url: str = DEFAULT_BASE_URL,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 metrics: Optional[APIMetrics] = None,
+                 concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 hedge_policy: Optional[HedgePolicy] = None,
+                 cascade: Optional[LocalCascade] = None,
+                 compact: bool = False,
+                 backend: str = 'deepseek'):
         """
         初始化AI诗歌分析器
         
         Args:
             api_key: DeepSeek API密钥
+            pool_size: HTTP连接池大小
+            http2: 是否尝试使用HTTP/2
+            rate_limiter: 共享的限流器，设置后 batch_analyze 不再按批次固定休眠
+            cache: 分析结果缓存，命中时不调用API
+            model: 模型名称
+            base_url: API基础URL
+            circuit_breaker: 共享的熔断器（多个分析器并行时使用），默认每个客户端独立
+            metrics: 共享的指标收集器，记录每次调用的token用量、耗时和缓存命中
+            concurrency_limiter: 共享的自适应并发限制器，并发分析时按服务端负载自动调整同时进行的请求数
+            hedge_policy: 共享的对冲策略，慢请求超过近期p95延迟时发送对冲请求
+            cascade: 共享的本地分析器级联，本地关键词分析置信度足够的诗歌不再调用API
+            compact: 是否使用短键的紧凑返回格式（意境描述限30字），减少输出token和延迟
+            backend: 分析后端（deepseek / openai 通过HTTP调用，rules / stub 在进程内分析，不访问网络）
         """
-        self.api_client = DeepSeekAPIClient(api_key)
+        # 分析后端，所有请求都通过它发送
+        if backend in HTTP_BACKENDS:
+            self.api_client = DeepSeekAPIClient(api_key, base_url=base_url, pool_size=pool_size, http2=http2,
+                                                rate_limiter=rate_limiter, circuit_breaker=circuit_breaker,
+                                                metrics=metrics, concurrency_limiter=concurrency_limiter,
+                                                hedge_policy=hedge_policy)
+        else:
+            self.api_client = create_local_backend(backend, rate_limiter=rate_limiter, metrics=metrics)
+        self.cache = cache
+        self.metrics = metrics
+        self.cascade = cascade
+        # 本地后端的结果与API不同，模型名带上后端名称，缓存和指标中不会与API结果混用
+        self.model = model if backend in HTTP_BACKENDS else f"{backend}:{model}"
+        self.compact = compact
+        # 紧凑格式的结果与完整格式不同（意境描述更短），使用独立的缓存版本
+        self.prompt_version = f"{PROMPT_VERSION}-compact" if compact else PROMPT_VERSION
+        # 本次运行中分析失败的诗歌: 诗歌ID -> 失败记录
+        self.failures = {}
+        self._failures_lock = threading.Lock()
         self.analysis_prompt = self._create_analysis_prompt()
+        self.packed_prompt = self._create_packed_prompt()
         
-    def _create_analysis_prompt(self) -> str:
-        """创建诗歌分析提示词模板"""
-        return """
-你是一个专业的古诗词分析专家。请分析以下唐诗，并按照JSON格式返回分析结果。
+    def _create_instructions(self) -> str:
+        """分析要求（单首和打包请求共用，放在系统消息开头使前缀相同）"""
+        description = "用一句话（不超过30字）概括诗歌的意境" if self.compact else "用一段话描述诗歌的意境和艺术特色"
+        return f"""你是一个专业的古诗词分析专家。请分析用户给出的唐诗。
 
 分析维度：
 1. 风格分析：豪放、婉约、田园、边塞、咏史、抒情、写景等
@@ -101,11 +556,15 @@ class AIPoemAnalyzer:
 4. 主题分析：爱情、友情、家国、人生、自然、哲理等
 5. 修辞手法：比喻、对仗、夸张、拟人、借代等
 6. 关键词提取：提取5-8个最能代表诗歌内容的关键词
-7. 意境描述：用一段话描述诗歌的意境和艺术特色
-
-请严格按照以下JSON格式返回结果，不要包含其他内容：
-
-{{
+7. 意境描述：{description}
+"""
+    
+    def _create_schema(self) -> str:
+        """单首诗的返回格式"""
+        if self.compact:
+            return """{"s": ["风格"], "c": ["场景"], "e": ["情感"], "t": ["主题"], "r": ["修辞"], "k": ["关键词"], "d": "意境描述"}
+（使用简写键：s=风格 c=场景 e=情感 t=主题 r=修辞 k=关键词 d=意境描述，JSON不要缩进）"""
+        return """{
     "styles": ["风格1", "风格2", "风格3"],
     "scenes": ["场景1", "场景2", "场景3"],
     "emotions": ["情感1", "情感2", "情感3"],
@@ -113,16 +572,67 @@ class AIPoemAnalyzer:
     "rhetoric": ["修辞1", "修辞2"],
     "keywords": ["关键词1", "关键词2", "关键词3", "关键词4", "关键词5"],
     "artistic_description": "意境描述文字"
-}}
-
-诗歌信息：
-标题：{title}
-作者：{author}
-内容：
-{content}
-
-请开始分析：
-"""
+}"""
+    
+    def _create_packed_prompt(self) -> str:
+        """创建多首诗歌打包分析的系统提示词（固定不变，可命中服务端的前缀缓存）"""
+        return (self._create_instructions() +
+                "\n用户会给出多首诗歌，每首以【编号】开头。请逐首分析，返回一个JSON数组，"
+                "每首诗对应一个元素，并用 \"id\" 字段标明诗歌编号，不要包含其他内容。每个元素的格式：\n\n" +
+                self._create_schema())
+    
+    def _create_analysis_prompt(self) -> str:
+        """创建单首诗歌分析的系统提示词（固定不变，可命中服务端的前缀缓存）"""
+        return (self._create_instructions() +
+                "\n请严格按照以下JSON格式返回结果，不要包含其他内容：\n\n" +
+                self._create_schema())
+    
+    @staticmethod
+    def _format_poem(title: str, author: str, content: str) -> str:
+        """用户消息中的诗歌信息"""
+        return f"标题：{title}\n作者：{author}\n内容：\n{content}"
+    
+    def _expand_keys(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """将紧凑格式的短键展开为完整字段名"""
+        if not self.compact:
+            return analysis
+        return {COMPACT_KEYS.get(key, key): value for key, value in analysis.items()}
+    
+    @staticmethod
+    def poem_id(poem_data: Dict[str, Any]) -> str:
+        """诗歌ID（卷-编号），缺少卷号时使用 标题|作者"""
+        if 'volume' in poem_data and 'no#' in poem_data:
+            return f"{poem_data['volume']}-{poem_data['no#']}"
+        return f"{poem_data.get('title', '')}|{poem_data.get('author', '')}"
+    
+    def _record_failure(self, poem_data: Dict[str, Any], reason: str,
+                        error: Optional[Dict[str, Any]] = None):
+        """
+        记录分析失败的诗歌，只有这些诗歌需要重新分析
+        
+        Args:
+            poem_data: 诗歌数据
+            reason: 失败类型（api_error / parse_error）
+            error: API客户端返回的失败详情
+        """
+        record = {
+            'poem_id': self.poem_id(poem_data),
+            'title': poem_data.get('title', ''),
+            'author': poem_data.get('author', ''),
+            'source_file': poem_data.get('source_file'),
+            'reason': reason,
+            'error': (error or {}).get('reason'),
+            'status_code': (error or {}).get('status_code'),
+            'attempts': (error or {}).get('attempts'),
+            'failed_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with self._failures_lock:
+            self.failures[record['poem_id']] = record
+    
+    def _clear_failure(self, poem_data: Dict[str, Any]):
+        """诗歌重新分析成功后删除失败记录"""
+        with self._failures_lock:
+            self.failures.pop(self.poem_id(poem_data), None)
     
     def analyze_poem(self, poem_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -142,31 +652,39 @@ class AIPoemAnalyzer:
         if not content:
             logger.warning(f"诗歌内容为空: {title}")
             return None
-            
-        # 构建提示词
-        prompt = self.analysis_prompt.format(
-            title=title,
-            author=author,
-            content=content
-        )
         
+        # 查询缓存
+        cache_key = None
+        if self.cache:
+            cache_key = AnalysisCache.make_key(self.model, self.prompt_version, title, author, content)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"命中缓存: {title} - {author}")
+                if self.metrics:
+                    self.metrics.record_cache_hit(len(content))
+                return cached
+            
+        # 固定的分析要求在系统消息中，用户消息只包含诗歌
         messages = [
-            {"role": "system", "content": "你是一个专业的古诗词分析专家。"},
-            {"role": "user", "content": prompt}
+            {"role": "system", "content": self.analysis_prompt},
+            {"role": "user", "content": self._format_poem(title, author, content)}
         ]
         
         logger.info(f"开始分析诗歌: {title} - {author}")
         
         # 调用API
-        response = self.api_client.chat_completion(messages)
+        response = self.api_client.chat_completion(messages, model=self.model,
+                                                   max_tokens=COMPACT_TOKENS_PER_POEM * 2 if self.compact else 2000,
+                                                   metrics_context={'poems': 1, 'poem_chars': len(content)})
         
         if not response:
             logger.error(f"API调用失败: {title}")
+            self._record_failure(poem_data, 'api_error', self.api_client.get_last_error())
             return None
             
         try:
             # 解析JSON响应
-            analysis_result = json.loads(response.strip())
+            analysis_result = self._expand_keys(json.loads(response.strip()))
             
             # 添加基础信息
             analysis_result.update({
@@ -175,13 +693,185 @@ class AIPoemAnalyzer:
                 'content_preview': content[:100] + '...' if len(content) > 100 else content
             })
             
+            # 只缓存成功解析的结果，备用分析下次仍会重新请求
+            if cache_key:
+                self.cache.put(cache_key, analysis_result)
+            
+            self._clear_failure(poem_data)
             logger.info(f"成功分析诗歌: {title}")
             return analysis_result
             
         except json.JSONDecodeError as e:
             logger.error(f"JSON解析失败: {e}\n响应内容: {response}")
+            self._record_failure(poem_data, 'parse_error', {'reason': str(e)})
             return self._fallback_analysis(title, author, content)
     
+    def analyze_poems_packed(self, poems: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        将多首短诗打包在一次请求中分析
+        
+        分析说明只发送一次，模型返回带 id 的JSON数组；缓存命中的诗歌不再发送，
+        解析失败或缺失的诗歌逐首回退到 analyze_poem。
+        
+        Args:
+            poems: 诗歌数据列表
+            
+        Returns:
+            与输入顺序一致的分析结果列表（元素可能为None）
+        """
+        results = [None] * len(poems)
+        pending = []
+        
+        for i, poem in enumerate(poems):
+            title = poem.get('title', '')
+            author = poem.get('author', '')
+            content = '\n'.join(poem.get('paragraphs', []))
+            if not content:
+                logger.warning(f"诗歌内容为空: {title}")
+                continue
+            
+            cache_key = None
+            if self.cache:
+                cache_key = AnalysisCache.make_key(self.model, self.prompt_version, title, author, content)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    if self.metrics:
+                        self.metrics.record_cache_hit(len(content))
+                    results[i] = cached
+                    continue
+            pending.append((i, title, author, content, cache_key))
+        
+        if not pending:
+            return results
+        
+        poem_blocks = []
+        for number, (_, title, author, content, _) in enumerate(pending, 1):
+            poem_blocks.append(f"【{number}】\n{self._format_poem(title, author, content)}")
+        
+        messages = [
+            {"role": "system", "content": self.packed_prompt},
+            {"role": "user", "content": '\n\n'.join(poem_blocks)}
+        ]
+        
+        logger.info(f"打包分析 {len(pending)} 首诗歌: {pending[0][1]} 等")
+        tokens_per_poem = COMPACT_TOKENS_PER_POEM if self.compact else PACKED_TOKENS_PER_POEM
+        response = self.api_client.chat_completion(
+            messages, model=self.model, max_tokens=min(8000, tokens_per_poem * len(pending)),
+            metrics_context={'poems': len(pending), 'poem_chars': sum(len(item[3]) for item in pending)}
+        )
+        parsed = self._parse_packed_response(response) if response else {}
+        
+        for number, (i, title, author, content, cache_key) in enumerate(pending, 1):
+            analysis_result = parsed.get(number)
+            if analysis_result is None:
+                # 该诗未能从打包结果中解析，单独重新分析
+                results[i] = self.analyze_poem(poems[i])
+                continue
+            
+            analysis_result.update({
+                'title': title,
+                'author': author,
+                'content_preview': content[:100] + '...' if len(content) > 100 else content
+            })
+            if cache_key:
+                self.cache.put(cache_key, analysis_result)
+            self._clear_failure(poems[i])
+            results[i] = analysis_result
+        
+        return results
+    
+    def _parse_packed_response(self, response: str) -> Dict[int, Dict[str, Any]]:
+        """
+        解析打包请求返回的JSON数组
+        
+        Returns:
+            诗歌编号 -> 分析结果，无法解析或缺少标签字段的元素被忽略
+        """
+        text = response.strip()
+        # 去掉模型可能添加的 ```json 代码块标记
+        if text.startswith('```'):
+            text = text.strip('`')
+            if text.startswith('json'):
+                text = text[4:]
+        
+        try:
+            items = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.error(f"打包结果JSON解析失败: {e}")
+            return {}
+        
+        if not isinstance(items, list):
+            logger.error("打包结果不是JSON数组")
+            return {}
+        
+        parsed = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                number = int(item.pop('id'))
+            except (KeyError, TypeError, ValueError):
+                continue
+            analysis = self._expand_keys(item)
+            if not all(isinstance(analysis.get(field), list) for field in PACKED_REQUIRED_FIELDS):
+                # 空的或被截断的元素不缓存，与缺失的诗歌一样单独重新分析
+                logger.warning(f"打包结果中第 {number} 首缺少标签字段，单独重新分析")
+                continue
+            parsed[number] = analysis
+        return parsed
+    
+    def _plan_units(self, poems_data: List[Dict], pack_size: int) -> List[List[int]]:
+        """
+        将诗歌划分为请求单元：相邻的短诗每 pack_size 首合为一组，长诗单独成组
+        
+        Args:
+            poems_data: 诗歌数据列表
+            pack_size: 每次请求最多包含的诗歌数量
+            
+        Returns:
+            每个请求单元包含的诗歌序号
+        """
+        if pack_size <= 1:
+            return [[i] for i in range(len(poems_data))]
+        
+        units = []
+        pack = []
+        for i, poem in enumerate(poems_data):
+            if sum(len(line) for line in poem.get('paragraphs', [])) > PACK_MAX_CHARS:
+                units.append([i])
+                continue
+            pack.append(i)
+            if len(pack) == pack_size:
+                units.append(pack)
+                pack = []
+        if pack:
+            units.append(pack)
+        
+        units.sort(key=lambda unit: unit[0])
+        return units
+    
+    def _analyze_unit(self, poems_data: List[Dict], unit: List[int]) -> List[Optional[Dict[str, Any]]]:
+        """分析一个请求单元（单首或打包），配置级联时先尝试本地分析"""
+        analyses = {}
+        if self.cascade:
+            for i in unit:
+                if not self._is_cached(poems_data[i]):
+                    analyses[i] = self.cascade.try_local(poems_data[i])
+        remaining = [i for i in unit if analyses.get(i) is None]
+        if len(remaining) == 1:
+            analyses[remaining[0]] = self.analyze_poem(poems_data[remaining[0]])
+        elif remaining:
+            analyses.update(zip(remaining, self.analyze_poems_packed([poems_data[i] for i in remaining])))
+        return [analyses[i] for i in unit]
+    
+    def _is_cached(self, poem_data: Dict[str, Any]) -> bool:
+        """诗歌是否已有缓存的API分析结果（已有时优先使用，不再走本地分析）"""
+        if not self.cache:
+            return False
+        content = '\n'.join(poem_data.get('paragraphs', []))
+        return self.cache.contains(AnalysisCache.make_key(self.model, self.prompt_version, poem_data.get('title', ''),
+                                                          poem_data.get('author', ''), content))
+    
     def _fallback_analysis(self, title: str, author: str, content: str) -> Dict[str, Any]:
         """
         备用分析方案（当API调用失败时使用）
@@ -210,66 +900,215 @@ class AIPoemAnalyzer:
     
     def batch_analyze(self, poems_data: List[Dict], 
                      batch_size: int = 10, 
-                     delay: float = 1.0) -> List[Dict]:
+                     delay: float = 1.0,
+                     pack_size: int = 1,
+                     on_result: Optional[Callable[[int, Dict], None]] = None,
+                     should_stop: Optional[Callable[[], bool]] = None) -> List[Dict]:
         """
         批量分析诗歌
         
         Args:
             poems_data: 诗歌数据列表
             batch_size: 批次大小
-            delay: 请求间隔（秒）
+            delay: 请求间隔（秒），仅在未配置限流器时使用
+            pack_size: 每次请求打包的短诗数量（1为逐首请求）
+            on_result: 每首诗歌完成后按输入顺序回调 (序号, 增强后的诗歌)，用于流式写出结果
+            should_stop: 返回True时停止发起新的请求（暂停处理），未分析的诗歌在结果中为None
             
         Returns:
             增强后的诗歌数据列表
         """
-        results = []
         total = len(poems_data)
+        results = [None] * total
         
         logger.info(f"开始批量分析 {total} 首诗歌，批次大小: {batch_size}")
         
-        for i, poem in enumerate(poems_data):
-            if i % batch_size == 0 and i > 0:
-                logger.info(f"已分析 {i}/{total} 首诗歌")
-                time.sleep(delay)  # 避免API限制
+        analyzed = 0
+        next_pause = batch_size
+        next_emit = 0
+        for unit in self._plan_units(poems_data, pack_size):
+            if should_stop and should_stop():
+                logger.info(f"分析已暂停，完成 {analyzed}/{total} 首诗歌")
+                break
+            if analyzed >= next_pause:
+                logger.info(f"已分析 {analyzed}/{total} 首诗歌")
+                if self.api_client.rate_limiter is None:
+                    time.sleep(delay)  # 避免API限制
+                next_pause = (analyzed // batch_size + 1) * batch_size
                 
             try:
-                analysis = self.analyze_poem(poem)
-                
-                # 合并分析结果到原数据
-                enriched_poem = poem.copy()
-                if analysis:
-                    enriched_poem['ai_analysis'] = analysis
-                    enriched_poem['ai_tags'] = {
-                        'styles': analysis.get('styles', []),
-                        'scenes': analysis.get('scenes', []),
-                        'emotions': analysis.get('emotions', []),
-                        'themes': analysis.get('themes', []),
-                        'rhetoric': analysis.get('rhetoric', []),
-                        'keywords': analysis.get('keywords', []),
-                        'artistic_description': analysis.get('artistic_description', '')
-                    }
-                else:
-                    # API调用失败时使用基础标签
-                    enriched_poem['ai_tags'] = {
-                        'styles': ['古典'],
-                        'scenes': ['传统'], 
-                        'emotions': ['中性'],
-                        'themes': ['诗歌'],
-                        'rhetoric': ['古典修辞'],
-                        'keywords': ['唐诗'],
-                        'artistic_description': '分析失败，使用基础标签'
-                    }
-                    
-                results.append(enriched_poem)
+                analyses = self._analyze_unit(poems_data, unit)
+                for i, analysis in zip(unit, analyses):
+                    results[i] = self._enrich_poem(poems_data[i], analysis)
                 
             except Exception as e:
-                logger.error(f"分析诗歌时出错 {poem.get('title', '未知')}: {e}")
+                logger.error(f"分析诗歌时出错 {poems_data[unit[0]].get('title', '未知')}: {e}")
                 # 保留原始数据
-                results.append(poem)
+                for i in unit:
+                    results[i] = poems_data[i]
+            
+            analyzed += len(unit)
+            next_emit = self._emit_ready(results, next_emit, on_result)
+        
+        # 打包单元中的诗歌不一定相邻，暂停时已完成的诗歌之前可能有未分析的诗歌
+        self._emit_ready(results, next_emit, on_result, skip_missing=True)
                 
-        logger.info(f"批量分析完成，成功分析 {len([p for p in results if 'ai_tags' in p])}/{total} 首诗歌")
+        logger.info(f"批量分析完成，成功分析 {len([p for p in results if p and 'ai_tags' in p and 'ai_failure' not in p])}/{total} 首诗歌")
         return results
     
+    @staticmethod
+    def _emit_ready(results: List[Optional[Dict]], next_emit: int,
+                    on_result: Optional[Callable[[int, Dict], None]],
+                    skip_missing: bool = False) -> int:
+        """
+        按输入顺序回调已完成的诗歌（打包和并发时完成顺序可能与输入顺序不同）
+        
+        Args:
+            results: 结果列表，未完成的位置为None
+            next_emit: 下一个待回调的序号
+            on_result: 回调函数
+            skip_missing: 是否跳过未完成的位置继续回调（分析结束时使用，暂停后
+                          未发出的请求之后已完成的诗歌也要写出并记录检查点）
+            
+        Returns:
+            更新后的下一个待回调序号
+        """
+        if on_result is None:
+            return next_emit
+        while next_emit < len(results) and (skip_missing or results[next_emit] is not None):
+            if results[next_emit] is not None:
+                on_result(next_emit, results[next_emit])
+            next_emit += 1
+        return next_emit
+    
+    def _enrich_poem(self, poem: Dict, analysis: Optional[Dict[str, Any]]) -> Dict:
+        """
+        将分析结果合并到诗歌数据
+        
+        Args:
+            poem: 原始诗歌数据
+            analysis: analyze_poem 的返回值，None 表示分析失败
+            
+        Returns:
+            增强后的诗歌数据
+        """
+        enriched_poem = poem.copy()
+        enriched_poem.pop('ai_failure', None)
+        with self._failures_lock:
+            failure = self.failures.get(self.poem_id(poem))
+        if failure:
+            # 失败记录随结果保存，重跑时只需重新分析这些诗歌
+            enriched_poem['ai_failure'] = failure
+        
+        if analysis:
+            enriched_poem['ai_analysis'] = analysis
+            enriched_poem['ai_tags'] = {
+                'styles': analysis.get('styles', []),
+                'scenes': analysis.get('scenes', []),
+                'emotions': analysis.get('emotions', []),
+                'themes': analysis.get('themes', []),
+                'rhetoric': analysis.get('rhetoric', []),
+                'keywords': analysis.get('keywords', []),
+                'artistic_description': analysis.get('artistic_description', '')
+            }
+        else:
+            # API调用失败时使用基础标签
+            enriched_poem['ai_tags'] = {
+                'styles': ['古典'],
+                'scenes': ['传统'], 
+                'emotions': ['中性'],
+                'themes': ['诗歌'],
+                'rhetoric': ['古典修辞'],
+                'keywords': ['唐诗'],
+                'artistic_description': '分析失败，使用基础标签'
+            }
+        return enriched_poem
+    
+    async def batch_analyze_async(self, poems_data: List[Dict],
+                                  concurrency: int = 16,
+                                  pack_size: int = 1,
+                                  on_result: Optional[Callable[[int, Dict], None]] = None,
+                                  should_stop: Optional[Callable[[], bool]] = None) -> List[Dict]:
+        """
+        并发批量分析诗歌
+        
+        同时最多有 concurrency 个请求在进行，结果按输入顺序返回，
+        合并方式与 batch_analyze 相同。
+        
+        Args:
+            poems_data: 诗歌数据列表
+            concurrency: 最大并发请求数
+            pack_size: 每次请求打包的短诗数量（1为逐首请求）
+            on_result: 每首诗歌完成后按输入顺序回调 (序号, 增强后的诗歌)
+            should_stop: 返回True时停止发起新的请求，已发出的请求完成后返回，未分析的诗歌在结果中为None
+            
+        Returns:
+            增强后的诗歌数据列表（与输入顺序一致）
+        """
+        total = len(poems_data)
+        results = [None] * total
+        if total == 0:
+            return results
+        
+        logger.info(f"开始并发分析 {total} 首诗歌，并发数: {concurrency}")
+        
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def analyze_unit(unit: List[int]):
+            async with semaphore:
+                if should_stop and should_stop():
+                    return unit, None
+                try:
+                    analyses = await loop.run_in_executor(executor, self._analyze_unit, poems_data, unit)
+                    return unit, [self._enrich_poem(poems_data[i], analysis)
+                                  for i, analysis in zip(unit, analyses)]
+                except Exception as e:
+                    logger.error(f"分析诗歌时出错 {poems_data[unit[0]].get('title', '未知')}: {e}")
+                    # 保留原始数据
+                    return unit, [poems_data[i] for i in unit]
+        
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # 按输入顺序创建任务，使请求大致按顺序发出，结果可以尽早按序回调
+            tasks = [asyncio.ensure_future(analyze_unit(unit)) for unit in self._plan_units(poems_data, pack_size)]
+            done = 0
+            next_emit = 0
+            for future in asyncio.as_completed(tasks):
+                unit, enriched_poems = await future
+                if enriched_poems is None:
+                    continue
+                for i, enriched_poem in zip(unit, enriched_poems):
+                    results[i] = enriched_poem
+                done += len(unit)
+                next_emit = self._emit_ready(results, next_emit, on_result)
+                if done // 50 != (done - len(unit)) // 50:
+                    logger.info(f"已分析 {done}/{total} 首诗歌")
+            # 暂停时未发出的请求留下空位，空位之后已完成的诗歌同样回调，恢复处理时不再重复请求
+            self._emit_ready(results, next_emit, on_result, skip_missing=True)
+        
+        logger.info(f"并发分析完成，成功分析 {len([p for p in results if p and 'ai_tags' in p and 'ai_failure' not in p])}/{total} 首诗歌")
+        return results
+    
+    def batch_analyze_concurrent(self, poems_data: List[Dict],
+                                 concurrency: int = 16,
+                                 pack_size: int = 1,
+                                 on_result: Optional[Callable[[int, Dict], None]] = None,
+                                 should_stop: Optional[Callable[[], bool]] = None) -> List[Dict]:
+        """
+        并发批量分析诗歌（同步调用入口）
+        
+        Args:
+            poems_data: 诗歌数据列表
+            concurrency: 最大并发请求数
+            pack_size: 每次请求打包的短诗数量（1为逐首请求）
+            on_result: 每首诗歌完成后按输入顺序回调 (序号, 增强后的诗歌)
+            should_stop: 返回True时停止发起新的请求
+            
+        Returns:
+            增强后的诗歌数据列表（与输入顺序一致）
+        """
+        return asyncio.run(self.batch_analyze_async(poems_data, concurrency, pack_size, on_result, should_stop))
+    
     def save_analysis_results(self, analyzed_poems: List[Dict], 
                             output_file: str = "website_data/ai_enhanced_poems.json"):
         """
@@ -286,12 +1125,12 @@ class AIPoemAnalyzer:
             
         logger.info(f"分析结果已保存到: {output_file}")
     
-    def generate_analysis_statistics(self, analyzed_poems: List[Dict]) -> Dict[str, Any]:
+    def generate_analysis_statistics(self, analyzed_poems: Iterable[Dict]) -> Dict[str, Any]:
         """
         生成分析统计信息
         
         Args:
-            analyzed_poems: 分析后的诗歌数据
+            analyzed_poems: 分析后的诗歌数据（只遍历一次，可以是从结果流逐行读取的迭代器）
             
         Returns:
             统计信息字典
@@ -299,7 +1138,7 @@ class AIPoemAnalyzer:
         from collections import Counter
         
         stats = {
-            'total_analyzed': len(analyzed_poems),
+            'total_analyzed': 0,
             'successful_analysis': 0,
             'style_distribution': Counter(),
             'scene_distribution': Counter(),
@@ -309,23 +1148,35 @@ class AIPoemAnalyzer:
         }
         
         for poem in analyzed_poems:
-            if 'ai_tags' in poem:
-                stats['successful_analysis'] += 1
-                tags = poem['ai_tags']
-                
-                # 统计各种标签
-                for style in tags.get('styles', []):
-                    stats['style_distribution'][style] += 1
-                for scene in tags.get('scenes', []):
-                    stats['scene_distribution'][scene] += 1
-                for emotion in tags.get('emotions', []):
-                    stats['emotion_distribution'][emotion] += 1
-                for theme in tags.get('themes', []):
-                    stats['theme_distribution'][theme] += 1
-                for keyword in tags.get('keywords', []):
-                    stats['top_keywords'][keyword] += 1
+            self.add_poem_statistics(stats, poem)
         
         return stats
+    
+    @staticmethod
+    def add_poem_statistics(stats: Dict[str, Any], poem: Dict):
+        """
+        将一首诗歌计入 generate_analysis_statistics 生成的统计信息
+        
+        Args:
+            stats: 统计信息字典
+            poem: 分析后的诗歌数据
+        """
+        stats['total_analyzed'] += 1
+        if 'ai_tags' in poem and 'ai_failure' not in poem:
+            stats['successful_analysis'] += 1
+            tags = poem['ai_tags']
+            
+            # 统计各种标签
+            for style in tags.get('styles', []):
+                stats['style_distribution'][style] += 1
+            for scene in tags.get('scenes', []):
+                stats['scene_distribution'][scene] += 1
+            for emotion in tags.get('emotions', []):
+                stats['emotion_distribution'][emotion] += 1
+            for theme in tags.get('themes', []):
+                stats['theme_distribution'][theme] += 1
+            for keyword in tags.get('keywords', []):
+                stats['top_keywords'][keyword] += 1
 
 def main():
     """主函数 - 演示使用"""
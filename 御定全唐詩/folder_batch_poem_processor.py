@@ -13,9 +13,26 @@ import argparse
 import logging
 import signal
 import sys
-from typing import List, Dict, Any
-from deepseek_poem_analyzer import AIPoemAnalyzer
+import glob
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from deepseek_poem_analyzer import AIPoemAnalyzer, DEFAULT_BASE_URL, DEFAULT_MODEL
+from analysis_backends import BACKENDS
+from rate_limiter import RateLimiter
+from retry_policy import CircuitBreaker
+from analysis_cache import AnalysisCache
+from api_metrics import APIMetrics
+from adaptive_concurrency import AdaptiveConcurrencyLimiter
+from hedging import HedgePolicy
+from cascade_analyzer import LocalCascade
+from cost_estimator import RunEstimator, print_estimate
+from replay_queue import (ReplayQueue, REPLAY_QUEUE_FILE_NAME, load_replay_queue,
+                          rewrite_replay_queue, replay_reason, strip_analysis)
+from jsonl_stream import JSONLStreamWriter, compact_jsonl, iter_deduplicated, iter_jsonl
 from progress_manager import ProgressManager, check_resume_processing, cleanup_progress_file
+from sharding import (parse_shard, select_shard_files, shard_file_name,
+                      merge_shard_outputs, merge_shard_statistics)
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -32,29 +49,103 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 逐首追加的结果流和由它压缩生成的合并文件
+STREAM_FILE_NAME = "ai_enhanced_poems.jsonl"
+MERGED_FILE_NAME = "ai_enhanced_poems_merged.json"
+STATS_FILE_NAME = "folder_ai_analysis_statistics.json"
+METRICS_FILE_NAME = "api_metrics.jsonl"
+PROGRESS_FILE_NAME = "processing_progress.json"
+
+# 每完成多少首诗歌保存一次诗歌级检查点（用于进度显示；恢复处理时以结果流为准）
+CHECKPOINT_EVERY = 10
+
+def poem_stream_key(poem: Dict) -> Optional[tuple]:
+    """
+    结果流去重键：来源文件 + 诗歌在文件中的序号
+    
+    同一文件中可能有多首标题、作者相同且缺少卷号的诗歌（如多首《無題》），
+    不能用内容生成的诗歌ID去重；没有序号的旧记录不去重
+    """
+    if 'source_index' not in poem:
+        return None
+    return (poem.get('source_file'), poem['source_index'])
+
 class FolderBatchPoemProcessor:
     """文件夹批量诗歌处理器"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, pool_size: int = 16, http2: bool = False,
+                 rate_limiter: RateLimiter = None, cache: AnalysisCache = None,
+                 base_url: str = DEFAULT_BASE_URL,
+                 progress_file: str = PROGRESS_FILE_NAME,
+                 metrics: APIMetrics = None,
+                 concurrency_limiter: AdaptiveConcurrencyLimiter = None,
+                 hedge_policy: HedgePolicy = None,
+                 cascade: LocalCascade = None,
+                 compact_schema: bool = False,
+                 backend: str = 'deepseek', model: str = DEFAULT_MODEL):
         """
         初始化文件夹批量处理器
         
         Args:
             api_key: DeepSeek API密钥
+            pool_size: HTTP连接池大小（建议不小于并发数）
+            http2: 是否尝试使用HTTP/2
+            rate_limiter: 所有请求共享的限流器
+            cache: 分析结果缓存
+            base_url: API基础URL
+            progress_file: 进度文件路径
+            metrics: API调用指标收集器，汇总到统计信息的 api_metrics 中
+            concurrency_limiter: 自适应并发限制器，所有分析器共享
+            hedge_policy: 对冲策略，所有分析器共享（延迟分位数和对冲预算全局统计）
+            cascade: 本地分析器级联，本地分析置信度足够的诗歌不调用API
+            compact_schema: 是否使用短键的紧凑返回格式，减少输出token
+            backend: 分析后端（deepseek / openai / rules / stub），每个分析器创建独立的后端实例
+            model: 模型名称
         """
-        self.analyzer = AIPoemAnalyzer(api_key)
-        self.progress_manager = ProgressManager()
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self.http2 = http2
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.metrics = metrics
+        self.concurrency_limiter = concurrency_limiter
+        self.hedge_policy = hedge_policy
+        self.cascade = cascade
+        self.compact_schema = compact_schema
+        self.backend = backend
+        self.model = model
+        # 所有分析器共享一个熔断器，任一文件错误率激增时全部暂停
+        self.circuit_breaker = CircuitBreaker()
+        self.analyzer = self._create_analyzer()
+        # 文件级并行时每个工作线程使用独立的分析器（独立连接池）
+        self.analyzers = [self.analyzer]
+        self.progress_manager = ProgressManager(progress_file)
+        # 需要重新分析的诗歌队列，在 process_folder 中按输出文件夹创建
+        self.replay_queue = None
+        # 恢复处理时从结果流读出的已完成诗歌: 文件名 -> {诗歌序号 -> 结果}
+        self.checkpointed_results = {}
         self.should_pause = False
         
         # 设置信号处理器，支持Ctrl+C暂停
         signal.signal(signal.SIGINT, self._signal_handler)
     
+    def _create_analyzer(self) -> AIPoemAnalyzer:
+        """创建共享限流器、缓存和熔断器的分析器"""
+        return AIPoemAnalyzer(self.api_key, pool_size=self.pool_size, http2=self.http2,
+                              rate_limiter=self.rate_limiter, cache=self.cache, model=self.model,
+                              base_url=self.base_url, circuit_breaker=self.circuit_breaker,
+                              metrics=self.metrics, concurrency_limiter=self.concurrency_limiter,
+                              hedge_policy=self.hedge_policy, cascade=self.cascade,
+                              compact=self.compact_schema, backend=self.backend)
+    
     def _signal_handler(self, signum, frame):
         """信号处理器，支持Ctrl+C暂停"""
         print("\n\n⏸️  收到暂停信号，正在保存进度...")
         self.should_pause = True
         
-    def scan_json_files(self, folder_path: str = "json") -> List[str]:
+    @staticmethod
+    def scan_json_files(folder_path: str = "json") -> List[str]:
         """
         扫描文件夹中的JSON文件
         
@@ -77,6 +168,28 @@ class FolderBatchPoemProcessor:
         logger.info(f"扫描到 {len(json_files)} 个JSON文件")
         return json_files
     
+    @staticmethod
+    def select_files(folder_path: str = "json", start_file: int = 1, end_file: int = None,
+                     shard: Optional[Tuple[int, int]] = None) -> List[str]:
+        """
+        选择要处理的文件：按文件编号范围筛选，指定分片时只保留本分片的文件
+        
+        Args:
+            folder_path: 输入文件夹路径
+            start_file: 开始文件编号
+            end_file: 结束文件编号
+            shard: (分片序号, 分片总数)
+            
+        Returns:
+            文件路径列表
+        """
+        json_files = FolderBatchPoemProcessor.scan_json_files(folder_path)
+        files = json_files[start_file-1:end_file]
+        if shard:
+            files = select_shard_files(files, shard)
+            logger.info(f"分片 {shard[0]}/{shard[1]}: 分到 {len(files)} 个文件")
+        return files
+    
     def load_poems_from_file(self, file_path: str) -> List[Dict]:
         """
         从单个JSON文件加载诗歌数据
@@ -91,9 +204,10 @@ class FolderBatchPoemProcessor:
             with open(file_path, 'r', encoding='utf-8') as f:
                 poems_data = json.load(f)
             
-            # 为每首诗歌添加文件来源信息
-            for poem in poems_data:
+            # 为每首诗歌添加文件来源信息和在文件中的序号（结果流去重和检查点使用）
+            for index, poem in enumerate(poems_data):
                 poem['source_file'] = os.path.basename(file_path)
+                poem['source_index'] = index
                 
             logger.info(f"从 {file_path} 加载了 {len(poems_data)} 首诗歌")
             return poems_data
@@ -110,7 +224,12 @@ class FolderBatchPoemProcessor:
                       batch_size: int = 20,
                       delay: float = 1.0,
                       output_folder: str = "website_data",
-                      resume: bool = False) -> Dict[str, Any]:
+                      resume: bool = False,
+                      concurrency: int = 1,
+                      pack_size: int = 1,
+                      merge: bool = True,
+                      file_workers: int = 1,
+                      shard: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
         """
         处理文件夹中的所有JSON文件，支持暂停和续传
         
@@ -119,24 +238,27 @@ class FolderBatchPoemProcessor:
             start_file: 开始文件编号
             end_file: 结束文件编号
             batch_size: 批次大小
-            delay: 请求间隔
+            delay: 请求间隔（仅在未配置限流器时使用）
             output_folder: 输出文件夹路径
             resume: 是否恢复之前的处理
+            concurrency: 每个文件内的并发请求数（大于1时使用并发分析）
+            pack_size: 每次请求打包的短诗数量（1为逐首请求）
+            merge: 处理完成后是否将结果流压缩为合并JSON文件
+            file_workers: 同时处理的文件数（大于1时多个文件并行处理，共享限流器和进度日志）
+            shard: (分片序号, 分片总数)，只处理按文件名哈希分到本分片的文件，
+                   结果流使用分片文件名，合并文件由 --merge-shards 统一生成
             
         Returns:
             处理结果统计
         """
-        # 扫描JSON文件
-        json_files = self.scan_json_files(folder_path)
-        
-        if end_file is None:
-            end_file = len(json_files)
-        
-        # 筛选文件范围
-        files_to_process = json_files[start_file-1:end_file]
+        # 扫描并筛选文件范围
+        files_to_process = self.select_files(folder_path, start_file, end_file, shard)
+        if shard:
+            merge = False
         
         # 检查是否需要恢复处理
-        if resume and check_resume_processing():
+        resuming = resume and check_resume_processing(self.progress_manager.progress_file)
+        if resuming:
             print("🔄 检测到未完成的处理任务，正在恢复...")
             remaining_files = self.progress_manager.get_remaining_files(files_to_process)
             files_to_process = remaining_files
@@ -145,82 +267,443 @@ class FolderBatchPoemProcessor:
             # 开始新的处理
             self.progress_manager.start_processing(len(files_to_process))
         
-        logger.info(f"处理文件范围: {start_file} 到 {end_file}，共 {len(files_to_process)} 个文件")
+        logger.info(f"处理文件范围: {start_file} 到 {end_file or '最后'}，共 {len(files_to_process)} 个文件")
         
-        all_processed_poems = []
+        # 每首诗歌完成后立即追加到结果流，恢复处理时在原有结果后继续追加
+        stream_file = os.path.join(output_folder, shard_file_name(STREAM_FILE_NAME, shard))
+        self.checkpointed_results = (self._load_checkpointed_results(stream_file, files_to_process)
+                                     if resuming else {})
+        stream = JSONLStreamWriter(stream_file, truncate=not resuming)
+        # 分析失败、备用分析和基础标签的诗歌记入重放队列，之后可用 --replay-failed 只重新分析这些诗歌
+        self.replay_queue = ReplayQueue(os.path.join(output_folder, shard_file_name(REPLAY_QUEUE_FILE_NAME, shard)),
+                                        truncate=not resuming)
         file_stats = {}
+        options = {
+            'batch_size': batch_size,
+            'delay': delay,
+            'concurrency': concurrency,
+            'pack_size': pack_size
+        }
+        
+        if file_workers > 1:
+            logger.info(f"文件级并行处理，工作线程数: {file_workers}")
+            paused = self._process_files_parallel(files_to_process, file_workers, stream,
+                                                  output_folder, file_stats, options)
+        else:
+            paused = False
+            for file_path in files_to_process:
+                # 检查是否需要暂停
+                if self.should_pause or self._process_file(file_path, self.analyzer, stream,
+                                                           output_folder, file_stats, options) is None:
+                    paused = True
+                    break
         
-        for file_path in files_to_process:
-            # 检查是否需要暂停
+        if paused:
+            # 已完成的诗歌已写入结果流，恢复处理时从结果流读回
+            stream.close()
+            self.replay_queue.close()
+            print("\n⏸️ 正在暂停处理...")
+            self.progress_manager.pause_processing()
+            self.progress_manager.print_progress_summary()
+            print("💡 提示: 使用 --resume 参数可以从中断的诗歌继续处理")
+            return {"status": "paused", "processed_poems": stream.records_written}
+        
+        stream.close()
+        self.replay_queue.close()
+        
+        # 压缩结果流生成合并文件
+        if merge and stream.records_written:
+            self.compact_results(output_folder)
+        
+        # 生成统计信息（从结果流逐行读取，按与合并文件相同的键去重，恢复处理和重试的诗歌只计一次）
+        stats = self.generate_comprehensive_statistics(iter_deduplicated(stream_file, key=poem_stream_key))
+        stats['file_statistics'] = file_stats
+        if shard:
+            stats['shard'] = f"{shard[0]}/{shard[1]}"
+        stats.update(self._collect_api_statistics())
+        stats['replay_queue'] = {'queued': self.replay_queue.recorded,
+                                 'queue_file': self.replay_queue.queue_file}
+        if self.rate_limiter:
+            stats['rate_limit_statistics'] = self.rate_limiter.get_stats()
+        if self.cache:
+            stats['cache_statistics'] = self.cache.get_stats()
+        if self.concurrency_limiter:
+            stats['concurrency_statistics'] = self.concurrency_limiter.get_stats()
+        if self.hedge_policy:
+            stats['hedge_statistics'] = self.hedge_policy.get_stats()
+        if self.cascade:
+            stats['cascade_statistics'] = self.cascade.get_stats()
+        
+        # 标记处理完成
+        self.progress_manager.complete_processing()
+        
+        return stats
+    
+    def _process_files_parallel(self, files_to_process: List[str], file_workers: int,
+                                stream: JSONLStreamWriter, output_folder: str,
+                                file_stats: Dict[str, Dict], options: Dict[str, Any]) -> bool:
+        """
+        用工作线程池并行处理多个文件
+        
+        Args:
+            files_to_process: 待处理的文件
+            file_workers: 工作线程数
+            stream: 结果流写入器（线程安全）
+            output_folder: 输出文件夹路径
+            file_stats: 各文件统计（由各工作线程写入）
+            options: 传给 _process_file 的分析参数
+            
+        Returns:
+            是否因暂停而提前结束
+        """
+        while len(self.analyzers) < file_workers:
+            self.analyzers.append(self._create_analyzer())
+        idle_analyzers = queue.Queue()
+        for analyzer in self.analyzers[:file_workers]:
+            idle_analyzers.put(analyzer)
+        
+        def worker(file_path: str) -> Optional[Dict[str, Any]]:
             if self.should_pause:
-                print("\n⏸️ 正在暂停处理...")
-                self.progress_manager.pause_processing()
-                self.progress_manager.print_progress_summary()
-                print("💡 提示: 使用 --resume 参数可以恢复处理")
-                return {"status": "paused", "processed_files": len(all_processed_poems)}
+                return None
+            analyzer = idle_analyzers.get()
+            try:
+                return self._process_file(file_path, analyzer, stream,
+                                          output_folder, file_stats, options)
+            finally:
+                idle_analyzers.put(analyzer)
+        
+        paused = False
+        with ThreadPoolExecutor(max_workers=file_workers) as executor:
+            futures = [executor.submit(worker, file_path) for file_path in files_to_process]
+            for future in as_completed(futures):
+                if future.result() is None:
+                    paused = True
+        return paused
+    
+    def _process_file(self, file_path: str, analyzer: AIPoemAnalyzer,
+                      stream: JSONLStreamWriter, output_folder: str,
+                      file_stats: Dict[str, Dict], options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        处理单个文件：分析、保存单文件结果并记录进度
+        
+        Args:
+            file_path: 文件路径
+            analyzer: 使用的分析器
+            stream: 结果流写入器
+            output_folder: 输出文件夹路径
+            file_stats: 各文件统计，处理结果写入其中
+            options: 分析参数（batch_size、delay、concurrency、pack_size）
             
-            file_name = os.path.basename(file_path)
-            logger.info(f"开始处理文件: {file_name}")
+        Returns:
+            文件统计，处理中途暂停时返回None
+        """
+        file_name = os.path.basename(file_path)
+        logger.info(f"开始处理文件: {file_name}")
+        
+        try:
+            # 设置当前处理文件
+            poems_data = self.load_poems_from_file(file_path)
+            self.progress_manager.set_current_file(file_path, len(poems_data))
             
-            try:
-                # 设置当前处理文件
-                poems_data = self.load_poems_from_file(file_path)
-                self.progress_manager.set_current_file(file_path, len(poems_data))
-                
-                # 处理诗歌
-                processed_poems = self.analyzer.batch_analyze(
-                    poems_data,
-                    batch_size=batch_size,
-                    delay=delay
-                )
-                
-                # 更新进度
-                successful_count = len([p for p in processed_poems if 'ai_tags' in p])
-                self.progress_manager.update_file_progress(len(processed_poems), successful_count)
-                
-                # 保存单个文件的结果
-                output_file = os.path.join(output_folder, f"ai_enhanced_{file_name}")
-                self.save_results(processed_poems, output_file)
-                
-                # 统计信息
-                file_stats[file_name] = {
-                    'total_poems': len(poems_data),
-                    'successful_analysis': successful_count,
-                    'failed_analysis': len([p for p in processed_poems if 'ai_tags' not in p])
-                }
+            processed_poems = self._process_file_poems(file_path, poems_data, analyzer,
+                                                       stream, **options)
+            if processed_poems is None:
+                return None
+            
+            # 更新进度
+            successful_count = len([p for p in processed_poems if 'ai_tags' in p and 'ai_failure' not in p])
+            self.progress_manager.update_file_progress(file_path, len(processed_poems), successful_count)
+            
+            # 保存单个文件的结果
+            output_file = os.path.join(output_folder, f"ai_enhanced_{file_name}")
+            self.save_results(processed_poems, output_file)
+            
+            # 统计信息
+            file_stats[file_name] = {
+                'total_poems': len(poems_data),
+                'successful_analysis': successful_count,
+                'failed_analysis': len(processed_poems) - successful_count
+            }
+            
+            # 结果落盘后再标记文件完成
+            stream.flush()
+            self.progress_manager.complete_file(file_path, successful_count, len(poems_data))
+            
+            logger.info(f"文件 {file_name} 处理完成")
+            
+            # 打印进度
+            self.progress_manager.print_progress_summary()
+            
+        except Exception as e:
+            logger.error(f"处理文件 {file_name} 失败: {e}")
+            self.progress_manager.mark_file_failed(file_path, str(e))
+            file_stats[file_name] = {
+                'total_poems': 0,
+                'successful_analysis': 0,
+                'failed_analysis': 0,
+                'error': str(e)
+            }
+        
+        return file_stats[file_name]
+    
+    def _collect_api_statistics(self) -> Dict[str, Any]:
+        """汇总所有分析器的连接、重试统计和失败记录"""
+        connection_stats = [analyzer.api_client.get_connection_stats() for analyzer in self.analyzers]
+        requests_sent = sum(conn['requests'] for conn in connection_stats)
+        connections = sum(conn['connections_opened'] for conn in connection_stats)
+        
+        retries = sum(analyzer.api_client.get_retry_stats()['retries'] for analyzer in self.analyzers)
+        retry_stats = self.circuit_breaker.get_stats()
+        retry_stats['retries'] = retries
+        
+        failed_poems = []
+        for analyzer in self.analyzers:
+            failed_poems.extend(analyzer.failures.values())
+        
+        return {
+            'connection_statistics': {
+                'transport': connection_stats[0]['transport'],
+                'pool_size': connection_stats[0]['pool_size'],
+                'analyzers': len(self.analyzers),
+                'requests': requests_sent,
+                'connections_opened': connections,
+                'connection_reuse_rate': (1 - connections / requests_sent) if requests_sent else 0.0
+            },
+            'retry_statistics': retry_stats,
+            'failed_poems': failed_poems
+        }
+    
+    def _load_checkpointed_results(self, stream_file: str, files: List[str]) -> Dict[str, Dict[int, Dict]]:
+        """
+        恢复处理时读取一遍结果流，取出未完成文件中已分析成功的诗歌结果
+        
+        以结果流为准（按来源文件 + 诗歌序号），而不是每 CHECKPOINT_EVERY 首记录一次的检查点：
+        已写入结果流但崩溃前未记入检查点的诗歌同样不再调用API。
+        
+        Args:
+            stream_file: 结果流文件路径
+            files: 待处理的文件
+            
+        Returns:
+            文件名 -> {诗歌序号 -> 增强后的诗歌}
+        """
+        results = {os.path.basename(file_path): {} for file_path in files}
+        for poem in iter_jsonl(stream_file):
+            done = results.get(poem.get('source_file'))
+            if done is None or 'source_index' not in poem:
+                continue
+            # 同一首诗歌出现多次时以最后一次为准，最后一次失败的诗歌重新分析
+            if 'ai_failure' in poem:
+                done.pop(poem['source_index'], None)
+            else:
+                done[poem['source_index']] = poem
+        return {file_name: done for file_name, done in results.items() if done}
+    
+    def _process_file_poems(self, file_path: str, poems_data: List[Dict],
+                            analyzer: AIPoemAnalyzer,
+                            stream: JSONLStreamWriter,
+                            batch_size: int = 20, delay: float = 1.0,
+                            concurrency: int = 1, pack_size: int = 1) -> List[Dict]:
+        """
+        分析单个文件中的诗歌，支持从诗歌级检查点恢复
+        
+        结果流中已完成的诗歌直接使用恢复时读出的结果，不再调用API；
+        新完成的诗歌先写入结果流并落盘，再每 CHECKPOINT_EVERY 首记录一次检查点。
+        
+        Args:
+            file_path: 文件路径
+            poems_data: 文件中的诗歌数据
+            analyzer: 使用的分析器
+            stream: 结果流写入器
+            batch_size: 批次大小
+            delay: 请求间隔（仅在未配置限流器时使用）
+            concurrency: 并发请求数
+            pack_size: 每次请求打包的短诗数量
+            
+        Returns:
+            按原顺序排列的增强诗歌数据，处理中途暂停时返回None
+        """
+        file_name = os.path.basename(file_path)
+        
+        # 上次中断前已完成的诗歌结果（按诗歌在文件中的序号）
+        done_results = self.checkpointed_results.pop(file_name, {})
+        if done_results:
+            print(f"🔄 {file_name}: 跳过已完成的 {len(done_results)} 首诗歌")
+        
+        pending_poems = [poem for poem in poems_data if poem['source_index'] not in done_results]
+        checkpoint_ids = []
+        
+        def checkpoint():
+            stream.flush()
+            self.progress_manager.mark_poems_completed(file_path, checkpoint_ids)
+            checkpoint_ids.clear()
+        
+        def on_result(index: int, poem: Dict):
+            stream.write(poem)
+            if self.replay_queue:
+                self.replay_queue.record(poem)
+            # 失败的诗歌不记入检查点，恢复时重新分析
+            if 'ai_failure' not in poem:
+                checkpoint_ids.append(poem['source_index'])
+            if len(checkpoint_ids) >= CHECKPOINT_EVERY:
+                checkpoint()
+        
+        should_stop = lambda: self.should_pause
+        if concurrency > 1:
+            analyzed_poems = analyzer.batch_analyze_concurrent(
+                pending_poems,
+                concurrency=concurrency,
+                pack_size=pack_size,
+                on_result=on_result,
+                should_stop=should_stop
+            )
+        else:
+            analyzed_poems = analyzer.batch_analyze(
+                pending_poems,
+                batch_size=batch_size,
+                delay=delay,
+                pack_size=pack_size,
+                on_result=on_result,
+                should_stop=should_stop
+            )
+        checkpoint()
+        
+        if None in analyzed_poems:
+            return None
+        
+        # 按原顺序合并已完成和新分析的诗歌
+        analyzed = iter(analyzed_poems)
+        return [done_results.get(poem['source_index']) or next(analyzed) for poem in poems_data]
+    
+    def compact_results(self, output_folder: str = "website_data") -> int:
+        """
+        将结果流压缩为合并JSON文件
+        
+        同一首诗歌被重复分析时（例如恢复处理）只保留最后一次的结果
+        
+        Args:
+            output_folder: 输出文件夹路径
+            
+        Returns:
+            合并文件中的诗歌数量
+        """
+        stream_file = os.path.join(output_folder, STREAM_FILE_NAME)
+        merged_output = os.path.join(output_folder, MERGED_FILE_NAME)
+        return compact_jsonl(stream_file, merged_output, key=poem_stream_key)
+    
+    def replay_failed(self, output_folder: str = "website_data",
+                      shard: Optional[Tuple[int, int]] = None,
+                      batch_size: int = 20, delay: float = 1.0,
+                      concurrency: int = 1, pack_size: int = 1) -> Dict[str, Any]:
+        """
+        只重新分析重放队列中的诗歌，并原地修补 ai_enhanced_*.json
+        
+        每首诗歌先按当前输出文件确认仍需重新分析（之前恢复处理时可能已经成功）；
+        修补后的诗歌追加到结果流，合并文件存在时重新生成；仍然失败的诗歌留在队列中。
+        
+        Args:
+            output_folder: 输出文件夹路径
+            shard: (分片序号, 分片总数)，使用该分片的队列和结果流
+            batch_size: 批次大小
+            delay: 请求间隔（仅在未配置限流器时使用）
+            concurrency: 并发请求数
+            pack_size: 每次请求打包的短诗数量
+            
+        Returns:
+            重放统计
+        """
+        queue_file = os.path.join(output_folder, shard_file_name(REPLAY_QUEUE_FILE_NAME, shard))
+        queue = load_replay_queue(queue_file)
+        summary = {'queued': sum(len(entries) for entries in queue.values()),
+                   'replayed': 0, 'fixed': 0, 'still_failed': 0, 'skipped': 0, 'files': 0}
+        remaining = []
+        stream_file = os.path.join(output_folder, shard_file_name(STREAM_FILE_NAME, shard))
+        
+        with JSONLStreamWriter(stream_file) as stream:
+            for source_file, entries in queue.items():
+                output_file = os.path.join(output_folder, f"ai_enhanced_{source_file}")
+                if self.should_pause or not os.path.exists(output_file):
+                    if not self.should_pause:
+                        logger.warning(f"未找到输出文件，保留队列记录: {output_file}")
+                    remaining.extend(entries.values())
+                    continue
                 
-                # 完成文件处理
-                self.progress_manager.complete_file(file_path, successful_count, len(poems_data))
+                with open(output_file, 'r', encoding='utf-8') as f:
+                    poems = json.load(f)
+                targets = [i for i, poem in enumerate(poems)
+                           if poem.get('source_index') in entries and replay_reason(poem)]
+                summary['skipped'] += len(entries) - len(targets)
+                if not targets:
+                    continue
                 
-                all_processed_poems.extend(processed_poems)
-                logger.info(f"文件 {file_name} 处理完成")
+                logger.info(f"重新分析 {source_file} 中的 {len(targets)} 首诗歌")
+                pending = [strip_analysis(poems[i]) for i in targets]
+                should_stop = lambda: self.should_pause
+                if concurrency > 1:
+                    analyzed = self.analyzer.batch_analyze_concurrent(
+                        pending, concurrency=concurrency, pack_size=pack_size, should_stop=should_stop)
+                else:
+                    analyzed = self.analyzer.batch_analyze(
+                        pending, batch_size=batch_size, delay=delay, pack_size=pack_size, should_stop=should_stop)
                 
-                # 打印进度
-                self.progress_manager.print_progress_summary()
+                for i, poem in zip(targets, analyzed):
+                    entry = entries[poems[i]['source_index']]
+                    if poem is None:
+                        # 暂停时未分析的诗歌
+                        remaining.append(entry)
+                        continue
+                    summary['replayed'] += 1
+                    reason = replay_reason(poem)
+                    if reason:
+                        summary['still_failed'] += 1
+                        remaining.append(dict(entry, reason=reason, time=time.time()))
+                        continue
+                    summary['fixed'] += 1
+                    poems[i] = poem
+                    stream.write(poem)
                 
-            except Exception as e:
-                logger.error(f"处理文件 {file_name} 失败: {e}")
-                self.progress_manager.mark_file_failed(file_path, str(e))
-                file_stats[file_name] = {
-                    'total_poems': 0,
-                    'successful_analysis': 0,
-                    'failed_analysis': 0,
-                    'error': str(e)
-                }
-        
-        # 保存合并结果
-        if all_processed_poems:
-            merged_output = os.path.join(output_folder, "ai_enhanced_poems_merged.json")
-            self.save_results(all_processed_poems, merged_output)
-        
-        # 生成统计信息
-        stats = self.generate_comprehensive_statistics(all_processed_poems)
-        stats['file_statistics'] = file_stats
+                self.save_results(poems, output_file)
+                summary['files'] += 1
         
-        # 标记处理完成
-        self.progress_manager.complete_processing()
+        rewrite_replay_queue(queue_file, remaining)
         
-        return stats
+        # 合并文件已存在时用修补后的结果流重新生成
+        merged_output = os.path.join(output_folder, MERGED_FILE_NAME)
+        if summary['fixed'] and not shard and os.path.exists(merged_output):
+            self.compact_results(output_folder)
+        
+        summary['queue_file'] = queue_file
+        summary['remaining'] = len(remaining)
+        return summary
+    
+    @staticmethod
+    def merge_shards(shard_folders: List[str], output_folder: str = "website_data") -> Dict[str, Any]:
+        """
+        归并各分片的分析结果和统计信息
+        
+        Args:
+            shard_folders: 各分片的输出文件夹（各机器结果拷贝到的位置，或共享的输出文件夹）
+            output_folder: 合并结果输出文件夹
+            
+        Returns:
+            合并后的统计信息
+        """
+        merged_output = os.path.join(output_folder, MERGED_FILE_NAME)
+        count = merge_shard_outputs(shard_folders, merged_output)
+        
+        stats_pattern = shard_file_name(STATS_FILE_NAME, ('*', '*'))
+        stats_files = sorted(set(path for folder in shard_folders
+                                 for path in glob.glob(os.path.join(folder, stats_pattern))))
+        metrics_pattern = shard_file_name(METRICS_FILE_NAME, ('*', '*'))
+        metrics_files = sorted(set(path for folder in shard_folders
+                                   for path in glob.glob(os.path.join(folder, metrics_pattern))))
+        stats = {}
+        if stats_files:
+            stats = merge_shard_statistics(stats_files, os.path.join(output_folder, STATS_FILE_NAME),
+                                           metrics_files=metrics_files)
+        
+        return {'merged_poems': count, 'merged_output': merged_output,
+                'stats_files': stats_files, 'statistics': stats}
     
     def save_results(self, processed_poems: List[Dict], output_file: str):
         """
@@ -233,24 +716,27 @@ class FolderBatchPoemProcessor:
         # 确保输出目录存在
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
+        # 先写临时文件再原子替换，检索器增量载入时不会读到写了一半的文件
+        temp_file = output_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(processed_poems, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, output_file)
         
         logger.info(f"处理结果已保存到: {output_file}")
     
-    def generate_comprehensive_statistics(self, processed_poems: List[Dict]) -> Dict[str, Any]:
+    def generate_comprehensive_statistics(self, processed_poems: Iterable[Dict]) -> Dict[str, Any]:
         """
-        生成综合统计信息
+        生成综合统计信息（只遍历一次诗歌数据）
         
         Args:
-            processed_poems: 处理后的诗歌数据
+            processed_poems: 处理后的诗歌数据，可以是从结果流逐行读取的迭代器
             
         Returns:
             统计信息字典
         """
         from collections import Counter
         
-        stats = self.analyzer.generate_analysis_statistics(processed_poems)
+        stats = self.analyzer.generate_analysis_statistics([])
         
         # 添加更多统计维度
         stats['author_distribution'] = Counter()
@@ -265,6 +751,8 @@ class FolderBatchPoemProcessor:
         }
         
         for poem in processed_poems:
+            self.analyzer.add_poem_statistics(stats, poem)
+            
             # 作者分布
             stats['author_distribution'][poem.get('author', '未知')] += 1
             
@@ -288,10 +776,14 @@ class FolderBatchPoemProcessor:
                 if tags.get('rhetoric'):
                     stats['tag_coverage']['has_rhetoric'] += 1
         
+        # token用量、延迟分布和费用
+        if self.metrics:
+            stats['api_metrics'] = self.metrics.get_stats()
+        
         return stats
     
     def save_statistics(self, stats: Dict[str, Any], 
-                       stats_file: str = "website_data/folder_ai_analysis_statistics.json"):
+                       stats_file: str = os.path.join("website_data", STATS_FILE_NAME)):
         """
         保存统计信息
         
@@ -361,6 +853,64 @@ class FolderBatchPoemProcessor:
         print(f"  主题标签: {coverage['has_themes']}/{total} ({coverage['has_themes']/total*100:.1f}%)")
         print(f"  修辞标签: {coverage['has_rhetoric']}/{total} ({coverage['has_rhetoric']/total*100:.1f}%)")
         
+        if 'connection_statistics' in stats:
+            conn = stats['connection_statistics']
+            print(f"\n🔌 连接复用 ({conn['transport']}):")
+            print(f"  请求数: {conn['requests']}，新建连接: {conn['connections_opened']}，"
+                  f"复用率: {conn['connection_reuse_rate']*100:.1f}%")
+        
+        if 'rate_limit_statistics' in stats:
+            limit = stats['rate_limit_statistics']
+            print(f"\n🚦 限流: 等待 {limit['throttled_count']} 次，各请求累计等待 {limit['total_wait_seconds']} 秒")
+        
+        if 'concurrency_statistics' in stats:
+            concurrency = stats['concurrency_statistics']
+            print(f"\n🎚️ 自适应并发: 当前 {concurrency['limit']}（范围 {concurrency['lowest_limit']}~{concurrency['peak_limit']}，"
+                  f"上限 {concurrency['max_limit']}），减少 {concurrency['decreases']} 次")
+        
+        if 'hedge_statistics' in stats:
+            hedge = stats['hedge_statistics']
+            print(f"\n🪝 对冲请求: {hedge['hedges']} 次（占 {hedge['hedge_rate']*100:.1f}%），"
+                  f"先于原请求返回 {hedge['hedge_wins']} 次，预算不足 {hedge['budget_exhausted']} 次")
+            discarded = stats.get('api_metrics', {}).get('discarded')
+            if discarded and discarded['requests']:
+                print(f"  未采用的请求: {discarded['requests']} 次，输入 {discarded['prompt_tokens']} / "
+                      f"输出 {discarded['completion_tokens']} token，费用 {discarded['estimated_cost']} 元（已计入估算费用）")
+        
+        if 'cascade_statistics' in stats:
+            cascade = stats['cascade_statistics']
+            print(f"\n🪜 本地分析级联: {cascade['local_accepted']}/{cascade['checked']} 首使用本地结果"
+                  f"（阈值 {cascade['threshold']}），减少API调用 {cascade['api_calls_avoided_rate']*100:.1f}%")
+        
+        if 'retry_statistics' in stats:
+            retry = stats['retry_statistics']
+            print(f"\n🔁 重试: {retry['retries']} 次，熔断 {retry['trip_count']} 次（累计暂停 {retry['total_wait_seconds']} 秒）")
+        
+        if stats.get('failed_poems'):
+            print(f"\n⚠️ 分析失败的诗歌: {len(stats['failed_poems'])} 首（已在结果中标记 ai_failure，可只重新分析这些诗歌）")
+        
+        if stats.get('replay_queue', {}).get('queued'):
+            print(f"\n♻️ 重放队列: {stats['replay_queue']['queued']} 首诗歌需要重新分析（含备用分析和基础标签），"
+                  f"使用 --replay-failed 只重新分析这些诗歌")
+            for record in stats['failed_poems'][:10]:
+                print(f"  {record['poem_id']} {record['title']} - {record['reason']}: {record['error']}")
+        
+        if 'api_metrics' in stats:
+            metrics = stats['api_metrics']
+            latency = metrics['latency_ms']
+            print(f"\n⏱️ API调用: {metrics['requests']} 次（失败 {metrics['failed_requests']}），"
+                  f"延迟 p50 {latency['p50']}ms / p95 {latency['p95']}ms / p99 {latency['p99']}ms")
+            print(f"  token: 输入 {metrics['prompt_tokens']}（缓存命中 {metrics['prompt_cache_hit_tokens']}），"
+                  f"输出 {metrics['completion_tokens']}，平均每首 {metrics['tokens_per_poem']}，"
+                  f"估算费用 {metrics['estimated_cost']} 元")
+            for label, group in metrics['tokens_by_poem_length'].items():
+                print(f"  {label}字: {group['poems']}首，每首 {group['tokens_per_poem']} token")
+        
+        if 'cache_statistics' in stats:
+            cache = stats['cache_statistics']
+            print(f"\n💾 分析缓存: 命中 {cache['hits']} / 未命中 {cache['misses']} "
+                  f"(命中率 {cache['hit_rate']*100:.1f}%)，缓存条目 {cache['entries']}")
+        
         # 文件统计详情
         if 'file_statistics' in stats:
             print(f"\n📋 文件处理详情:")
@@ -380,28 +930,115 @@ def main():
     parser.add_argument('--start-file', type=int, default=1, help='开始文件编号')
     parser.add_argument('--end-file', type=int, help='结束文件编号')
     parser.add_argument('--batch-size', type=int, default=20, help='批次大小')
-    parser.add_argument('--delay', type=float, default=1.0, help='请求间隔（秒）')
+    parser.add_argument('--rps', type=float, default=5.0, help='每秒请求数上限（所有并发请求共享，0为不限制）')
+    parser.add_argument('--tpm', type=float, default=0, help='每分钟token数上限（0为不限制）')
+    parser.add_argument('--concurrency', type=int, default=1, help='并发请求数（如16~64，默认1为逐首处理）')
+    parser.add_argument('--adaptive-concurrency', action='store_true',
+                        help='按服务端负载自动调整同时进行的请求数（AIMD），--concurrency 作为上限（默认64）')
+    parser.add_argument('--hedge', action='store_true', help='慢请求超过近期p95延迟时发送对冲请求，采用先返回的结果')
+    parser.add_argument('--hedge-max-rate', type=float, default=0.05, help='对冲请求占请求总数的上限（默认5%%）')
+    parser.add_argument('--cascade', action='store_true', help='先用本地关键词分析器打标签，只把置信度低的诗歌发送给API')
+    parser.add_argument('--cascade-threshold', type=float, default=0.6, help='本地分析置信度阈值（0~1，默认0.6，越低调用API越少）')
+    parser.add_argument('--compact-schema', action='store_true', help='要求API使用短键的紧凑返回格式（意境描述限30字），减少输出token')
+    parser.add_argument('--file-workers', type=int, default=1, help='同时处理的文件数（默认1为逐个文件处理）')
+    parser.add_argument('--shard', help='只处理第i个分片（格式 i/N，如 1/4），多台机器各处理一个分片')
+    parser.add_argument('--merge-shards', nargs='*', metavar='FOLDER',
+                        help='归并各分片输出文件夹的结果和统计（不指定文件夹时使用 --output-folder）')
+    parser.add_argument('--pack-size', type=int, default=1, help='每次请求打包的短诗数量（如4~8，默认1为逐首请求）')
+    parser.add_argument('--pool-size', type=int, help='HTTP连接池大小（默认取并发数与16中的较大值）')
+    parser.add_argument('--backend', choices=BACKENDS, default='deepseek',
+                        help='分析后端：deepseek（默认）、openai（兼容OpenAI接口的其他服务，配合 --base-url 和 --model）、'
+                             'rules（进程内规则分析）、stub（进程内固定结果，用于测量流程本身的开销）')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help=f'模型名称（默认 {DEFAULT_MODEL}）')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='API地址（可指向本地模拟服务器）')
+    parser.add_argument('--http2', action='store_true', help='使用HTTP/2（需要 pip install httpx[http2]）')
+    parser.add_argument('--cache-file', default='analysis_cache.sqlite3', help='分析结果缓存文件')
+    parser.add_argument('--cache-max-entries', type=int, default=200000, help='缓存最大条目数')
+    parser.add_argument('--no-cache', action='store_true', help='不使用分析结果缓存')
+    parser.add_argument('--metrics-file', help=f'API调用指标文件（默认：输出文件夹下的 {METRICS_FILE_NAME}）')
+    parser.add_argument('--no-metrics', action='store_true', help='不记录API调用指标')
     parser.add_argument('--sample-files', type=int, help='样本文件数量（测试用）')
     parser.add_argument('--resume', action='store_true', help='恢复之前的处理')
+    parser.add_argument('--no-merge', action='store_true', help='处理完成后不生成合并文件（之后可用 --compact 生成）')
+    parser.add_argument('--compact', action='store_true', help='只将结果流压缩为合并文件，不调用API')
+    parser.add_argument('--estimate', action='store_true',
+                        help='只预估所选文件的请求数、token数、费用和耗时，不调用API（按当前的并发、限流、缓存、打包等参数）')
+    parser.add_argument('--estimate-latency', type=float, help='预估时使用的单次请求耗时（秒，默认按输出token数估算）')
+    parser.add_argument('--replay-failed', action='store_true',
+                        help='只重新分析重放队列中的诗歌（分析失败、备用分析、基础标签），原地修补输出文件')
     parser.add_argument('--show-progress', action='store_true', help='显示当前进度')
     parser.add_argument('--cleanup', action='store_true', help='清理进度文件')
     
     args = parser.parse_args()
     
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    # 每个分片使用独立的进度文件，可以在同一台机器或共享目录中并行运行
+    progress_file = shard_file_name(PROGRESS_FILE_NAME, shard)
+    
     # 清理进度文件
     if args.cleanup:
-        cleanup_progress_file()
+        cleanup_progress_file(progress_file)
         print("✅ 进度文件已清理")
         return
     
     # 显示进度
     if args.show_progress:
-        progress_manager = ProgressManager()
+        progress_manager = ProgressManager(progress_file)
         progress_manager.print_progress_summary()
         return
     
-    # 获取API密钥
+    # 归并分片结果
+    if args.merge_shards is not None:
+        shard_folders = args.merge_shards or [args.output_folder]
+        result = FolderBatchPoemProcessor.merge_shards(shard_folders, args.output_folder)
+        print(f"✅ 已归并 {result['merged_poems']} 首诗歌: {result['merged_output']}")
+        if result['statistics']:
+            stats = result['statistics']
+            print(f"📊 已合并 {len(result['stats_files'])} 个分片的统计信息: "
+                  f"{args.output_folder}/{STATS_FILE_NAME}")
+            print(f"  分析诗歌总数: {stats.get('total_analyzed', 0)}，成功分析: {stats.get('successful_analysis', 0)}")
+        else:
+            print("⚠️ 未找到分片统计文件，只归并了分析结果")
+        return
+    
+    # 压缩结果流
+    if args.compact:
+        stream_file = os.path.join(args.output_folder, STREAM_FILE_NAME)
+        if not os.path.exists(stream_file):
+            print(f"❌ 未找到结果流: {stream_file}")
+            return
+        count = compact_jsonl(stream_file, os.path.join(args.output_folder, MERGED_FILE_NAME),
+                              key=poem_stream_key)
+        print(f"✅ 已合并 {count} 首诗歌: {args.output_folder}/{MERGED_FILE_NAME}")
+        return
+    
+    # 预估token和费用（不需要API密钥，不访问网络）
+    if args.estimate:
+        # 缓存文件不存在时不创建
+        cache = None
+        if not args.no_cache and os.path.exists(args.cache_file):
+            cache = AnalysisCache(args.cache_file, args.cache_max_entries)
+        # 后端和模型与实际处理相同，缓存键才能对应
+        analyzer = AIPoemAnalyzer(args.api_key or 'estimate', cache=cache,
+                                  cascade=LocalCascade(args.cascade_threshold) if args.cascade else None,
+                                  compact=args.compact_schema, backend=args.backend, model=args.model)
+        estimator = RunEstimator(analyzer, pack_size=args.pack_size,
+                                 concurrency=64 if args.adaptive_concurrency and args.concurrency <= 1 else args.concurrency,
+                                 file_workers=args.file_workers, rps=args.rps, tpm=args.tpm,
+                                 latency=args.estimate_latency)
+        files = FolderBatchPoemProcessor.select_files(args.folder, args.start_file, args.end_file, shard)
+        print_estimate(estimator.estimate(files))
+        return
+    
+    # 获取API密钥（本地后端不需要，兼容OpenAI接口的本地服务通常不校验密钥）
     api_key = args.api_key or os.getenv('DEEPSEEK_API_KEY')
+    if not api_key and args.backend != 'deepseek':
+        api_key = 'EMPTY'
     if not api_key:
         print("请提供DeepSeek API密钥")
         print("使用方法:")
@@ -412,7 +1049,46 @@ def main():
     
     try:
         # 创建处理器
-        processor = FolderBatchPoemProcessor(api_key)
+        concurrency_limiter = None
+        if args.adaptive_concurrency:
+            if args.concurrency <= 1:
+                args.concurrency = 64
+            # 每个文件的工作线程数为上限，所有文件共享实际的并发数
+            concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=min(4, args.concurrency),
+                                                             max_limit=args.concurrency * args.file_workers)
+        pool_size = args.pool_size or max(args.concurrency, 16)  # 每个文件工作线程一个连接池
+        hedge_policy = HedgePolicy(max_hedge_rate=args.hedge_max_rate) if args.hedge else None
+        cascade = LocalCascade(args.cascade_threshold) if args.cascade else None
+        rate_limiter = RateLimiter(requests_per_second=args.rps, tokens_per_minute=args.tpm)
+        cache = None if args.no_cache else AnalysisCache(args.cache_file, args.cache_max_entries)
+        metrics = None
+        if not args.no_metrics:
+            metrics_file = args.metrics_file or os.path.join(args.output_folder,
+                                                             shard_file_name(METRICS_FILE_NAME, shard))
+            # 恢复处理和重放时在原有指标后继续追加
+            metrics = APIMetrics(metrics_file,
+                                 truncate=not (args.replay_failed or
+                                               (args.resume and check_resume_processing(progress_file))))
+        processor = FolderBatchPoemProcessor(api_key, pool_size=pool_size, http2=args.http2,
+                                             rate_limiter=rate_limiter, cache=cache,
+                                             base_url=args.base_url, progress_file=progress_file,
+                                             metrics=metrics, concurrency_limiter=concurrency_limiter,
+                                             hedge_policy=hedge_policy, cascade=cascade,
+                                             compact_schema=args.compact_schema,
+                                             backend=args.backend, model=args.model)
+        
+        # 只重新分析重放队列中的诗歌
+        if args.replay_failed:
+            summary = processor.replay_failed(output_folder=args.output_folder, shard=shard,
+                                              batch_size=args.batch_size, concurrency=args.concurrency,
+                                              pack_size=args.pack_size)
+            if metrics:
+                metrics.close()
+            print(f"\n♻️ 重放完成: 队列 {summary['queued']} 首，重新分析 {summary['replayed']} 首，"
+                  f"修复 {summary['fixed']} 首，仍失败 {summary['still_failed']} 首，"
+                  f"已无需重新分析 {summary['skipped']} 首")
+            print(f"📁 已修补 {summary['files']} 个输出文件，队列剩余 {summary['remaining']} 首: {summary['queue_file']}")
+            return
         
         # 处理文件夹
         stats = processor.process_folder(
@@ -420,28 +1096,40 @@ def main():
             start_file=args.start_file,
             end_file=args.end_file,
             batch_size=args.batch_size,
-            delay=args.delay,
             output_folder=args.output_folder,
-            resume=args.resume
+            resume=args.resume,
+            concurrency=args.concurrency,
+            pack_size=args.pack_size,
+            merge=not args.no_merge,
+            file_workers=args.file_workers,
+            shard=shard
         )
         
+        if metrics:
+            metrics.close()
+        
         # 检查是否暂停
         if stats.get('status') == 'paused':
             print("\n⏸️ 处理已暂停")
             print("💡 使用以下命令恢复处理:")
-            print(f"   python folder_batch_poem_processor.py --resume")
+            print(f"   python folder_batch_poem_processor.py --resume" + (f" --shard {args.shard}" if shard else ""))
             return
         
         # 保存统计
-        processor.save_statistics(stats)
+        stats_file = os.path.join(args.output_folder, shard_file_name(STATS_FILE_NAME, shard))
+        processor.save_statistics(stats, stats_file)
         
         # 打印摘要
         processor.print_statistics_summary(stats)
         
         print(f"\n🎉 文件夹批量处理完成！")
         print(f"📁 增强数据: {args.output_folder}/ai_enhanced_*.json")
-        print(f"📁 合并数据: {args.output_folder}/ai_enhanced_poems_merged.json")
-        print(f"📊 统计信息: {args.output_folder}/folder_ai_analysis_statistics.json")
+        print(f"📁 结果流: {args.output_folder}/{shard_file_name(STREAM_FILE_NAME, shard)}")
+        if shard:
+            print(f"💡 所有分片完成后使用 --merge-shards 归并结果和统计")
+        elif not args.no_merge:
+            print(f"📁 合并数据: {args.output_folder}/{MERGED_FILE_NAME}")
+        print(f"📊 统计信息: {stats_file}")
         print(f"📝 处理日志: folder_ai_poem_processing.log")
         
     except Exception as e:
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对冲请求（hedged requests）
+请求耗时超过近期延迟的p95仍未返回时，再发送一个相同的请求，采用先返回的结果；
+对冲请求数不超过普通请求数的一定比例，额外费用有上限
+"""
+
+import threading
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class HedgePolicy:
+    """对冲策略 - 根据近期延迟决定何时发送对冲请求（可跨线程共享）"""
+
+    def __init__(self, percentile: float = 95, max_hedge_rate: float = 0.05,
+                 min_samples: int = 20, min_delay: float = 1.0, window: int = 500):
+        """
+        初始化对冲策略
+
+        Args:
+            percentile: 请求耗时超过近期延迟的该百分位数时发送对冲请求
+            max_hedge_rate: 对冲请求数占请求总数的上限
+            min_samples: 积累多少个延迟样本后才开始对冲
+            min_delay: 对冲等待时间的下限（秒），避免延迟很低时频繁对冲
+            window: 统计延迟的最近请求数
+        """
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+
+        # 统计信息
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    def record_latency(self, latency: float):
+        """记录一次成功请求的耗时（秒）"""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def record_request(self):
+        """记录一次普通请求，用于计算对冲比例"""
+        with self._lock:
+            self.requests += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        计算发送对冲请求前的等待时间
+
+        Returns:
+            等待秒数，延迟样本不足时返回None（不对冲）
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def try_acquire_hedge(self) -> bool:
+        """
+        检查对冲预算，允许时计入一次对冲
+
+        Returns:
+            是否可以发送对冲请求
+        """
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_rate * self.requests:
+                self.budget_exhausted += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def record_hedge_win(self):
+        """记录一次对冲请求先于原请求返回"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'hedge_rate': self.hedges / self.requests if self.requests else 0.0,
+                'budget_exhausted': self.budget_exhausted
+            }
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSONL结果流
+每首诗歌分析完成后立即追加一行到JSONL文件（按批次fsync），内存不随语料增长，
+崩溃时已写入的结果不会丢失；需要合并JSON文件时再单独压缩生成
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Dict, Any, Iterable, Iterator, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class JSONLStreamWriter:
+    """追加写入的JSONL文件（可跨线程共享）"""
+
+    def __init__(self, path: str, fsync_every: int = 100, fsync_interval: float = 5.0,
+                 truncate: bool = False):
+        """
+        初始化写入器
+
+        Args:
+            path: JSONL文件路径
+            fsync_every: 每写入多少条记录fsync一次
+            fsync_interval: 距上次fsync超过多少秒时也会fsync
+            truncate: 是否清空已有内容（开始新的处理时使用）
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'w' if truncate else 'a', encoding='utf-8')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.records_written = 0
+
+    def write(self, record: Dict[str, Any]):
+        """
+        追加一条记录
+
+        Args:
+            record: 要写入的记录
+        """
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self.records_written += 1
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every or
+                    time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def _sync(self):
+        """刷新缓冲区并落盘（调用方持有锁）"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        """立即落盘所有已写入的记录"""
+        with self._lock:
+            if self._unsynced:
+                self._sync()
+
+    def close(self):
+        """落盘并关闭文件"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取JSONL文件
+
+    崩溃时最后一行可能只写了一半，这样的行会被跳过
+
+    Args:
+        path: JSONL文件路径
+
+    Yields:
+        每行解析后的记录
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"跳过不完整的JSONL行: {path}")
+
+
+def iter_deduplicated(jsonl_path: str,
+                      key: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取去重后的JSONL记录
+
+    同一key的记录出现多次时（例如恢复处理后重新分析了同一文件），
+    保留最后一次的内容、第一次出现的位置。只在内存中保存每条记录的偏移量。
+
+    Args:
+        jsonl_path: JSONL文件路径
+        key: 去重键函数，为None时不去重；对某条记录返回None时该记录不去重
+
+    Yields:
+        去重后的记录
+    """
+    if not os.path.exists(jsonl_path):
+        return
+
+    # 第一遍：记录每个key第一次出现的顺序和最后一次出现的偏移量
+    order = []
+    latest = {}
+    with open(jsonl_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            line_offset = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            record_key = key(record) if key else None
+            if record_key is None:
+                record_key = line_offset
+            if record_key not in latest:
+                order.append(record_key)
+            latest[record_key] = line_offset
+
+    # 第二遍：按顺序读出记录
+    with open(jsonl_path, 'rb') as src:
+        for record_key in order:
+            src.seek(latest[record_key])
+            yield json.loads(src.readline())
+
+
+def compact_jsonl(jsonl_path: str, output_file: str,
+                  key: Optional[Callable[[Dict[str, Any]], Any]] = None) -> int:
+    """
+    将JSONL结果流压缩为合并的JSON数组文件
+
+    去重方式见 iter_deduplicated，输出格式与 json.dump(..., indent=2) 相同。
+
+    Args:
+        jsonl_path: JSONL文件路径
+        output_file: 输出的JSON文件路径
+        key: 去重键函数，为None时不去重；对某条记录返回None时该记录不去重
+
+    Returns:
+        写入的记录数
+    """
+    count = write_json_array(iter_deduplicated(jsonl_path, key), output_file)
+    logger.info(f"已将 {jsonl_path} 压缩为 {output_file}，共 {count} 条记录")
+    return count
+
+
+def write_json_array(records: Iterable[Dict[str, Any]], output_file: str) -> int:
+    """
+    将记录逐条写成JSON数组文件，不在内存中保留全部记录
+
+    输出格式与 json.dump(..., indent=2) 相同，先写临时文件再原子替换
+
+    Args:
+        records: 要写入的记录
+        output_file: 输出的JSON文件路径
+
+    Returns:
+        写入的记录数
+    """
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_file = output_file + '.tmp'
+    count = 0
+    with open(temp_file, 'w', encoding='utf-8') as dst:
+        dst.write('[')
+        for record in records:
+            text = json.dumps(record, ensure_ascii=False, indent=2)
+            dst.write(',\n  ' if count else '\n  ')
+            dst.write(text.replace('\n', '\n  '))
+            count += 1
+        dst.write('\n]' if count else ']')
+    os.replace(temp_file, output_file)
+    return count
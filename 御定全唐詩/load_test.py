@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理流程压测脚本
+启动本地模拟服务器（mock_deepseek_server.py），用 FolderBatchPoemProcessor 处理一批合成诗歌，
+报告吞吐量（首/秒）、请求延迟 p50/p95/p99（含重试的单次调用耗时）、token用量和重试次数，使并发、限流等改动可以离线度量
+
+用法:
+    python load_test.py --poems 500 --concurrency 16 --rps 50 --rate-429 0.02 --error-rate 0.01
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Dict, Any
+from mock_deepseek_server import add_server_arguments, server_from_args
+from folder_batch_poem_processor import FolderBatchPoemProcessor
+from rate_limiter import RateLimiter
+from api_metrics import APIMetrics
+from adaptive_concurrency import AdaptiveConcurrencyLimiter
+from hedging import HedgePolicy
+from analysis_backends import BACKENDS, LOCAL_BACKENDS
+
+SAMPLE_LINES = ['床前明月光，', '疑是地上霜。', '举头望明月，', '低头思故乡。',
+                '白日依山尽，', '黄河入海流。', '欲穷千里目，', '更上一层楼。']
+
+def generate_poem_files(folder: str, total_poems: int, files: int) -> int:
+    """
+    生成合成诗歌文件（001.json, 002.json, ...）
+
+    Args:
+        folder: 输出文件夹
+        total_poems: 诗歌总数
+        files: 文件数
+
+    Returns:
+        实际生成的诗歌数量
+    """
+    per_file = max(1, total_poems // files)
+    generated = 0
+    for file_no in range(1, files + 1):
+        count = per_file if file_no < files else total_poems - generated
+        poems = []
+        for no in range(1, count + 1):
+            # 绝句与律诗交替，使打包模式下有长有短
+            lines = SAMPLE_LINES[:4] if no % 3 else SAMPLE_LINES * 2
+            poems.append({
+                'title': f'压测诗{file_no}-{no}',
+                'author': f'作者{no % 50}',
+                'volume': f'卷{file_no}',
+                'no#': no,
+                'paragraphs': lines
+            })
+        with open(os.path.join(folder, f'{file_no:03d}.json'), 'w', encoding='utf-8') as f:
+            json.dump(poems, f, ensure_ascii=False)
+        generated += count
+    return generated
+
+
+def run_load_test(args) -> Dict[str, Any]:
+    """执行一次压测并返回报告"""
+    work_dir = tempfile.mkdtemp(prefix='poem_load_test_')
+    input_folder = os.path.join(work_dir, 'json')
+    output_folder = os.path.join(work_dir, 'output')
+    os.makedirs(input_folder)
+
+    server = None
+    try:
+        total_poems = generate_poem_files(input_folder, args.poems, args.files)
+
+        base_url = args.base_url
+        if not base_url and args.backend not in LOCAL_BACKENDS:
+            server = server_from_args(args).start()
+            base_url = server.base_url
+
+        rate_limiter = None
+        if args.rps or args.tpm:
+            rate_limiter = RateLimiter(requests_per_second=args.rps, tokens_per_minute=args.tpm)
+        metrics = APIMetrics()
+        concurrency_limiter = None
+        if args.adaptive:
+            concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=min(4, args.concurrency),
+                                                             max_limit=args.concurrency)
+        processor = FolderBatchPoemProcessor(
+            'mock-key', pool_size=max(args.concurrency, 16), rate_limiter=rate_limiter,
+            base_url=base_url, progress_file=os.path.join(work_dir, 'processing_progress.json'),
+            metrics=metrics, concurrency_limiter=concurrency_limiter,
+            hedge_policy=HedgePolicy(max_hedge_rate=args.hedge_max_rate) if args.hedge else None,
+            compact_schema=args.compact_schema,
+            backend=args.backend
+        )
+
+        start = time.perf_counter()
+        stats = processor.process_folder(
+            folder_path=input_folder,
+            batch_size=args.batch_size,
+            delay=0,
+            output_folder=output_folder,
+            concurrency=args.concurrency,
+            pack_size=args.pack_size,
+            merge=False
+        )
+        elapsed = time.perf_counter() - start
+
+        retry_stats = stats['retry_statistics']
+        api_metrics = stats['api_metrics']
+        latency = api_metrics['latency_ms']
+        report = {
+            'poems': total_poems,
+            'successful': stats['successful_analysis'],
+            'failed': len(stats['failed_poems']),
+            'elapsed_seconds': round(elapsed, 2),
+            'poems_per_second': round(total_poems / elapsed, 2) if elapsed else 0.0,
+            'requests': api_metrics['requests'],
+            'latency_ms': {key: latency[key] for key in ('p50', 'p95', 'p99', 'max')},
+            'latency_histogram_ms': latency['histogram'],
+            'tokens_per_poem': api_metrics['tokens_per_poem'],
+            'prompt_cache_hit_tokens': api_metrics['prompt_cache_hit_tokens'],
+            'estimated_cost': api_metrics['estimated_cost'],
+            'retries': retry_stats['retries'],
+            'circuit_breaker_trips': retry_stats['trip_count'],
+            'settings': {
+                'concurrency': args.concurrency,
+                'adaptive': args.adaptive,
+                'hedge': args.hedge,
+                'compact_schema': args.compact_schema,
+                'backend': args.backend,
+                'pack_size': args.pack_size,
+                'rps': args.rps,
+                'tpm': args.tpm
+            }
+        }
+        if rate_limiter:
+            report['rate_limit'] = rate_limiter.get_stats()
+        if concurrency_limiter:
+            report['concurrency'] = concurrency_limiter.get_stats()
+        if 'hedge_statistics' in stats:
+            report['hedge'] = stats['hedge_statistics']
+        if server:
+            report['server'] = server.get_stats()
+        return report
+    finally:
+        if server:
+            server.stop()
+        if args.keep_output:
+            print(f"压测数据保留在: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(report: Dict[str, Any]):
+    """打印压测报告"""
+    latency = report['latency_ms']
+    print("\n" + "=" * 60)
+    print("批处理压测报告")
+    print("=" * 60)
+    print(f"设置: {report['settings']}")
+    print(f"诗歌: {report['poems']} 首，成功 {report['successful']}，失败 {report['failed']}")
+    print(f"耗时: {report['elapsed_seconds']} 秒，吞吐量: {report['poems_per_second']} 首/秒")
+    print(f"请求: {report['requests']} 次，延迟 p50 {latency['p50']}ms / p95 {latency['p95']}ms / "
+          f"p99 {latency['p99']}ms / max {latency['max']}ms")
+    print(f"token: 平均每首 {report['tokens_per_poem']}，前缀缓存命中 {report['prompt_cache_hit_tokens']}，"
+          f"估算费用 {report['estimated_cost']} 元")
+    print(f"重试: {report['retries']} 次，熔断 {report['circuit_breaker_trips']} 次")
+    if 'rate_limit' in report:
+        print(f"客户端限流: 等待 {report['rate_limit']['throttled_count']} 次，"
+              f"累计 {report['rate_limit']['total_wait_seconds']} 秒")
+    if 'concurrency' in report:
+        concurrency = report['concurrency']
+        print(f"自适应并发: 最终 {concurrency['limit']}，范围 {concurrency['lowest_limit']}~{concurrency['peak_limit']}，"
+              f"减少 {concurrency['decreases']} 次")
+    if 'hedge' in report:
+        print(f"对冲请求: {report['hedge']['hedges']} 次，先返回 {report['hedge']['hedge_wins']} 次")
+    if 'server' in report:
+        print(f"服务端: {report['server']}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='批处理流程压测（使用本地模拟服务器）')
+    parser.add_argument('--poems', type=int, default=300, help='合成诗歌数量')
+    parser.add_argument('--files', type=int, default=3, help='合成文件数量')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发请求数')
+    parser.add_argument('--adaptive', action='store_true', help='启用自适应并发（--concurrency 为上限）')
+    parser.add_argument('--hedge', action='store_true', help='启用对冲请求')
+    parser.add_argument('--hedge-max-rate', type=float, default=0.05, help='对冲请求占请求总数的上限')
+    parser.add_argument('--backend', choices=BACKENDS, default='deepseek',
+                        help='分析后端，rules / stub 在进程内分析、不启动模拟服务器，用于测量流程本身的开销')
+    parser.add_argument('--compact-schema', action='store_true', help='使用短键的紧凑返回格式')
+    parser.add_argument('--pack-size', type=int, default=1, help='每次请求打包的短诗数量')
+    parser.add_argument('--batch-size', type=int, default=20, help='批次大小（并发数为1时使用）')
+    parser.add_argument('--rps', type=float, default=0, help='客户端每秒请求数上限（0为不限制）')
+    parser.add_argument('--tpm', type=float, default=0, help='客户端每分钟token数上限（0为不限制）')
+    parser.add_argument('--base-url', help='使用已启动的服务器，而不是在进程内启动模拟服务器')
+    parser.add_argument('--report', help='将报告保存为JSON文件')
+    parser.add_argument('--keep-output', action='store_true', help='保留合成数据和处理结果')
+    parser.add_argument('--verbose', action='store_true', help='输出处理日志')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    report = run_load_test(args)
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存到: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
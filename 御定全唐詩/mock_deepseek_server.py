@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地DeepSeek模拟服务器
+实现 /chat/completions 接口，可配置响应延迟分布、错误和429注入，返回固定格式的分析结果，
+用于在CI和构建机上离线测试批处理流程（不消耗API额度）
+
+用法:
+    python mock_deepseek_server.py --port 8765 --latency lognormal --latency-mean 0.8 --rate-429 0.02
+    set DEEPSEEK_BASE_URL=http://127.0.0.1:8765
+"""
+
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional
+from rate_limiter import TokenBucket
+
+# 生成固定分析结果用的标签词表
+MOCK_VOCABULARY = {
+    'styles': ['豪放', '婉约', '田园', '边塞', '咏史', '抒情', '写景'],
+    'scenes': ['春天', '夏天', '秋天', '冬天', '夜晚', '早晨', '山水', '城市', '乡村'],
+    'emotions': ['喜悦', '忧愁', '思念', '孤独', '豪迈', '闲适'],
+    'themes': ['爱情', '友情', '家国', '人生', '自然', '哲理'],
+    'rhetoric': ['比喻', '对仗', '夸张', '拟人', '借代'],
+    'keywords': ['明月', '故乡', '春风', '江水', '孤舟', '落日', '青山', '白云', '长安', '离别']
+}
+
+# 用户消息中每首诗的格式，与 AIPoemAnalyzer 的用户消息一致
+PACKED_POEM_PATTERN = re.compile(r'【(\d+)】\n标题：(.*?)\n作者：(.*?)\n内容：\n(.*?)(?=\n\n【\d+】|\Z)', re.S)
+SINGLE_POEM_PATTERN = re.compile(r'标题：(.*?)\n作者：(.*?)\n内容：\n(.*?)\Z', re.S)
+
+# 系统提示词要求紧凑返回格式时包含的短键示例
+COMPACT_SCHEMA_MARKER = '"s": ['
+
+# 紧凑格式的短键（与 AIPoemAnalyzer 的 COMPACT_KEYS 一致）
+COMPACT_KEYS = {'styles': 's', 'scenes': 'c', 'emotions': 'e', 'themes': 't',
+                'rhetoric': 'r', 'keywords': 'k', 'artistic_description': 'd'}
+
+# 前缀缓存的粒度（token），与DeepSeek的上下文硬盘缓存相同
+PREFIX_CACHE_UNIT = 64
+
+class LatencyModel:
+    """响应延迟分布"""
+
+    DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+
+    def __init__(self, distribution: str = 'lognormal', mean: float = 0.5, sigma: float = 0.5):
+        """
+        初始化延迟分布
+
+        Args:
+            distribution: 分布类型（fixed / uniform / exponential / lognormal）
+            mean: 平均延迟（秒）
+            sigma: 对数正态分布的形状参数，越大长尾越明显
+        """
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"未知的延迟分布: {distribution}")
+        self.distribution = distribution
+        self.mean = mean
+        self.sigma = sigma
+
+    def sample(self) -> float:
+        """采样一次延迟（秒）"""
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == 'fixed':
+            return self.mean
+        if self.distribution == 'uniform':
+            return random.uniform(0, 2 * self.mean)
+        if self.distribution == 'exponential':
+            return random.expovariate(1 / self.mean)
+        # 对数正态：调整mu使期望等于mean
+        mu = math.log(self.mean) - self.sigma ** 2 / 2
+        return random.lognormvariate(mu, self.sigma)
+
+
+def mock_analysis(title: str, author: str, content: str, compact: bool = False) -> Dict[str, Any]:
+    """
+    根据诗歌内容生成固定的分析结果（同一首诗每次结果相同）
+
+    Args:
+        title: 标题
+        author: 作者
+        content: 内容
+        compact: 是否返回短键的紧凑格式
+
+    Returns:
+        与真实API相同格式的分析结果
+    """
+    digest = hashlib.sha256(f'{title}|{author}|{content}'.encode('utf-8')).digest()
+    rng = random.Random(digest)
+    analysis = {}
+    for field, vocabulary in MOCK_VOCABULARY.items():
+        count = 5 if field == 'keywords' else (2 if field == 'rhetoric' else 3)
+        analysis[field] = rng.sample(vocabulary, count)
+    if compact:
+        analysis['artistic_description'] = '意境清远，情景交融。'
+        return {COMPACT_KEYS[key]: value for key, value in analysis.items()}
+    analysis['artistic_description'] = f'《{title}》（模拟分析）意境清远，情景交融。'
+    return analysis
+
+
+class MockDeepSeekServer:
+    """模拟DeepSeek API服务器"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765,
+                 latency: Optional[LatencyModel] = None,
+                 error_rate: float = 0.0, rate_429: float = 0.0,
+                 retry_after: float = 1.0, max_rps: Optional[float] = None,
+                 bad_json_rate: float = 0.0):
+        """
+        初始化模拟服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口（0为随机端口）
+            latency: 响应延迟分布，默认平均0.5秒的对数正态分布
+            error_rate: 随机返回500/502/503的概率
+            rate_429: 随机返回429的概率
+            retry_after: 429响应的 Retry-After 秒数
+            max_rps: 服务端每秒请求数上限，超出时返回429（模拟真实限流）
+            bad_json_rate: 返回无法解析的分析内容的概率
+        """
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.bad_json_rate = bad_json_rate
+        self._bucket = TokenBucket(max_rps, max(1.0, max_rps)) if max_rps else None
+        self._lock = threading.Lock()
+        # 已出现过的系统提示词，相同前缀的后续请求计为缓存命中
+        self._seen_prefixes = set()
+        self.stats = {'requests': 0, 'ok': 0, 'injected_errors': 0, 'injected_429': 0,
+                      'throttled_429': 0, 'bad_json': 0, 'poems': 0, 'prompt_cache_hit_tokens': 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send(404, {'error': {'message': 'not found'}})
+                    return
+                try:
+                    request = json.loads(body)
+                except json.JSONDecodeError:
+                    self._send(400, {'error': {'message': 'invalid json'}})
+                    return
+                status, payload, headers = server.handle_completion(request)
+                self._send(status, payload, headers)
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/stats':
+                    with server._lock:
+                        self._send(200, dict(server.stats))
+                else:
+                    self._send(404, {'error': {'message': 'not found'}})
+
+            def _send(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.base_url = f'http://{host}:{self.port}'
+        self._thread = None
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def handle_completion(self, request: Dict[str, Any]):
+        """
+        处理一次补全请求
+
+        Returns:
+            (状态码, 响应体, 额外响应头)
+        """
+        self._count('requests')
+
+        if self._bucket:
+            with self._lock:
+                wait = self._bucket.reserve(1, time.monotonic())
+                if wait > 0:
+                    self._bucket.refund(1)
+            if wait > 0:
+                self._count('throttled_429')
+                return 429, {'error': {'message': 'rate limit exceeded'}}, {'Retry-After': f'{wait:.2f}'}
+
+        roll = random.random()
+        if roll < self.rate_429:
+            self._count('injected_429')
+            return 429, {'error': {'message': 'rate limit exceeded'}}, {'Retry-After': str(self.retry_after)}
+        if roll < self.rate_429 + self.error_rate:
+            self._count('injected_errors')
+            time.sleep(self.latency.sample() / 2)
+            return random.choice([500, 502, 503]), {'error': {'message': 'injected server error'}}, {}
+
+        time.sleep(self.latency.sample())
+
+        messages = request.get('messages', [])
+        prompt = messages[-1].get('content', '') if messages else ''
+        system = messages[0].get('content', '') if len(messages) > 1 else ''
+        content = self._build_content(prompt, compact=COMPACT_SCHEMA_MARKER in system)
+        if random.random() < self.bad_json_rate:
+            self._count('bad_json')
+            content = '抱歉，我无法按JSON格式回答。'
+
+        self._count('ok')
+        prompt_tokens = sum(len(m.get('content', '')) for m in messages)
+        completion_tokens = len(content)
+        cache_hit_tokens = self._prefix_cache_hit(system)
+        return 200, {
+            'id': f'mock-{self.stats["requests"]}',
+            'object': 'chat.completion',
+            'model': request.get('model', 'deepseek-chat'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens,
+                      'prompt_cache_hit_tokens': cache_hit_tokens,
+                      'prompt_cache_miss_tokens': prompt_tokens - cache_hit_tokens}
+        }, {}
+
+    def _prefix_cache_hit(self, system: str) -> int:
+        """模拟前缀缓存：系统提示词此前出现过时，按缓存粒度向下取整计为命中token数"""
+        with self._lock:
+            if system not in self._seen_prefixes:
+                self._seen_prefixes.add(system)
+                return 0
+        hit_tokens = len(system) // PREFIX_CACHE_UNIT * PREFIX_CACHE_UNIT
+        self._count('prompt_cache_hit_tokens', hit_tokens)
+        return hit_tokens
+
+    def _build_content(self, prompt: str, compact: bool = False) -> str:
+        """根据用户消息生成单首或打包的分析结果"""
+        packed = PACKED_POEM_PATTERN.findall(prompt)
+        if packed:
+            results = []
+            for number, title, author, content in packed:
+                analysis = mock_analysis(title, author, content, compact)
+                analysis['id'] = int(number)
+                results.append(analysis)
+            self._count('poems', len(results))
+            return json.dumps(results, ensure_ascii=False)
+
+        match = SINGLE_POEM_PATTERN.search(prompt)
+        title, author, content = match.groups() if match else ('', '', prompt)
+        self._count('poems')
+        return json.dumps(mock_analysis(title, author, content, compact), ensure_ascii=False)
+
+    def start(self) -> 'MockDeepSeekServer':
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取服务端统计"""
+        with self._lock:
+            return dict(self.stats)
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """添加模拟服务器的命令行参数（load_test.py 共用）"""
+    parser.add_argument('--latency', choices=LatencyModel.DISTRIBUTIONS, default='lognormal', help='响应延迟分布')
+    parser.add_argument('--latency-mean', type=float, default=0.5, help='平均响应延迟（秒）')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='对数正态分布形状参数（越大长尾越明显）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='注入500/502/503的概率')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='注入429的概率')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='注入的429响应的 Retry-After 秒数')
+    parser.add_argument('--server-max-rps', type=float, help='服务端每秒请求数上限，超出返回429')
+    parser.add_argument('--bad-json-rate', type=float, default=0.0, help='返回无法解析内容的概率')
+
+
+def server_from_args(args, host: str = '127.0.0.1', port: int = 0) -> MockDeepSeekServer:
+    """根据命令行参数创建模拟服务器"""
+    return MockDeepSeekServer(
+        host=host, port=port,
+        latency=LatencyModel(args.latency, args.latency_mean, args.latency_sigma),
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        max_rps=args.server_max_rps,
+        bad_json_rate=args.bad_json_rate
+    )
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='本地DeepSeek模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, host=args.host, port=args.port)
+    print(f"模拟DeepSeek服务器已启动: {server.base_url}")
+    print(f"使用方法: 设置 DEEPSEEK_BASE_URL={server.base_url} 或传入 --base-url {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n服务器已停止，统计: {server.get_stats()}")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
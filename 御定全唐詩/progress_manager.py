@@ -8,43 +8,51 @@ import os
 import json
 import time
 import logging
+import threading
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 日志累计多少条记录后压缩为快照
+COMPACT_EVERY = 500
+
 class ProgressManager:
-    """进度管理器 - 支持暂停和续传功能"""
+    """进度管理器 - 支持暂停和续传功能
+    
+    进度以追加写入的日志记录（每个事件一行JSON），定期压缩为快照文件。
+    加载时先读快照，再重放快照之后的日志；日志末尾写了一半的行会被忽略。
+    """
     
     def __init__(self, progress_file: str = "processing_progress.json"):
         """
         初始化进度管理器
         
         Args:
-            progress_file: 进度文件路径
+            progress_file: 进度快照文件路径，日志文件为 <progress_file>.journal
         """
         self.progress_file = progress_file
+        self.journal_file = progress_file + ".journal"
+        self._seq = 0
+        self._journal_records = 0
+        self._journal = None
+        # 多个文件并行处理时共用一个进度管理器
+        self._lock = threading.RLock()
         self.progress_data = self._load_progress()
     
-    def _load_progress(self) -> Dict[str, Any]:
-        """加载进度数据"""
-        if os.path.exists(self.progress_file):
-            try:
-                with open(self.progress_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.warning(f"加载进度文件失败: {e}，创建新的进度文件")
-        
-        # 默认进度数据
+    @staticmethod
+    def _default_progress() -> Dict[str, Any]:
+        """默认进度数据"""
         return {
             "status": "not_started",  # not_started, in_progress, paused, completed, failed
             "start_time": None,
             "last_update": None,
             "total_files": 0,
             "processed_files": [],
-            "current_file": None,
-            "current_file_poems": 0,
-            "current_file_processed": 0,
+            # 正在处理的文件（多个文件可能并行）: 文件名 -> {"poems": 诗歌总数, "processed": 已处理数}
+            "current_files": {},
+            # 未完成文件中已分析成功的诗歌ID: 文件名 -> {诗歌ID}
+            "completed_poems": {},
             "failed_files": [],
             "statistics": {
                 "total_poems": 0,
@@ -53,127 +61,240 @@ class ProgressManager:
             }
         }
     
+    def _load_progress(self) -> Dict[str, Any]:
+        """加载快照并重放日志"""
+        progress_data = self._default_progress()
+        if os.path.exists(self.progress_file):
+            try:
+                with open(self.progress_file, 'r', encoding='utf-8') as f:
+                    progress_data.update(json.load(f))
+            except Exception as e:
+                logger.warning(f"加载进度文件失败: {e}，创建新的进度文件")
+        
+        self._seq = progress_data.pop("journal_seq", 0)
+        # 旧版快照只记录一个当前文件
+        for key in ("current_file", "current_file_poems", "current_file_processed"):
+            progress_data.pop(key, None)
+        progress_data["completed_poems"] = {
+            file_name: set(poem_ids) for file_name, poem_ids in progress_data["completed_poems"].items()
+        }
+        self._processed_set = set(progress_data["processed_files"])
+        self._failed_set = set(f["file"] for f in progress_data["failed_files"])
+        self.progress_data = progress_data
+        
+        if os.path.exists(self.journal_file):
+            valid_size = 0
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # 崩溃时最后一行可能不完整
+                        break
+                    valid_size += len(line)
+                    self._journal_records += 1
+                    # 快照之后压缩前崩溃时，日志中会残留已并入快照的记录
+                    if event["seq"] <= self._seq:
+                        continue
+                    self._apply(event)
+                    self._seq = event["seq"]
+            
+            # 截掉不完整的末尾，后续记录从完整的行之后追加
+            if os.path.getsize(self.journal_file) > valid_size:
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(valid_size)
+        
+        return progress_data
+    
+    def _apply(self, event: Dict[str, Any]):
+        """将一条事件应用到内存状态（加载时重放和实时记录共用）"""
+        data = self.progress_data
+        op = event["op"]
+        data["last_update"] = event["time"]
+        
+        if op == "start":
+            data.update(self._default_progress())
+            data.update({
+                "status": "in_progress",
+                "start_time": event["time"],
+                "last_update": event["time"],
+                "total_files": event["total_files"]
+            })
+            self._processed_set = set()
+            self._failed_set = set()
+        elif op == "status":
+            data["status"] = event["status"]
+        elif op == "current":
+            data["current_files"][event["file"]] = {
+                "poems": event["poems"],
+                "processed": len(data["completed_poems"].get(event["file"], ()))
+            }
+        elif op == "file_progress":
+            # 旧版日志的记录不带文件名，无法对应到文件，忽略
+            current = data["current_files"].get(event.get("file"))
+            if current is not None:
+                current["processed"] = event["processed"]
+        elif op == "poems_done":
+            completed = data["completed_poems"].setdefault(event["file"], set())
+            completed.update(event["ids"])
+            current = data["current_files"].get(event["file"])
+            if current is not None:
+                current["processed"] = len(completed)
+        elif op == "file_done":
+            file_name = event["file"]
+            if file_name not in self._processed_set:
+                self._processed_set.add(file_name)
+                data["processed_files"].append(file_name)
+            data["completed_poems"].pop(file_name, None)
+            
+            stats = data["statistics"]
+            stats["total_poems"] += event["total"]
+            stats["successful_analysis"] += event["successful"]
+            stats["failed_analysis"] += event["total"] - event["successful"]
+            data["current_files"].pop(file_name, None)
+        elif op == "file_failed":
+            self._failed_set.add(event["file"])
+            data["failed_files"].append({
+                "file": event["file"],
+                "error": event["error"],
+                "timestamp": event["time"]
+            })
+            data["current_files"].pop(event["file"], None)
+    
+    def _record(self, op: str, **fields):
+        """
+        记录一个事件：更新内存状态并追加一行日志
+        
+        Args:
+            op: 事件类型
+            **fields: 事件字段
+        """
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, "op": op, "time": datetime.now().isoformat()}
+            event.update(fields)
+            self._apply(event)
+            
+            try:
+                if self._journal is None:
+                    self._journal = open(self.journal_file, 'a', encoding='utf-8')
+                # 单次写入一整行，进程崩溃时最多丢失最后一条记录
+                self._journal.write(json.dumps(event, ensure_ascii=False) + "\n")
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            except Exception as e:
+                logger.error(f"写入进度日志失败: {e}")
+                return
+            
+            self._journal_records += 1
+            if self._journal_records >= COMPACT_EVERY:
+                self.save_progress()
+    
     def save_progress(self):
-        """保存进度数据"""
-        self.progress_data["last_update"] = datetime.now().isoformat()
+        """将当前状态压缩为快照并清空日志"""
+        with self._lock:
+            self._save_snapshot()
+    
+    def _save_snapshot(self):
+        """写入快照并清空日志（调用方持有锁）"""
+        snapshot = dict(self.progress_data)
+        snapshot["completed_poems"] = {
+            file_name: sorted(poem_ids) for file_name, poem_ids in self.progress_data["completed_poems"].items()
+        }
+        snapshot["current_files"] = {
+            file_name: dict(current) for file_name, current in self.progress_data["current_files"].items()
+        }
+        snapshot["journal_seq"] = self._seq
         
         try:
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(self.progress_data, f, ensure_ascii=False, indent=2)
+            temp_file = self.progress_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.progress_file)
+            
+            # 快照已包含全部事件，日志可以清空
+            self.close()
+            open(self.journal_file, 'w', encoding='utf-8').close()
+            self._journal_records = 0
             logger.debug(f"进度已保存到: {self.progress_file}")
         except Exception as e:
             logger.error(f"保存进度失败: {e}")
     
+    def close(self):
+        """关闭日志文件"""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+    
     def start_processing(self, total_files: int):
         """开始处理"""
-        self.progress_data.update({
-            "status": "in_progress",
-            "start_time": datetime.now().isoformat(),
-            "total_files": total_files,
-            "processed_files": [],
-            "current_file": None,
-            "current_file_poems": 0,
-            "current_file_processed": 0,
-            "failed_files": [],
-            "statistics": {
-                "total_poems": 0,
-                "successful_analysis": 0,
-                "failed_analysis": 0
-            }
-        })
-        self.save_progress()
+        self._record("start", total_files=total_files)
         logger.info(f"开始处理 {total_files} 个文件")
     
     def set_current_file(self, file_path: str, total_poems: int):
         """设置当前处理文件"""
         file_name = os.path.basename(file_path)
-        self.progress_data.update({
-            "current_file": file_name,
-            "current_file_poems": total_poems,
-            "current_file_processed": 0
-        })
-        self.save_progress()
+        self._record("current", file=file_name, poems=total_poems)
         logger.info(f"开始处理文件: {file_name} (共 {total_poems} 首诗歌)")
     
-    def update_file_progress(self, processed_count: int, successful_count: int = None):
-        """更新文件处理进度"""
-        self.progress_data["current_file_processed"] = processed_count
+    def update_file_progress(self, file_path: str, processed_count: int, successful_count: int = None):
+        """更新文件处理进度（累计统计在 complete_file 中更新）"""
+        self._record("file_progress", file=os.path.basename(file_path), processed=processed_count)
+    
+    def mark_poems_completed(self, file_path: str, poem_ids: List[int]):
+        """
+        记录文件中已分析完成的诗歌（诗歌级检查点）
         
-        if successful_count is not None:
-            self.progress_data["statistics"]["successful_analysis"] = successful_count
+        调用前必须确保这些诗歌的结果已经落盘，恢复处理时会跳过它们
         
-        self.save_progress()
+        Args:
+            file_path: 诗歌所在文件
+            poem_ids: 已完成的诗歌在文件中的序号（同一文件中可能有ID相同的诗歌）
+        """
+        if not poem_ids:
+            return
+        self._record("poems_done", file=os.path.basename(file_path), ids=list(poem_ids))
+    
+    def get_completed_poems(self, file_path: str) -> set:
+        """获取文件中已分析完成的诗歌序号"""
+        file_name = os.path.basename(file_path)
+        with self._lock:
+            return set(self.progress_data["completed_poems"].get(file_name, ()))
     
     def complete_file(self, file_path: str, successful_poems: int, total_poems: int):
         """完成文件处理"""
         file_name = os.path.basename(file_path)
-        
-        # 添加到已处理文件列表
-        if file_name not in self.progress_data["processed_files"]:
-            self.progress_data["processed_files"].append(file_name)
-        
-        # 更新统计
-        self.progress_data["statistics"]["total_poems"] += total_poems
-        self.progress_data["statistics"]["successful_analysis"] += successful_poems
-        self.progress_data["statistics"]["failed_analysis"] += (total_poems - successful_poems)
-        
-        # 重置当前文件状态
-        self.progress_data["current_file"] = None
-        self.progress_data["current_file_poems"] = 0
-        self.progress_data["current_file_processed"] = 0
-        
-        self.save_progress()
+        self._record("file_done", file=file_name, successful=successful_poems, total=total_poems)
         logger.info(f"完成文件: {file_name} (成功: {successful_poems}/{total_poems})")
     
     def mark_file_failed(self, file_path: str, error_message: str):
         """标记文件处理失败"""
         file_name = os.path.basename(file_path)
-        
-        self.progress_data["failed_files"].append({
-            "file": file_name,
-            "error": error_message,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # 重置当前文件状态
-        self.progress_data["current_file"] = None
-        self.progress_data["current_file_poems"] = 0
-        self.progress_data["current_file_processed"] = 0
-        
-        self.save_progress()
+        self._record("file_failed", file=file_name, error=error_message)
         logger.error(f"文件处理失败: {file_name} - {error_message}")
     
     def pause_processing(self):
         """暂停处理"""
-        self.progress_data["status"] = "paused"
+        self._record("status", status="paused")
         self.save_progress()
         logger.info("处理已暂停")
     
     def resume_processing(self):
         """恢复处理"""
-        self.progress_data["status"] = "in_progress"
-        self.save_progress()
+        self._record("status", status="in_progress")
         logger.info("处理已恢复")
     
     def complete_processing(self):
         """完成处理"""
-        self.progress_data["status"] = "completed"
+        self._record("status", status="completed")
         self.save_progress()
         logger.info("处理已完成")
     
     def get_remaining_files(self, all_files: List[str]) -> List[str]:
         """获取剩余需要处理的文件"""
-        processed_files = set(self.progress_data["processed_files"])
-        failed_files = set([f["file"] for f in self.progress_data["failed_files"]])
-        
-        # 当前正在处理的文件
-        current_file = self.progress_data["current_file"]
-        if current_file and current_file not in processed_files:
-            processed_files.add(current_file)
-        
-        remaining_files = [f for f in all_files if os.path.basename(f) not in processed_files and os.path.basename(f) not in failed_files]
-        
-        return remaining_files
+        # 中断时正在处理的文件仍在剩余列表中，恢复时按诗歌级进度跳过已完成的诗歌
+        done = self._processed_set | self._failed_set
+        return [f for f in all_files if os.path.basename(f) not in done]
     
     def get_progress_summary(self) -> Dict[str, Any]:
         """获取进度摘要"""
@@ -191,8 +312,10 @@ class ProgressManager:
             "failed_files": failed_files,
             "remaining_files": remaining_files,
             "progress_percentage": (processed_files / total_files * 100) if total_files > 0 else 0,
-            "current_file": self.progress_data["current_file"],
-            "current_file_progress": f"{self.progress_data['current_file_processed']}/{self.progress_data['current_file_poems']}",
+            "current_files": {
+                file_name: f"{current['processed']}/{current['poems']}"
+                for file_name, current in self.progress_data["current_files"].items()
+            },
             "statistics": stats,
             "start_time": self.progress_data["start_time"],
             "last_update": self.progress_data["last_update"]
@@ -219,9 +342,9 @@ class ProgressManager:
         print(f"📊 剩余文件: {summary['remaining_files']}")
         print(f"❌ 失败文件: {summary['failed_files']}")
         
-        if summary['current_file']:
-            print(f"📄 当前文件: {summary['current_file']}")
-            print(f"📝 当前进度: {summary['current_file_progress']}")
+        for file_name, file_progress in summary['current_files'].items():
+            print(f"📄 当前文件: {file_name}")
+            print(f"📝 当前进度: {file_progress}")
         
         stats = summary['statistics']
         print(f"\n📚 诗歌统计:")
@@ -241,24 +364,22 @@ class ProgressManager:
             last_update = datetime.fromisoformat(summary['last_update'])
             print(f"🔄 最后更新: {last_update.strftime('%Y-%m-%d %H:%M:%S')}")
 
-def check_resume_processing() -> bool:
+def check_resume_processing(progress_file: str = "processing_progress.json") -> bool:
     """检查是否可以恢复处理"""
-    progress_file = "processing_progress.json"
-    
-    if not os.path.exists(progress_file):
+
+    if not os.path.exists(progress_file) and not os.path.exists(progress_file + ".journal"):
         return False
     
     try:
-        with open(progress_file, 'r', encoding='utf-8') as f:
-            progress_data = json.load(f)
-        
+        # 快照之后的状态变化只在日志中，需要重放
+        progress_data = ProgressManager(progress_file).progress_data
         return progress_data.get("status") in ["paused", "in_progress"]
     except:
         return False
 
-def cleanup_progress_file():
+def cleanup_progress_file(progress_file: str = "processing_progress.json"):
     """清理进度文件"""
-    progress_file = "processing_progress.json"
-    if os.path.exists(progress_file):
-        os.remove(progress_file)
-        logger.info("进度文件已清理")
\ No newline at end of file
+    for path in (progress_file, progress_file + ".journal"):
+        if os.path.exists(path):
+            os.remove(path)
+    logger.info("进度文件已清理")
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API请求限流器
+基于令牌桶同时限制每秒请求数和每分钟token数，所有工作线程共享一个实例，
+收到429时按 Retry-After 暂停全部请求
+"""
+
+import time
+import threading
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """令牌桶（非线程安全，由 RateLimiter 加锁调用）"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的突发量）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        预订令牌，令牌不足时允许透支
+
+        Args:
+            amount: 需要的令牌数
+            now: 当前时间（time.monotonic）
+
+        Returns:
+            调用方需要等待的秒数
+        """
+        self._refill(now)
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        """归还（amount为负时补扣）令牌"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """请求限流器 - 每秒请求数和每分钟token数双令牌桶"""
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 burst: Optional[float] = None):
+        """
+        初始化限流器
+
+        Args:
+            requests_per_second: 每秒请求数上限，None 或 0 表示不限制
+            tokens_per_minute: 每分钟token数上限，None 或 0 表示不限制
+            burst: 请求突发量，默认等于每秒请求数（至少为1）
+        """
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+        self._request_bucket = None
+        if requests_per_second:
+            capacity = burst or max(1.0, requests_per_second)
+            self._request_bucket = TokenBucket(requests_per_second, capacity)
+
+        self._token_bucket = None
+        if tokens_per_minute:
+            self._token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+
+        # 统计信息
+        self.total_wait = 0.0
+        self.throttled_count = 0
+
+    def acquire(self, tokens: float = 0):
+        """
+        获取一次请求许可，必要时阻塞等待
+
+        Args:
+            tokens: 本次请求预计消耗的token数
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self._request_bucket:
+                wait = max(wait, self._request_bucket.reserve(1, now))
+            if self._token_bucket and tokens:
+                wait = max(wait, self._token_bucket.reserve(tokens, now))
+            if wait > 0:
+                self.total_wait += wait
+                self.throttled_count += 1
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_usage(self, estimated_tokens: float, actual_tokens: float):
+        """
+        按实际用量修正token桶
+
+        Args:
+            estimated_tokens: acquire 时预估的token数
+            actual_tokens: 响应中 usage 报告的实际token数
+        """
+        if not self._token_bucket:
+            return
+        with self._lock:
+            self._token_bucket.refund(estimated_tokens - actual_tokens)
+
+    def pause(self, seconds: float):
+        """
+        暂停所有请求（例如收到429时按 Retry-After 暂停）
+
+        Args:
+            seconds: 暂停秒数
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning(f"触发API限流，所有请求暂停 {seconds:.1f} 秒")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流统计"""
+        return {
+            'requests_per_second': self.requests_per_second,
+            'tokens_per_minute': self.tokens_per_minute,
+            'throttled_count': self.throttled_count,
+            'total_wait_seconds': round(self.total_wait, 2)
+        }
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """
+    解析 Retry-After 响应头（秒数或HTTP日期）
+
+    Args:
+        value: 响应头的值
+        default: 无法解析时的默认秒数
+
+    Returns:
+        需要等待的秒数
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+失败诗歌重放队列
+处理过程中把分析失败、使用备用分析或基础标签的诗歌追加到队列文件（JSONL），
+之后可以只重新分析这些诗歌并原地修补 ai_enhanced_*.json，不必重新处理整个文件
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Any, List, Optional
+from jsonl_stream import JSONLStreamWriter, iter_jsonl
+from deepseek_poem_analyzer import AIPoemAnalyzer
+
+logger = logging.getLogger(__name__)
+
+REPLAY_QUEUE_FILE_NAME = "replay_queue.jsonl"
+
+# 增强后的诗歌中由分析流程添加的字段，重新分析前去掉
+ANALYSIS_FIELDS = ('ai_analysis', 'ai_tags', 'ai_failure')
+
+def replay_reason(poem: Dict[str, Any]) -> Optional[str]:
+    """
+    判断增强后的诗歌是否需要重新分析
+
+    Args:
+        poem: 增强后的诗歌数据
+
+    Returns:
+        需要重新分析的原因（API失败原因 / fallback / placeholder / error），不需要时返回None
+    """
+    if not any(poem.get('paragraphs', [])):
+        # 空内容的诗歌重新分析也不会成功
+        return None
+    if 'ai_failure' in poem:
+        return poem['ai_failure'].get('reason', 'failure')
+    if 'ai_tags' not in poem:
+        # 分析过程出错，保留了原始数据
+        return 'error'
+    analysis = poem.get('ai_analysis')
+    if analysis is None:
+        # 分析失败时使用的基础标签
+        return 'placeholder'
+    if analysis.get('fallback'):
+        return 'fallback'
+    return None
+
+
+def strip_analysis(poem: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉分析字段，得到可以重新分析的原始诗歌数据"""
+    return {key: value for key, value in poem.items() if key not in ANALYSIS_FIELDS}
+
+
+class ReplayQueue:
+    """重放队列写入器（可跨线程共享）"""
+
+    def __init__(self, queue_file: str = REPLAY_QUEUE_FILE_NAME, truncate: bool = True):
+        """
+        初始化重放队列
+
+        Args:
+            queue_file: 队列文件路径
+            truncate: 是否清空已有的队列（恢复处理时追加）
+        """
+        self.queue_file = queue_file
+        self._writer = JSONLStreamWriter(queue_file, truncate=truncate)
+
+    @property
+    def recorded(self) -> int:
+        """本次运行加入队列的诗歌数"""
+        return self._writer.records_written
+
+    def record(self, poem: Dict[str, Any]) -> bool:
+        """
+        诗歌需要重新分析时加入队列
+
+        Args:
+            poem: 增强后的诗歌数据
+
+        Returns:
+            是否加入了队列
+        """
+        reason = replay_reason(poem)
+        if reason is None:
+            return False
+        # 按来源文件 + 诗歌序号定位，与结果流去重用的键相同（同一文件中可能有ID相同的诗歌）
+        self._writer.write({
+            'source_file': poem.get('source_file'),
+            'source_index': poem.get('source_index'),
+            'poem_id': AIPoemAnalyzer.poem_id(poem),
+            'reason': reason,
+            'time': time.time()
+        })
+        return True
+
+    def flush(self):
+        """队列文件落盘"""
+        self._writer.flush()
+
+    def close(self):
+        """关闭队列文件"""
+        self._writer.close()
+
+
+def load_replay_queue(queue_file: str) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    """
+    读取重放队列（同一首诗歌多次加入时保留最后一条）
+
+    Args:
+        queue_file: 队列文件路径
+
+    Returns:
+        来源文件 -> {诗歌序号 -> 队列记录}
+    """
+    queue = {}
+    if not os.path.exists(queue_file):
+        return queue
+    for entry in iter_jsonl(queue_file):
+        if entry.get('source_index') is None:
+            # 旧版队列只记录诗歌ID，无法区分同一文件中ID相同的诗歌
+            logger.warning(f"跳过缺少诗歌序号的队列记录: {entry.get('source_file')} {entry.get('poem_id')}")
+            continue
+        queue.setdefault(entry.get('source_file'), {})[entry['source_index']] = entry
+    return queue
+
+
+def rewrite_replay_queue(queue_file: str, entries: List[Dict[str, Any]]):
+    """
+    用仍需重新分析的诗歌替换队列内容（先写临时文件再原子替换）
+
+    Args:
+        queue_file: 队列文件路径
+        entries: 队列记录
+    """
+    temp_file = queue_file + '.tmp'
+    with JSONLStreamWriter(temp_file, truncate=True) as writer:
+        for entry in entries:
+            writer.write(entry)
+    os.replace(temp_file, queue_file)
+    logger.info(f"重放队列剩余 {len(entries)} 首诗歌: {queue_file}")
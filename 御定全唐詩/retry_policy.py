@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API请求重试与熔断
+对429、5xx和超时等临时错误按带抖动的指数退避重试；
+错误率短时间内激增时熔断，所有工作线程暂停一段时间后再恢复请求
+"""
+
+import time
+import random
+import threading
+import logging
+from collections import deque
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码：请求超时、限流和服务端临时错误
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+class RetryPolicy:
+    """带上限和全抖动（full jitter）的指数退避重试策略"""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        """
+        初始化重试策略
+
+        Args:
+            max_retries: 最大重试次数（不含首次请求）
+            base_delay: 首次重试的退避基数（秒）
+            max_delay: 单次退避的上限（秒）
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def is_retryable_status(status_code: int) -> bool:
+        """判断HTTP状态码是否值得重试"""
+        return status_code in RETRYABLE_STATUS_CODES
+
+    def backoff(self, attempt: int) -> float:
+        """
+        计算第 attempt 次重试（从0开始）前的等待时间
+
+        在 [0, min(max_delay, base_delay * 2^attempt)] 内均匀取值，
+        避免大量工作线程在同一时刻集中重试
+
+        Args:
+            attempt: 已失败的次数减一
+
+        Returns:
+            等待秒数
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """熔断器 - 最近请求的错误率超过阈值时暂停所有请求（可跨线程共享）"""
+
+    def __init__(self, window: int = 20, failure_threshold: float = 0.5,
+                 min_requests: int = 10, cooldown: float = 30.0):
+        """
+        初始化熔断器
+
+        Args:
+            window: 统计错误率的最近请求数
+            failure_threshold: 触发熔断的错误率
+            min_requests: 窗口内至少有这么多请求才判断错误率
+            cooldown: 熔断后暂停的秒数
+        """
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+
+        # 统计信息
+        self.trip_count = 0
+        self.total_wait = 0.0
+
+    def before_request(self):
+        """请求前调用，熔断期间阻塞到冷却结束"""
+        with self._lock:
+            wait = self._open_until - time.monotonic()
+            if wait > 0:
+                self.total_wait += wait
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_success(self):
+        """记录一次成功的请求"""
+        with self._lock:
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """记录一次失败的请求，错误率超过阈值时熔断"""
+        with self._lock:
+            self._outcomes.append(False)
+            if len(self._outcomes) < self.min_requests:
+                return
+            error_rate = self._outcomes.count(False) / len(self._outcomes)
+            if error_rate < self.failure_threshold:
+                return
+
+            # 熔断：清空窗口，冷却结束后重新统计（相当于半开状态试探恢复）
+            self._open_until = time.monotonic() + self.cooldown
+            self._outcomes.clear()
+            self.trip_count += 1
+
+        logger.warning(f"API错误率过高（{error_rate*100:.0f}%），熔断 {self.cooldown:.0f} 秒后恢复请求")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断统计"""
+        return {
+            'trip_count': self.trip_count,
+            'total_wait_seconds': round(self.total_wait, 2)
+        }
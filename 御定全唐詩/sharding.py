@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多机分片处理
+按文件名的稳定哈希（CRC32）把各卷文件分配到 N 个分片，多台机器各自处理一个分片、
+各自保存进度；全部完成后按卷号多路归并各分片的 ai_enhanced_*.json 和统计信息，
+逐卷流式写入合并文件，不在内存中保留全部诗歌
+"""
+
+import os
+import re
+import json
+import heapq
+import zlib
+import logging
+from itertools import groupby
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from jsonl_stream import write_json_array
+from api_metrics import APIMetrics
+
+logger = logging.getLogger(__name__)
+
+# 每卷的分析结果文件名，如 ai_enhanced_001.json
+VOLUME_OUTPUT_PATTERN = re.compile(r'^ai_enhanced_(\d+)\.json$')
+
+# 统计中表示配置而非计数的字段，合并时保留第一个分片的值
+CONFIG_KEYS = frozenset({'requests_per_second', 'tokens_per_minute', 'pool_size', 'max_entries', 'max_limit',
+                         'threshold'})
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    解析分片参数
+
+    Args:
+        spec: 形如 "i/N" 的字符串，i 从1开始
+
+    Returns:
+        (分片序号, 分片总数)
+    """
+    match = re.match(r'^\s*(\d+)\s*/\s*(\d+)\s*$', spec or '')
+    if not match:
+        raise ValueError(f"分片参数格式应为 i/N（如 1/4）: {spec}")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"分片序号应在 1 到 {count} 之间: {spec}")
+    return index, count
+
+
+def shard_of(file_path: str, shard_count: int) -> int:
+    """
+    计算文件所属的分片（从1开始）
+
+    只使用文件名计算哈希，与输入文件夹的位置、机器和Python版本无关
+
+    Args:
+        file_path: 文件路径
+        shard_count: 分片总数
+
+    Returns:
+        分片序号
+    """
+    file_name = os.path.basename(file_path)
+    return zlib.crc32(file_name.encode('utf-8')) % shard_count + 1
+
+
+def select_shard_files(files: List[str], shard: Tuple[int, int]) -> List[str]:
+    """
+    筛选属于指定分片的文件（保持原有顺序）
+
+    Args:
+        files: 全部文件
+        shard: (分片序号, 分片总数)
+
+    Returns:
+        本分片的文件
+    """
+    index, count = shard
+    return [f for f in files if shard_of(f, count) == index]
+
+
+def shard_file_name(file_name: str, shard: Optional[Tuple[int, int]]) -> str:
+    """
+    为分片生成独立的文件名，如 processing_progress.json -> processing_progress.shard1of4.json
+
+    Args:
+        file_name: 原文件名（可含路径）
+        shard: (分片序号, 分片总数)，为None时返回原文件名
+
+    Returns:
+        分片文件名
+    """
+    if not shard:
+        return file_name
+    base, ext = os.path.splitext(file_name)
+    return f"{base}.shard{shard[0]}of{shard[1]}{ext}"
+
+
+def iter_volume_outputs(folder: str) -> Iterator[Tuple[int, str]]:
+    """
+    按卷号顺序列出文件夹中的分析结果文件
+
+    Args:
+        folder: 分片输出文件夹
+
+    Yields:
+        (卷号, 文件路径)
+    """
+    if not os.path.isdir(folder):
+        logger.warning(f"分片输出文件夹不存在: {folder}")
+        return
+    volumes = []
+    for file_name in os.listdir(folder):
+        match = VOLUME_OUTPUT_PATTERN.match(file_name)
+        if match:
+            volumes.append((int(match.group(1)), os.path.join(folder, file_name)))
+    yield from sorted(volumes)
+
+
+def merge_shard_outputs(folders: List[str], output_file: str) -> int:
+    """
+    按卷号多路归并各分片的分析结果，生成合并文件
+
+    每次只载入一卷，同一卷出现在多个文件夹中时（例如更换分片数后重跑）使用最新的文件
+
+    Args:
+        folders: 各分片的输出文件夹（也可以是同一个共享文件夹）
+        output_file: 合并文件路径
+
+    Returns:
+        合并的诗歌数量
+    """
+    merged = heapq.merge(*(iter_volume_outputs(folder) for folder in dict.fromkeys(folders)))
+
+    def records() -> Iterator[Dict[str, Any]]:
+        for number, group in groupby(merged, key=lambda item: item[0]):
+            paths = [path for _, path in group]
+            if len(paths) > 1:
+                logger.warning(f"卷 {number} 在多个分片中存在，使用最新的文件: {paths}")
+            path = max(paths, key=os.path.getmtime)
+            with open(path, 'r', encoding='utf-8') as f:
+                yield from json.load(f)
+
+    count = write_json_array(records(), output_file)
+    logger.info(f"已归并 {len(folders)} 个分片文件夹，共 {count} 首诗歌: {output_file}")
+    return count
+
+
+def _merge_values(left: Any, right: Any) -> Any:
+    """合并两个分片的统计值：计数相加、分布逐项相加、列表拼接"""
+    if isinstance(left, dict) and isinstance(right, dict):
+        merged = dict(left)
+        for key, value in right.items():
+            if key not in merged or key in CONFIG_KEYS:
+                merged.setdefault(key, value)
+            else:
+                merged[key] = _merge_values(merged[key], value)
+        return merged
+    if isinstance(left, list) and isinstance(right, list):
+        return left + right
+    if (isinstance(left, (int, float)) and isinstance(right, (int, float))
+            and not isinstance(left, bool) and not isinstance(right, bool)):
+        return left + right
+    return left
+
+
+def merge_statistics(shard_stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各分片的统计信息
+
+    Args:
+        shard_stats: 各分片的统计信息
+
+    Returns:
+        合并后的统计信息（比率按合并后的计数重新计算）
+    """
+    merged = {}
+    for stats in shard_stats:
+        merged = _merge_values(merged, stats)
+
+    connection = merged.get('connection_statistics')
+    if connection and connection.get('requests'):
+        connection['connection_reuse_rate'] = 1 - connection['connections_opened'] / connection['requests']
+    cache = merged.get('cache_statistics')
+    if cache:
+        lookups = cache['hits'] + cache['misses']
+        cache['hit_rate'] = cache['hits'] / lookups if lookups else 0.0
+    cascade = merged.get('cascade_statistics')
+    if cascade:
+        cascade['api_calls_avoided_rate'] = cascade['local_accepted'] / cascade['checked'] if cascade['checked'] else 0.0
+    # 并发上限是各分片各自的状态，不能相加：取范围，基线延迟取各分片的平均值
+    limiters = [stats['concurrency_statistics'] for stats in shard_stats if 'concurrency_statistics' in stats]
+    if limiters:
+        concurrency = merged['concurrency_statistics']
+        concurrency['limit'] = max(limiter['limit'] for limiter in limiters)
+        concurrency['peak_limit'] = max(limiter['peak_limit'] for limiter in limiters)
+        concurrency['lowest_limit'] = min(limiter['lowest_limit'] for limiter in limiters)
+        concurrency['baseline_latency_ms'] = round(
+            sum(limiter['baseline_latency_ms'] for limiter in limiters) / len(limiters), 1)
+    hedge = merged.get('hedge_statistics')
+    if hedge:
+        hedge['hedge_rate'] = hedge['hedges'] / hedge['requests'] if hedge['requests'] else 0.0
+    for section in ('retry_statistics', 'rate_limit_statistics', 'concurrency_statistics'):
+        if section in merged:
+            merged[section]['total_wait_seconds'] = round(merged[section]['total_wait_seconds'], 2)
+
+    merged['shards'] = len(shard_stats)
+    return merged
+
+
+def merge_shard_statistics(stats_files: List[str], output_file: str,
+                           metrics_files: List[str] = ()) -> Dict[str, Any]:
+    """
+    合并各分片的统计文件
+
+    Args:
+        stats_files: 各分片的统计文件路径
+        output_file: 合并统计文件路径
+        metrics_files: 各分片的API调用指标文件，用于重新计算延迟分位数等不能直接相加的指标
+
+    Returns:
+        合并后的统计信息
+    """
+    shard_stats = []
+    for stats_file in stats_files:
+        with open(stats_file, 'r', encoding='utf-8') as f:
+            shard_stats.append(json.load(f))
+
+    stats = merge_statistics(shard_stats)
+    if metrics_files:
+        stats['api_metrics'] = APIMetrics.from_files(metrics_files).get_stats()
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    logger.info(f"已合并 {len(stats_files)} 个分片的统计信息: {output_file}")
+    return stats
@@ -122,10 +122,10 @@ def start_folder_processor():
     # 获取其他参数
     sample_files = input("样本文件数量 (留空处理所有文件): ").strip()
     batch_size = input("批次大小 (默认20): ").strip() or "20"
-    delay = input("请求间隔秒数 (默认1.0): ").strip() or "1.0"
+    rps = input("每秒请求数上限 (默认5): ").strip() or "5"
     
     # 构建命令
-    command = f"python folder_batch_poem_processor.py --folder {folder_path} --batch-size {batch_size} --delay {delay}"
+    command = f"python folder_batch_poem_processor.py --folder {folder_path} --batch-size {batch_size} --rps {rps}"
     
     if sample_files:
         command += f" --sample-files {sample_files}"
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI标签规范化工具
+将DeepSeek生成的近义、异体标签（如 春日/春 -> 春天，愁 -> 忧愁）归并为统一写法，
+建索引和解析查询时各做一次字典查找即可命中同一个倒排表
+"""
+
+import os
+import json
+import unicodedata
+from typing import Dict, Optional
+
+# 默认别名表，与本文件同目录
+DEFAULT_ALIAS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tag_aliases.json')
+
+# ai_tags 字段名 -> 索引键前缀
+TAG_FIELD_PREFIXES = {
+    'styles': 'style',
+    'scenes': 'scene',
+    'emotions': 'emotion',
+    'themes': 'theme',
+    'rhetoric': 'rhetoric',
+    'keywords': 'keyword'
+}
+
+# 按原文索引的键（作者、标题），查询时不做规范化，否则含异体字或标点的作者、标题无法匹配
+RAW_KEY_PREFIXES = ('author', 'title')
+
+# 标签首尾需要去掉的空白和标点
+STRIP_CHARS = ' \t\r\n　，。、；：！？,.;:!?"\'“”‘’'
+
+class TagCanonicalizer:
+    """标签规范化器"""
+
+    def __init__(self, alias_file: Optional[str] = DEFAULT_ALIAS_FILE):
+        """
+        初始化规范化器
+
+        Args:
+            alias_file: 别名表JSON文件路径，为None或文件不存在时只做空白和字形规范化
+        """
+        self.alias_file = alias_file
+        self.variant_table = {}
+        # 编译后的映射: '前缀:别名' -> '前缀:规范写法'
+        self.key_map = {}
+
+        if alias_file and os.path.exists(alias_file):
+            self._compile(self._load_aliases(alias_file))
+
+    def _load_aliases(self, alias_file: str) -> Dict:
+        """加载别名表"""
+        try:
+            with open(alias_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"别名表解析失败 {alias_file}: {e}")
+            return {}
+
+    def _compile(self, config: Dict):
+        """
+        将别名表编译为字典查找
+
+        别名表格式:
+            {
+                "variants": {"憂": "忧"},
+                "aliases": {
+                    "*": {"规范写法": ["别名1", "别名2"]},
+                    "scenes": {"春天": ["春日", "春"]}
+                }
+            }
+        "*" 下的别名作用于所有标签维度，具体维度的配置优先。
+        """
+        self.variant_table = str.maketrans(config.get('variants', {}))
+
+        aliases = config.get('aliases', {})
+        sections = [('*', aliases.get('*', {}))]
+        sections += [(field, group) for field, group in aliases.items() if field != '*']
+
+        for field, group in sections:
+            prefixes = TAG_FIELD_PREFIXES.values() if field == '*' else [TAG_FIELD_PREFIXES.get(field, field)]
+            for canonical, names in group.items():
+                canonical = self.normalize(canonical)
+                for prefix in prefixes:
+                    for name in names:
+                        self.key_map[f'{prefix}:{self.normalize(name)}'] = f'{prefix}:{canonical}'
+
+    def normalize(self, value: str) -> str:
+        """空白、全角/半角和异体字规范化"""
+        value = unicodedata.normalize('NFKC', value).strip(STRIP_CHARS)
+        value = ''.join(value.split())
+        return value.translate(self.variant_table) if self.variant_table else value
+
+    def canonicalize_key(self, key: str) -> str:
+        """
+        规范化索引键
+
+        Args:
+            key: 索引键，如 'scene:春日'
+
+        Returns:
+            规范化后的索引键，如 'scene:春天'；作者和标题键原样返回
+        """
+        prefix, sep, value = key.partition(':')
+        if not sep or prefix in RAW_KEY_PREFIXES:
+            return key
+        key = f'{prefix}:{self.normalize(value)}'
+        return self.key_map.get(key, key)
+
+    def canonicalize(self, field: str, value: str) -> str:
+        """
+        规范化单个标签值
+
+        Args:
+            field: ai_tags 字段名，如 'scenes'
+            value: 标签值
+
+        Returns:
+            规范化后的标签值
+        """
+        prefix = TAG_FIELD_PREFIXES.get(field, field)
+        return self.canonicalize_key(f'{prefix}:{value}').partition(':')[2]